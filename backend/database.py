@@ -1,8 +1,17 @@
+from contextvars import ContextVar
+from typing import List, Optional
 from sqlmodel import create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.concurrency import run_in_threadpool
 from .models import * # Import models to register them with SQLModel
+from .services.db_health import DatabaseUnavailable, db_health
+from .services.db_pool import (
+    InstrumentedAsyncQueuePool, InstrumentedQueuePool, MAX_OVERFLOW, POOL_SIZE, pool_monitor, request_scope,
+)
 import os
 import logging
-import time
 
 logger = logging.getLogger(__name__)
 
@@ -10,21 +19,21 @@ logger = logging.getLogger(__name__)
 
 # Get database URL from environment
 DATABASE_URL = os.getenv("DATABASE_URL")
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
 
 if DATABASE_URL and DATABASE_URL.startswith("postgresql"):
     # Using PostgreSQL (Neon serverless)
     # Use QueuePool to REUSE connections — NullPool was creating a new TCP connection
     # per request, each potentially hitting Neon's 15-30s cold-start.
-    from sqlalchemy.pool import QueuePool
-    
+    # The instrumented subclass times checkouts and can be resized (services/db_pool.py).
     logger.info(f"Using PostgreSQL: {DATABASE_URL[:50]}...")
     engine = create_engine(
         DATABASE_URL, 
         echo=False,
-        poolclass=QueuePool,
-        pool_size=3,          # Keep 3 connections alive
-        max_overflow=5,       # Allow up to 8 total during bursts
-        pool_timeout=35,      # Wait up to 35s for a connection from pool
+        poolclass=InstrumentedQueuePool,
+        pool_size=POOL_SIZE,        # DB_POOL_SIZE, default 3 kept alive
+        max_overflow=MAX_OVERFLOW,  # DB_MAX_OVERFLOW, default 5 more during bursts
+        pool_timeout=POOL_TIMEOUT,  # Fail fast when the pool is exhausted; the breaker takes over
         pool_recycle=270,     # Recycle connections every 4.5 min (Neon idles at ~5 min)
         pool_pre_ping=True,   # Verify connection is alive before using it
         connect_args={
@@ -35,25 +44,140 @@ if DATABASE_URL and DATABASE_URL.startswith("postgresql"):
             "connect_timeout": 30,  # 30s for Neon cold-start (free tier can take 15-25s)
         }
     )
+
+    # Async engine (asyncpg) for routers that must not block the event loop.
+    # asyncpg doesn't understand libpq's sslmode/channel_binding query params.
+    _async_url = make_url(DATABASE_URL)
+    _async_query = dict(_async_url.query)
+    _sslmode = _async_query.pop("sslmode", None)
+    _async_query.pop("channel_binding", None)
+    _async_url = _async_url.set(drivername="postgresql+asyncpg", query=_async_query)
+    _async_connect_args = {"timeout": 30}  # Neon cold-start, same as connect_timeout above
+    if _sslmode and _sslmode != "disable":
+        _async_connect_args["ssl"] = _sslmode
+    async_engine = create_async_engine(
+        _async_url,
+        echo=False,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=270,
+        pool_pre_ping=True,
+        connect_args=_async_connect_args,
+    )
 else:
     # Fallback to SQLite
     logger.info("Using SQLite (Local)")
     sqlite_file_name = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database.db")
     sqlite_url = f"sqlite:///{sqlite_file_name}"
-    engine = create_engine(sqlite_url, echo=False)
+    engine = create_engine(sqlite_url, echo=False, poolclass=InstrumentedQueuePool)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{sqlite_file_name}", echo=False,
+                                       poolclass=InstrumentedAsyncQueuePool)
+
+# Fail fast while the database is unreachable (503 + Retry-After instead of a 30s hang)
+db_health.install(engine, async_engine)
+# Checkout wait times and per-route hold times (GET /admin/db/pool)
+pool_monitor.install(engine, async_engine)
+
+
+# Sessions handed out during the current request (see SessionReleaseMiddleware)
+_request_sessions: ContextVar[Optional[List]] = ContextVar("request_sessions", default=None)
+
+
+def _track(session):
+    sessions = _request_sessions.get()
+    if sessions is not None:
+        sessions.append(session)
+
+
+class SessionReleaseMiddleware:
+    """
+    Give the request's pooled connections back as soon as its response starts.
+
+    A session only checks a connection out of the pool on its first query, so
+    a handler answered from the cache never takes one. Once it has, though, the
+    connection stays with the session until the dependency's teardown, and
+    FastAPI runs that after the whole response has been sent: a video stream
+    or a slow client would keep one of the 3+5 pooled connections for minutes.
+    Here the sessions are closed when the handler hands over its response,
+    before any body goes out. The session itself stays usable; anything that
+    queries again later (a streaming body, a background task) checks a new
+    connection out lazily.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sessions: List = []
+        token = _request_sessions.set(sessions)
+        scope_token = request_scope.set(scope)  # Route names for pool hold times
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and sessions:
+                await release_sessions(sessions)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_sessions.reset(token)
+            request_scope.reset(scope_token)
+
+
+async def release_sessions(sessions: List):
+    """Close sessions that hold a connection; the rollback runs off the event loop for sync ones."""
+    while sessions:
+        session = sessions.pop()
+        if not session.in_transaction():
+            continue  # Never queried: nothing checked out
+        try:
+            if isinstance(session, AsyncSession):
+                await session.close()
+            else:
+                await run_in_threadpool(session.close)
+        except Exception as e:
+            logger.warning(f"Releasing a request's DB session failed: {e}")
+
 
 def get_session():
-    """Yield a database session with retry logic for Neon cold-start."""
-    max_retries = 2
-    for attempt in range(max_retries + 1):
+    """
+    Yield a database session. Connection failures are counted by the circuit
+    breaker (services/db_health) and reported as 503 DatabaseUnavailable.
+    The connection goes back to the pool when the response starts
+    (SessionReleaseMiddleware), not after its body has been sent.
+    """
+    with Session(engine) as session:
+        _track(session)
         try:
-            with Session(engine) as session:
-                yield session
-                return
+            yield session
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
-            if attempt < max_retries and ("timeout" in str(e).lower() or "closed" in str(e).lower()):
-                logger.warning(f"DB connection attempt {attempt+1} failed ({e}), retrying in 1s...")
-                time.sleep(1)  # sync sleep OK here — this is a sync generator
-            else:
-                raise
+            if db_health.observe(e):
+                raise DatabaseUnavailable() from e
+            raise
+
 
+async def get_async_session():
+    """
+    Yield an AsyncSession. Queries are awaited, so a slow Neon round-trip only
+    suspends this request instead of blocking the whole event loop.
+
+    expire_on_commit=False: attribute access after commit would trigger an
+    implicit (sync) refresh, which AsyncSession cannot do.
+    """
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        _track(session)
+        try:
+            yield session
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            if db_health.observe(e):
+                raise DatabaseUnavailable() from e
+            raise
@@ -9,9 +9,10 @@ load_dotenv(dotenv_path=_env_path, override=True)
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .database import engine
+from .database import engine, SessionReleaseMiddleware
 from .routers import videos, upload, stream, categories, analytics, thumbnails, auth, comments, likes, history, playlists, admin, subscriptions
 from .models import SQLModel
+from .services.serialization import FastJSONResponse
 import logging
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -61,7 +62,8 @@ class RequestLoggerMiddleware(BaseHTTPMiddleware):
 app = FastAPI(
     title="Video Streaming API",
     description="Backend for Video Streaming Platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse,  # orjson when installed (services/serialization.py)
 )
 
 # CORS Configuration - MUST BE ADDED FIRST before other middleware
@@ -71,11 +73,15 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination cursor for list endpoints
 )
 
 # Other middleware (added after CORS)
+app.add_middleware(SessionReleaseMiddleware)  # Pooled connections go back before streaming bodies start
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+from .services.http_cache import HTTPCacheMiddleware
+app.add_middleware(HTTPCacheMiddleware)  # ETags, 304s and per-route Cache-Control
 app.add_middleware(RequestLoggerMiddleware)
 app.add_middleware(SecurityHeadersMiddleware)
 
@@ -94,48 +100,90 @@ app.include_router(playlists.router)
 app.include_router(admin.router)
 app.include_router(subscriptions.router)
 
-_keep_alive_task = None
-
-async def _db_keep_alive():
-    """Ping database every 4 minutes to prevent Neon free-tier auto-suspend."""
-    import asyncio
-    from sqlalchemy import text
-    from .database import engine
-    while True:
-        await asyncio.sleep(240)  # 4 minutes
-        try:
-            with engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
-                conn.commit()
-            logger.debug("DB keep-alive ping OK")
-        except Exception as e:
-            logger.warning(f"DB keep-alive ping failed: {e}")
+_reconcile_task = None
 
 @app.on_event("startup")
 async def on_startup():
-    global _keep_alive_task
+    global _reconcile_task
     logger.info("Application starting up...")
     # Start the Telegram upload queue worker
     from .services.telegram_queue import telegram_queue
     telegram_queue.start()
     logger.info("Telegram upload queue started.")
-    # Start DB keep-alive
+    # Start the buffered view counter flush loop
+    from .services.view_counter import view_counter
+    view_counter.start()
+    # Start the watch-progress flush loop
+    from .services.progress_buffer import progress_buffer
+    progress_buffer.start()
+    # Build the in-memory search index (background thread); app_cache invalidations keep it current
+    from .services.cache import app_cache, file_url_cache, user_cache
+    from .services.search_index import search_index
+    search_index.start(app_cache)
+    # Expire response cache entries that are never read again
+    from .services.db_health import db_health
+    app_cache.stale_if = db_health.observe  # Last good responses while the DB is unreachable
+    user_cache.stale_if = db_health.observe  # ...and signed-in users stay signed in
+    app_cache.start()
+    file_url_cache.start()
+    user_cache.start()
+    # Shared L2 + cross-worker invalidation when REDIS_URL is set
+    from .services.cache_backend import start_shared_cache
+    await start_shared_cache(app_cache, file_url_cache, user_cache)
+    # Keep the homepage / shorts / trending / category first pages prebuilt
+    from .services.feed_refresher import feed_refresher
+    feed_refresher.start(app_cache)
+    # Background delete jobs + file cleanup queue
+    from .services.video_deletion import video_deleter
+    video_deleter.start()
+    # Warm the DB pools, then keep Neon awake (async ping) and optionally auto-size them
+    from .services.db_pool import pool_monitor
+    pool_monitor.start()
     import asyncio
-    _keep_alive_task = asyncio.create_task(_db_keep_alive())
-    logger.info("DB keep-alive started (ping every 4 min).")
+    # Periodically repair drift in the denormalized counters
+    from .services.counters import RECONCILE_INTERVAL, reconcile_loop
+    if RECONCILE_INTERVAL > 0:
+        _reconcile_task = asyncio.create_task(reconcile_loop())
 
 @app.on_event("shutdown")
 async def on_shutdown():
-    global _keep_alive_task
+    global _reconcile_task
     from .services.telegram_queue import telegram_queue
     telegram_queue.stop()
-    if _keep_alive_task:
-        _keep_alive_task.cancel()
-    logger.info("Telegram upload queue + DB keep-alive stopped.")
+    from .services.db_pool import pool_monitor
+    await pool_monitor.stop()
+    if _reconcile_task:
+        _reconcile_task.cancel()
+    # Flush buffered views and watch progress before exiting
+    from .services.view_counter import view_counter
+    from .services.progress_buffer import progress_buffer
+    await view_counter.stop()
+    await progress_buffer.stop()
+    from .services.video_deletion import video_deleter
+    await video_deleter.stop()
+    from .services.feed_refresher import feed_refresher
+    await feed_refresher.stop()
+    from .services.search_index import search_index
+    await search_index.stop()
+    from .services.cache import app_cache, file_url_cache, user_cache
+    from .services.cache_backend import stop_shared_cache
+    await app_cache.flush()
+    await stop_shared_cache(app_cache, file_url_cache, user_cache)
+    await app_cache.stop()
+    await file_url_cache.stop()
+    await user_cache.stop()
+    from .services.password_hasher import password_hasher
+    password_hasher.stop()
+    logger.info("Telegram upload queue + DB keep-alive + write buffers stopped.")
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok", "service": "streaming-platform-backend"}
+    from .services.db_health import db_health
+    return {
+        "status": "ok",
+        "service": "streaming-platform-backend",
+        "database": "unavailable" if db_health.is_open else "ok",
+    }
 
 # Serve Frontend Static Files
 # This should be at the end to avoid catching API routes
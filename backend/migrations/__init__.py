@@ -0,0 +1,106 @@
+"""
+Versioned schema migrations — replaces the ad-hoc backend/update_schema_*.py scripts.
+
+    python -m backend.migrations            # apply pending migrations
+    python -m backend.migrations --status   # list applied / pending
+
+Each migration is a module named mNNNN_<name>.py in this package with:
+
+    DESCRIPTION = "..."
+    TRANSACTIONAL = True          # False for CREATE INDEX CONCURRENTLY (Postgres)
+    def upgrade(conn): ...
+
+Applied versions are recorded in the schema_migrations table. Transactional
+migrations run in one transaction together with their bookkeeping row.
+Non-transactional ones run in AUTOCOMMIT and must be idempotent (use the
+helpers in ops.py), because a failure leaves them partly applied and they are
+simply re-run next time.
+"""
+import importlib
+import logging
+import pkgutil
+import re
+from datetime import datetime
+from typing import List, NamedTuple
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, select
+
+logger = logging.getLogger(__name__)
+
+_MODULE_RE = re.compile(r"^m(\d{4})_\w+$")
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", String, primary_key=True),
+    Column("description", String),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: str
+    description: str
+    transactional: bool
+    module: object
+
+
+def discover() -> List[Migration]:
+    """All migrations in this package, ordered by version."""
+    migrations = []
+    for info in pkgutil.iter_modules(__path__):
+        match = _MODULE_RE.match(info.name)
+        if not match:
+            continue
+        module = importlib.import_module(f"{__name__}.{info.name}")
+        migrations.append(Migration(
+            version=match.group(1),
+            description=getattr(module, "DESCRIPTION", info.name),
+            transactional=getattr(module, "TRANSACTIONAL", True),
+            module=module,
+        ))
+    return sorted(migrations, key=lambda m: m.version)
+
+
+def applied_versions(engine) -> set:
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_migrations.c.version)).scalars().all())
+
+
+def pending(engine) -> List[Migration]:
+    done = applied_versions(engine)
+    return [m for m in discover() if m.version not in done]
+
+
+def _record(conn, migration: Migration):
+    conn.execute(schema_migrations.insert().values(
+        version=migration.version,
+        description=migration.description,
+        applied_at=datetime.utcnow(),
+    ))
+
+
+def run_migrations(engine=None) -> List[str]:
+    """Apply pending migrations in order. Returns the versions applied."""
+    if engine is None:
+        from ..database import engine
+
+    applied = []
+    for migration in pending(engine):
+        logger.info(f"[Migrations] Applying {migration.version}: {migration.description}")
+        if migration.transactional:
+            with engine.begin() as conn:
+                migration.module.upgrade(conn)
+                _record(conn, migration)
+        else:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                migration.module.upgrade(conn)
+                _record(conn, migration)
+        applied.append(migration.version)
+
+    if applied:
+        logger.info(f"[Migrations] Applied {len(applied)} migration(s): {', '.join(applied)}")
+    else:
+        logger.info("[Migrations] Schema is up to date")
+    return applied
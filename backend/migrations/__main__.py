@@ -0,0 +1,37 @@
+# Load environment variables before backend.database reads DATABASE_URL
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+_env_path = Path(__file__).resolve().parent.parent / '.env'
+load_dotenv(dotenv_path=_env_path, override=True)
+
+# Allow running from the project root: python -m backend.migrations
+sys.path.insert(0, os.getcwd())
+
+from backend.database import engine
+from backend.migrations import applied_versions, discover, run_migrations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations")
+    parser.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.status:
+        done = applied_versions(engine)
+        for m in discover():
+            print(f"{'applied' if m.version in done else 'pending':<8} {m.version}  {m.description}")
+        return
+
+    applied = run_migrations(engine)
+    print(f"Applied {len(applied)} migration(s)." if applied else "Schema is up to date.")
+
+
+if __name__ == "__main__":
+    main()
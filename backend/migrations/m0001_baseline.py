@@ -0,0 +1,23 @@
+"""
+Baseline: create any missing tables, then the columns older databases were
+patched with by hand (update_schema_storage.py, add_is_short_column.py,
+migrate_resolution.py, update_schema_thumb.py).
+"""
+from sqlmodel import SQLModel
+
+from .. import models  # noqa: F401 - registers every table on SQLModel.metadata
+from .ops import add_column
+
+DESCRIPTION = "Baseline tables and legacy columns"
+TRANSACTIONAL = True
+
+
+def upgrade(conn):
+    SQLModel.metadata.create_all(conn)
+
+    add_column(conn, "video", "storage_mode", "VARCHAR DEFAULT 'local'")
+    add_column(conn, "video", "external_id", "VARCHAR")
+    add_column(conn, "video", "embed_url", "VARCHAR")
+    add_column(conn, "video", "is_short", "BOOLEAN DEFAULT FALSE")
+    add_column(conn, "videosource", "resolution", "VARCHAR")
+    add_column(conn, "telegraminfo", "thumbnail_file_id", "VARCHAR")
@@ -0,0 +1,12 @@
+"""Which bot/channel owns each Telegram message (multi-bot sharding)."""
+from .ops import add_column, create_index
+
+DESCRIPTION = "Telegram shard columns"
+TRANSACTIONAL = False
+
+
+def upgrade(conn):
+    for table in ("telegraminfo", "videoresolution"):
+        add_column(conn, table, "bot_id", "VARCHAR")
+        add_column(conn, table, "channel_id", "BIGINT")
+        create_index(conn, f"ix_{table}_bot_id", table, ["bot_id"])
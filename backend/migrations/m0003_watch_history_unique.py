@@ -0,0 +1,28 @@
+"""
+Progress heartbeats upsert on (user_id, video_id), which needs a unique index.
+Older code could create duplicate rows; keep the most recently watched one.
+"""
+from sqlalchemy import text
+
+from .ops import create_index
+
+DESCRIPTION = "Unique watch history per user/video"
+TRANSACTIONAL = False
+
+DEDUPE = """
+DELETE FROM watchhistory
+WHERE id NOT IN (
+    SELECT id FROM (
+        SELECT id, ROW_NUMBER() OVER (
+            PARTITION BY user_id, video_id ORDER BY watched_at DESC, id DESC
+        ) AS rn
+        FROM watchhistory
+    ) ranked
+    WHERE rn = 1
+)
+"""
+
+
+def upgrade(conn):
+    conn.execute(text(DEDUPE))
+    create_index(conn, "ux_watchhistory_user_video", "watchhistory", ["user_id", "video_id"], unique=True)
@@ -0,0 +1,23 @@
+"""Denormalized counter columns, backfilled from the source tables (see services/counters.py)."""
+from sqlmodel import Session
+
+from .ops import add_column
+
+DESCRIPTION = "Denormalized like/comment/subscriber/playlist counters"
+TRANSACTIONAL = True
+
+COUNTER_DDL = "INTEGER NOT NULL DEFAULT 0"
+
+
+def upgrade(conn):
+    from ..services.counters import reconcile_counters
+
+    add_column(conn, "video", "like_count", COUNTER_DDL)
+    add_column(conn, "video", "dislike_count", COUNTER_DDL)
+    add_column(conn, "video", "comment_count", COUNTER_DDL)
+    add_column(conn, "user", "subscriber_count", COUNTER_DDL)
+    add_column(conn, "playlist", "item_count", COUNTER_DDL)
+
+    # Joins the migration's transaction; commit() only releases a savepoint
+    with Session(bind=conn) as session:
+        reconcile_counters(session)
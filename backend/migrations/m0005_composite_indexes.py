@@ -0,0 +1,27 @@
+"""
+Composite indexes for the hot feed/lookup queries. Built CONCURRENTLY on
+Postgres so the tables stay writable; the same indexes are declared in
+models.py for fresh databases.
+"""
+from .ops import create_index
+
+DESCRIPTION = "Composite indexes for hot queries"
+TRANSACTIONAL = False
+
+INDEXES = [
+    ("ix_video_upload_date", "video", ["upload_date"]),
+    ("ix_video_is_short_upload_date", "video", ["is_short", "upload_date"]),
+    ("ix_video_category_upload_date", "video", ["category_id", "upload_date"]),
+    ("ix_videosource_video_provider_resolution", "videosource", ["video_id", "provider", "resolution"]),
+    ("ix_watchhistory_user_completed_watched", "watchhistory", ["user_id", "completed", "watched_at"]),
+    ("ix_videolike_video_is_like", "videolike", ["video_id", "is_like"]),
+    ("ix_videolike_user_video", "videolike", ["user_id", "video_id"]),
+    ("ix_subscription_subscriber_channel", "subscription", ["subscriber_id", "channel_id"]),
+    ("ix_comment_video_parent_created", "comment", ["video_id", "parent_id", "created_at"]),
+    ("ix_playlistitem_playlist_position", "playlistitem", ["playlist_id", "position"]),
+]
+
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
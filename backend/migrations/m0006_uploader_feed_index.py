@@ -0,0 +1,9 @@
+"""Channel pages and the subscription feed page by (uploader_id, upload_date)."""
+from .ops import create_index
+
+DESCRIPTION = "Uploader feed index"
+TRANSACTIONAL = False
+
+
+def upgrade(conn):
+    create_index(conn, "ix_video_uploader_upload_date", "video", ["uploader_id", "upload_date"])
@@ -0,0 +1,108 @@
+"""
+Full-text search index for /videos/search.
+
+SQLite: an external-content FTS5 table over video(title, description), kept in
+sync by triggers. Postgres: a tsvector column (title weighted above
+description) with a GIN index built CONCURRENTLY.
+
+The Postgres column is a plain nullable one kept up to date by a BEFORE
+trigger rather than GENERATED ... STORED: adding a stored generated column
+rewrites the whole table under ACCESS EXCLUSIVE, whereas a nullable column
+without a default is a catalog-only change. Existing rows are backfilled in
+small autocommitted batches, so only the rows of one batch are locked at a time.
+"""
+from sqlalchemy import text
+
+from .ops import add_column, create_index, is_postgres
+
+DESCRIPTION = "Full-text search index on videos"
+TRANSACTIONAL = False
+
+SQLITE_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS video_fts USING fts5(
+        title, description,
+        content='video', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS video_fts_ai AFTER INSERT ON video BEGIN
+        INSERT INTO video_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS video_fts_ad AFTER DELETE ON video BEGIN
+        INSERT INTO video_fts(video_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS video_fts_au AFTER UPDATE OF title, description ON video BEGIN
+        INSERT INTO video_fts(video_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO video_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+    END
+    """,
+    # Index the rows that existed before the triggers
+    "INSERT INTO video_fts(video_fts) VALUES ('rebuild')",
+]
+
+BACKFILL_BATCH = 1000
+
+
+def _search_vector(row: str) -> str:
+    return (
+        f"setweight(to_tsvector('simple', coalesce({row}title, '')), 'A') || "
+        f"setweight(to_tsvector('simple', coalesce({row}description, '')), 'B')"
+    )
+
+
+POSTGRES_STATEMENTS = [
+    f"""
+    CREATE OR REPLACE FUNCTION video_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {_search_vector("NEW.")};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    # No CREATE OR REPLACE TRIGGER before Postgres 14; both statements are instant
+    "DROP TRIGGER IF EXISTS video_search_vector_trg ON video",
+    """
+    CREATE TRIGGER video_search_vector_trg
+        BEFORE INSERT OR UPDATE OF title, description ON video
+        FOR EACH ROW EXECUTE FUNCTION video_search_vector_update()
+    """,
+]
+
+BACKFILL = f"""
+    UPDATE video SET search_vector = {_search_vector("")}
+    WHERE id IN (
+        SELECT id FROM video WHERE search_vector IS NULL
+        ORDER BY id LIMIT :batch
+    )
+"""
+
+
+def _is_generated(conn) -> bool:
+    """True where an earlier version of this migration added a GENERATED column."""
+    return conn.execute(text(
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_name = 'video' AND column_name = 'search_vector' AND is_generated = 'ALWAYS'"
+    )).first() is not None
+
+
+def upgrade(conn):
+    if is_postgres(conn):
+        add_column(conn, "video", "search_vector", "tsvector")
+        if not _is_generated(conn):
+            for stmt in POSTGRES_STATEMENTS:
+                conn.execute(text(stmt))
+            # Runs in AUTOCOMMIT, so every batch commits (and unlocks its rows) on its own;
+            # rows written meanwhile are filled by the trigger. Never NULL afterwards: an
+            # empty title and description still give an empty tsvector.
+            while conn.execute(text(BACKFILL), {"batch": BACKFILL_BATCH}).rowcount:
+                pass
+        create_index(conn, "ix_video_search_vector", "video", ["search_vector"], using="gin")
+    else:
+        for stmt in SQLITE_STATEMENTS:
+            conn.execute(text(stmt))
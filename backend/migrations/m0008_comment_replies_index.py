@@ -0,0 +1,9 @@
+"""Reply threads are loaded by parent_id IN (...) ordered by (created_at, id)."""
+from .ops import create_index
+
+DESCRIPTION = "Comment replies index"
+TRANSACTIONAL = False
+
+
+def upgrade(conn):
+    create_index(conn, "ix_comment_parent_created", "comment", ["parent_id", "created_at", "id"])
@@ -0,0 +1,82 @@
+"""
+Idempotent schema operations for migrations.
+
+Everything here checks the live schema first, so a migration that died halfway
+(e.g. a non-transactional CONCURRENTLY index build) can simply be re-run.
+"""
+import logging
+from typing import Optional, Sequence
+
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+
+def is_postgres(conn) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+def _autocommit(conn) -> bool:
+    return conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+
+
+def _quote(conn, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def has_table(conn, table: str) -> bool:
+    return inspect(conn).has_table(table)
+
+
+def has_column(conn, table: str, column: str) -> bool:
+    return any(col["name"] == column for col in inspect(conn).get_columns(table))
+
+
+def has_index(conn, table: str, name: str) -> bool:
+    return any(ix["name"] == name for ix in inspect(conn).get_indexes(table))
+
+
+def add_column(conn, table: str, column: str, ddl: str):
+    """ALTER TABLE ... ADD COLUMN unless it already exists. ddl is the type + constraints."""
+    if not has_table(conn, table) or has_column(conn, table, column):
+        return
+    conn.execute(text(f"ALTER TABLE {_quote(conn, table)} ADD COLUMN {_quote(conn, column)} {ddl}"))
+    logger.info(f"[Migrations] Added column {table}.{column}")
+
+
+def create_index(conn, name: str, table: str, columns: Sequence[str], unique: bool = False,
+                 using: Optional[str] = None):
+    """
+    CREATE INDEX IF NOT EXISTS. On Postgres the build is CONCURRENTLY (no write
+    lock on the table), which requires a migration with TRANSACTIONAL = False.
+    using selects a Postgres index method (e.g. "gin").
+    """
+    if not has_table(conn, table):
+        return
+    concurrently = ""
+    if is_postgres(conn):
+        _drop_invalid_index(conn, name)
+        if _autocommit(conn):
+            concurrently = "CONCURRENTLY "
+    cols = ", ".join(_quote(conn, c) for c in columns)
+    method = f" USING {using}" if using and is_postgres(conn) else ""
+    conn.execute(text(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX {concurrently}IF NOT EXISTS "
+        f"{_quote(conn, name)} ON {_quote(conn, table)}{method} ({cols})"
+    ))
+
+
+def drop_index(conn, name: str):
+    concurrently = "CONCURRENTLY " if is_postgres(conn) and _autocommit(conn) else ""
+    conn.execute(text(f"DROP INDEX {concurrently}IF EXISTS {_quote(conn, name)}"))
+
+
+def _drop_invalid_index(conn, name: str):
+    """A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind; IF NOT EXISTS would keep it."""
+    invalid = conn.execute(text(
+        "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"
+    ), {"name": name}).first()
+    if invalid:
+        logger.warning(f"[Migrations] Dropping invalid index {name} left by an interrupted build")
+        drop_index(conn, name)
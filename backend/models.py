@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional, List
 from sqlmodel import Field, SQLModel, Relationship
+from sqlalchemy import Column, BigInteger, Index
 from pydantic import ConfigDict
 
 class CategoryBase(SQLModel):
@@ -53,8 +54,20 @@ class VideoBase(SQLModel):
     external_id: Optional[str] = None
     embed_url: Optional[str] = None
     is_short: bool = Field(default=False)
+    # Denormalized counters, maintained by the write endpoints (see services/counters.py)
+    like_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    dislike_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    comment_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})  # Top-level only
 
 class Video(VideoBase, table=True):
+    # Feed orderings: home (upload_date), shorts, category and channel pages
+    __table_args__ = (
+        Index("ix_video_upload_date", "upload_date"),
+        Index("ix_video_is_short_upload_date", "is_short", "upload_date"),
+        Index("ix_video_category_upload_date", "category_id", "upload_date"),
+        Index("ix_video_uploader_upload_date", "uploader_id", "upload_date"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     category: Optional[Category] = Relationship(back_populates="videos")
     telegram_info: Optional["TelegramInfo"] = Relationship(back_populates="video")
@@ -87,8 +100,25 @@ class VideoPublic(VideoBase):
     is_short: bool = False
     model_config = ConfigDict(from_attributes=True)
 
+class VideoCard(SQLModel):
+    """What a video grid tile shows; list endpoints return this instead of VideoPublic."""
+    id: int
+    title: str
+    thumbnail_url: Optional[str] = None
+    duration: Optional[int] = None
+    views: int = 0
+    like_count: int = 0
+    upload_date: datetime
+    is_short: bool = False
+    category_id: Optional[int] = None
+    uploader_id: Optional[int] = None
+    category: Optional[CategoryPublic] = None  # id, name and slug only
+    uploader: Optional[UserPublic] = None
+
 class VideoSource(SQLModel, table=True):
     """Stores multiple external links for a single video."""
+    __table_args__ = (Index("ix_videosource_video_provider_resolution", "video_id", "provider", "resolution"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     video_id: int = Field(foreign_key="video.id", index=True)
     provider: str  # streamtape, doodstream, telegram
@@ -110,6 +140,9 @@ class TelegramInfo(SQLModel, table=True):
     file_size: Optional[int] = None
     mime_type: Optional[str] = None
     channel_message_id: Optional[int] = None
+    # Bot/channel that owns the message (None = primary bot, pre-sharding rows)
+    bot_id: Optional[str] = Field(default=None, index=True)
+    channel_id: Optional[int] = Field(default=None, sa_column=Column(BigInteger, nullable=True))
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
     
     video: Optional[Video] = Relationship(back_populates="telegram_info")
@@ -123,6 +156,9 @@ class VideoResolution(SQLModel, table=True):
     file_unique_id: str
     file_size: Optional[int] = None
     channel_message_id: Optional[int] = None
+    # Bot/channel that owns the message (None = primary bot, pre-sharding rows)
+    bot_id: Optional[str] = Field(default=None, index=True)
+    channel_id: Optional[int] = Field(default=None, sa_column=Column(BigInteger, nullable=True))
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
     video: Optional[Video] = Relationship(back_populates="resolutions")
@@ -153,6 +189,7 @@ class User(SQLModel, table=True):
     avatar_url: Optional[str] = None
     is_active: bool = True
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    subscriber_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})  # Denormalized
     
     # Relationships
     videos: List["Video"] = Relationship(back_populates="uploader")
@@ -160,6 +197,11 @@ class User(SQLModel, table=True):
 
 class Comment(SQLModel, table=True):
     """Video comments with optional Super Chat support."""
+    __table_args__ = (
+        Index("ix_comment_video_parent_created", "video_id", "parent_id", "created_at"),
+        Index("ix_comment_parent_created", "parent_id", "created_at", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     video_id: int = Field(foreign_key="video.id", index=True)
     user_id: int = Field(foreign_key="user.id", index=True)
@@ -183,6 +225,11 @@ class CommentLike(SQLModel, table=True):
 
 class VideoLike(SQLModel, table=True):
     """Like/dislike on videos."""
+    __table_args__ = (
+        Index("ix_videolike_video_is_like", "video_id", "is_like"),
+        Index("ix_videolike_user_video", "user_id", "video_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     video_id: int = Field(foreign_key="video.id", index=True)
     user_id: int = Field(foreign_key="user.id", index=True)
@@ -192,6 +239,12 @@ class VideoLike(SQLModel, table=True):
 
 class WatchHistory(SQLModel, table=True):
     """User's watch history with resume position."""
+    # One row per user/video — progress heartbeats upsert on this key
+    __table_args__ = (
+        Index("ux_watchhistory_user_video", "user_id", "video_id", unique=True),
+        Index("ix_watchhistory_user_completed_watched", "user_id", "completed", "watched_at"),
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     video_id: int = Field(foreign_key="video.id", index=True)
     user_id: int = Field(foreign_key="user.id", index=True)
@@ -203,6 +256,8 @@ class WatchHistory(SQLModel, table=True):
 
 class Subscription(SQLModel, table=True):
     """User subscriptions to channels (uploaders)."""
+    __table_args__ = (Index("ix_subscription_subscriber_channel", "subscriber_id", "channel_id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     subscriber_id: int = Field(foreign_key="user.id", index=True)
     channel_id: int = Field(foreign_key="user.id", index=True)  # The uploader
@@ -219,10 +274,13 @@ class Playlist(SQLModel, table=True):
     is_public: bool = True
     is_watch_later: bool = False  # Special "Watch Later" playlist
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    item_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})  # Denormalized
 
 
 class PlaylistItem(SQLModel, table=True):
     """Videos in a playlist."""
+    __table_args__ = (Index("ix_playlistitem_playlist_position", "playlist_id", "position"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     playlist_id: int = Field(foreign_key="playlist.id", index=True)
     video_id: int = Field(foreign_key="video.id", index=True)
@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlmodel import Session, select
 from ..database import get_session
 from ..models import User, AdminUser
+from ..services.loader import BatchLoader, get_loader
 from .auth import get_current_user
 import os
 import shutil
@@ -139,10 +140,6 @@ async def cleanup_storage(
                 logger.error(f"Failed to delete {path}: {e}")
                 
                 
-    # Invalidate cache after cleanup
-    from ..services.cache import app_cache
-    app_cache.invalidate()
-    
     return {"status": "success", "cleaned": cleaned}
 
 # System Settings Logic
@@ -220,72 +217,26 @@ async def get_ad_settings():
     return s.ad_settings
 
 # ============== Admin Video Management ==============
-from ..models import Video, VideoSource, TelegramInfo, VideoResolution, ViewHistory, Comment, CommentLike, VideoLike, WatchHistory, PlaylistItem
+from ..models import Video, VideoSource, TelegramInfo, VideoResolution, ViewHistory, Comment, CommentLike, VideoLike, WatchHistory, PlaylistItem, Playlist
+from ..services.cache import app_cache, video_tag
+from ..services.video_deletion import video_deleter
 from typing import Optional, List
 from sqlmodel import or_
 
-def _delete_video_references(session, video_id):
-    """Delete all records that reference a video (foreign keys)."""
-    # Delete comments: handle replies (self-referential FK) first
-    comments = session.exec(select(Comment).where(Comment.video_id == video_id)).all()
-    # Separate replies from top-level (delete replies first due to parent_id FK)
-    replies = [c for c in comments if c.parent_id is not None]
-    top_level = [c for c in comments if c.parent_id is None]
-    for c in replies:
-        c_likes = session.exec(select(CommentLike).where(CommentLike.comment_id == c.id)).all()
-        for cl in c_likes:
-            session.delete(cl)
-        session.delete(c)
-    for c in top_level:
-        c_likes = session.exec(select(CommentLike).where(CommentLike.comment_id == c.id)).all()
-        for cl in c_likes:
-            session.delete(cl)
-        session.delete(c)
-    # Delete video likes
-    v_likes = session.exec(select(VideoLike).where(VideoLike.video_id == video_id)).all()
-    for vl in v_likes:
-        session.delete(vl)
-    # Delete watch history
-    watches = session.exec(select(WatchHistory).where(WatchHistory.video_id == video_id)).all()
-    for w in watches:
-        session.delete(w)
-    # Delete view history
-    views = session.exec(select(ViewHistory).where(ViewHistory.video_id == video_id)).all()
-    for v in views:
-        session.delete(v)
-    # Delete playlist items
-    items = session.exec(select(PlaylistItem).where(PlaylistItem.video_id == video_id)).all()
-    for item in items:
-        session.delete(item)
-    # Delete video sources
-    sources = session.exec(select(VideoSource).where(VideoSource.video_id == video_id)).all()
-    deleted_sources = []
-    for s in sources:
-        deleted_sources.append(f"{s.provider}/{s.resolution or 'original'}")
-        session.delete(s)
-    # Delete telegram info
-    tg = session.exec(select(TelegramInfo).where(TelegramInfo.video_id == video_id)).first()
-    if tg:
-        session.delete(tg)
-    # Delete resolutions
-    resolutions = session.exec(select(VideoResolution).where(VideoResolution.video_id == video_id)).all()
-    for r in resolutions:
-        session.delete(r)
-    return deleted_sources
-
-
 @router.get("/videos")
 async def admin_list_videos(
     skip: int = 0,
     limit: int = 20,
     session: Session = Depends(get_session),
+    loader: BatchLoader = Depends(get_loader),
     current_user: User = Depends(get_current_user)
 ):
     """List all videos with sources for admin."""
     videos = session.exec(select(Video).offset(skip).limit(limit)).all()
+    sources_by_video = loader.load_groups_sync(session, VideoSource.video_id, [v.id for v in videos])
     result = []
     for v in videos:
-        sources = session.exec(select(VideoSource).where(VideoSource.video_id == v.id)).all()
+        sources = sources_by_video[v.id]
         source_list = [{"id": s.id, "provider": s.provider, "resolution": s.resolution or "original"} for s in sources]
         result.append({
             "id": v.id,
@@ -305,6 +256,7 @@ async def admin_search_videos(
     skip: int = 0,
     limit: int = 20,
     session: Session = Depends(get_session),
+    loader: BatchLoader = Depends(get_loader),
     current_user: User = Depends(get_current_user)
 ):
     """Search videos by title with fuzzy keyword matching."""
@@ -318,9 +270,10 @@ async def admin_search_videos(
         query = query.where(Video.title.ilike(f"%{kw}%"))
     
     videos = session.exec(query.offset(skip).limit(limit)).all()
+    sources_by_video = loader.load_groups_sync(session, VideoSource.video_id, [v.id for v in videos])
     result = []
     for v in videos:
-        sources = session.exec(select(VideoSource).where(VideoSource.video_id == v.id)).all()
+        sources = sources_by_video[v.id]
         source_list = [{"id": s.id, "provider": s.provider, "resolution": s.resolution or "original"} for s in sources]
         result.append({
             "id": v.id,
@@ -375,6 +328,7 @@ async def admin_delete_video(
             for r in resolutions:
                 session.delete(r)
         session.commit()
+        app_cache.invalidate_tags(video_tag(video_id))
         remaining = session.exec(select(VideoSource).where(VideoSource.video_id == video_id)).all()
         return {
             "status": "success",
@@ -403,6 +357,7 @@ async def admin_delete_video(
             for r in resolutions:
                 session.delete(r)
         session.commit()
+        app_cache.invalidate_tags(video_tag(video_id))
         remaining = session.exec(select(VideoSource).where(VideoSource.video_id == video_id)).all()
         return {
             "status": "success",
@@ -413,28 +368,13 @@ async def admin_delete_video(
         }
 
     else:
-        # Full delete: remove everything
-        deleted_sources = _delete_video_references(session, video_id)
-        # Delete thumbnail file
-        if video.thumbnail_url:
-            thumb_path = video.thumbnail_url.replace("/thumbnails/", "backend/thumbnails/")
-            if os.path.exists(thumb_path):
-                try:
-                    os.remove(thumb_path)
-                except Exception as e:
-                    logger.error(f"Failed to delete thumbnail: {e}")
-        # Delete video record
-        session.delete(video)
-        session.commit()
-        
-        # Invalidate cache after delete
-        from ..services.cache import app_cache
-        app_cache.invalidate("videos_skip_0")
+        # Full delete: remove everything (set-based, thumbnail removed by the cleanup worker)
+        result = video_deleter.delete_now(session, [video_id])
         
         return {
             "status": "success",
             "mode": "full",
-            "deleted_sources": deleted_sources,
+            "deleted_sources": result["deleted_sources"],
             "remaining_sources": 0,
             "video_deleted": True
         }
@@ -442,32 +382,75 @@ async def admin_delete_video(
 
 @router.delete("/videos/all")
 async def admin_delete_all_videos(
+    response: Response,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """Delete ALL videos from the platform. Destructive operation."""
-    videos = session.exec(select(Video)).all()
-    count = len(videos)
-    
-    for video in videos:
-        _delete_video_references(session, video.id)
-        # Clean thumbnail
-        if video.thumbnail_url:
-            thumb_path = video.thumbnail_url.replace("/thumbnails/", "backend/thumbnails/")
-            if os.path.exists(thumb_path):
-                try:
-                    os.remove(thumb_path)
-                except Exception:
-                    pass
-        session.delete(video)
+    """
+    Delete ALL videos from the platform. Destructive operation.
+    More than one batch of videos runs as a background job (202 + job_id);
+    poll GET /admin/jobs/{job_id} for progress.
+    """
+    video_ids = session.exec(select(Video.id)).all()
     
-    session.commit()
+    if len(video_ids) > video_deleter.batch_size:
+        job = video_deleter.submit(video_ids)
+        response.status_code = 202
+        return {"status": "accepted", "deleted_count": 0, **job.to_dict()}
     
-    # Invalidate EVERYTHING after deleting all videos
-    from ..services.cache import app_cache
-    app_cache.invalidate()
+    video_deleter.delete_now(session, video_ids)
     
-    return {"status": "success", "deleted_count": count}
+    return {"status": "success", "deleted_count": len(video_ids)}
+
+
+@router.get("/jobs/{job_id}")
+async def admin_get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Progress of a background delete job."""
+    job = video_deleter.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.get("/cache/stats")
+async def admin_cache_stats(current_user: User = Depends(get_current_user)):
+    """Response cache size, hit/miss ratio, evictions and in-flight computations, plus HTTP revalidation savings, prebuilt feeds, the signed-in user cache, password hashing and the DB breaker."""
+    from ..services.cache import user_cache
+    from ..services.password_hasher import password_hasher
+    from ..services.db_health import db_health
+    from ..services.feed_refresher import feed_refresher
+    from ..services.http_cache import http_cache_stats
+    return {
+        **app_cache.stats(),
+        "http": http_cache_stats.to_dict(),
+        "feeds": feed_refresher.stats(),
+        "users": user_cache.stats(),
+        "auth_hashing": password_hasher.stats(),
+        "database": db_health.stats(),
+    }
+
+
+@router.get("/db/pool")
+async def admin_db_pool_stats(current_user: User = Depends(get_current_user)):
+    """Connection pools: size, checked-out and overflow counts, checkout wait histogram, hold time per route and auto-sizing."""
+    from ..services.db_pool import pool_monitor
+    return pool_monitor.stats()
+
+
+@router.post("/counters/reconcile")
+async def admin_reconcile_counters(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Recompute denormalized like/comment/subscriber/playlist counters from source rows."""
+    from ..services.counters import reconcile_counters
+    fixed = reconcile_counters(session)
+    if fixed is None:
+        return {"status": "busy", "detail": "A reconcile is already running"}
+    return {"status": "success", "fixed": fixed}
 
 
 @router.post("/reprocess/{video_id}")
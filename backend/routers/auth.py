@@ -5,14 +5,20 @@ Handles user registration, login, and token refresh.
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel, EmailStr
 import jwt  # PyJWT
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
 import os
 
-from ..database import get_session
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+
+from ..database import get_session, get_async_session
 from ..models import User, Playlist
+from ..services.cache import user_cache, user_tag
+from ..services.password_hasher import password_hasher
 
 router = APIRouter(
     prefix="/auth",
@@ -23,8 +29,8 @@ router = APIRouter(
 SECRET_KEY = os.getenv("JWT_SECRET_KEY") or os.getenv("SECRET_KEY") or "your-super-secret-key-change-in-production"
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", str(60 * 24 * 7)))  # Default: 7 days
+USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
 
-import bcrypt
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
 
@@ -56,17 +62,13 @@ class UserPublic(BaseModel):
 
 
 # Helper functions
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    # Bcrypt has 72 byte limit - truncate password
-    password_bytes = plain_password.encode('utf-8')[:72]
-    return bcrypt.checkpw(password_bytes, hashed_password.encode('utf-8'))
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    # bcrypt runs on its own bounded pool, never on the event loop (see password_hasher)
+    return await password_hasher.verify(plain_password, hashed_password)
 
 
-def get_password_hash(password: str) -> str:
-    # Bcrypt has 72 byte limit - truncate password
-    password_bytes = password.encode('utf-8')[:72]
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password_bytes, salt).decode('utf-8')
+async def get_password_hash(password: str) -> str:
+    return await password_hasher.hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -76,25 +78,82 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    session: Session = Depends(get_session)
-) -> Optional[User]:
-    """Get current user from JWT token. Returns None if not authenticated."""
+class TokenUser(NamedTuple):
+    """Who a token says its bearer is, without looking anything up."""
+    id: int
+    username: Optional[str] = None
+
+
+def _token_claims(token: Optional[str]) -> Optional[TokenUser]:
     if not token:
         return None
-    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id_str = payload.get("sub")
         if user_id_str is None:
             return None
-        user_id = int(user_id_str)  # Convert string back to int
+        return TokenUser(id=int(user_id_str), username=payload.get("username"))  # sub is a string for PyJWT
     except (jwt.PyJWTError, ValueError):
         return None
-    
-    user = session.get(User, user_id)
-    return user
+
+
+def _snapshot(user: User) -> dict:
+    # Everything but the password hash, which never needs to leave the database
+    # (cached users come back with an empty one; login reads the real row)
+    return user.model_dump(mode="json", exclude={"password_hash"})
+
+
+def forget_user(user_id: int):
+    """Drop a cached user (every worker's copy) so the next request reloads it."""
+    user_cache.invalidate_tags(user_tag(user_id))
+
+
+# Profile edits and deactivation go through the ORM: note changed users at
+# flush, forget them once committed (earlier, a concurrent request could cache
+# the old row again). Counter UPDATEs (subscriber_count) don't count.
+@event.listens_for(OrmSession, "after_flush")
+def _note_changed_users(session, flush_context):
+    changed = {obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User) and obj.id}
+    if changed:
+        session.info.setdefault("changed_users", set()).update(changed)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _forget_changed_users(session):
+    for user_id in session.info.pop("changed_users", ()):
+        forget_user(user_id)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("changed_users", None)
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    session: AsyncSession = Depends(get_async_session)
+) -> Optional[User]:
+    """
+    Get current user from JWT token. Returns None if not authenticated or deactivated.
+
+    Users are cached for USER_CACHE_TTL seconds, so a signed-in request on a
+    warm cache doesn't touch the database; the AsyncSession only checks out a
+    connection if the user has to be loaded. The returned User is detached:
+    read its fields, don't add it to a session.
+    """
+    claims = _token_claims(token)
+    if claims is None:
+        return None
+
+    async def load_user():
+        user = await session.get(User, claims.id)
+        return _snapshot(user) if user else None
+
+    data = await user_cache.get_or_compute(str(claims.id), load_user, ttl=USER_CACHE_TTL,
+                                           tags=[user_tag(claims.id)])
+    if data is None or not data.get("is_active", True):
+        return None
+    return User.model_validate({**data, "password_hash": ""})
 
 
 async def require_user(
@@ -110,6 +169,16 @@ async def require_user(
     return current_user
 
 
+async def get_token_user(token: str = Depends(oauth2_scheme)) -> Optional[TokenUser]:
+    """
+    The caller's id straight from the token's claims: no cache, no database.
+    For read-only endpoints that only need "whose state is this" (vote and
+    resume flags, user_liked on comments). A deactivated account keeps
+    passing this until its token expires, so don't use it to authorize writes.
+    """
+    return _token_claims(token)
+
+
 # Endpoints
 @router.post("/register", response_model=UserPublic)
 async def register(
@@ -139,7 +208,7 @@ async def register(
         user = User(
             username=user_data.username,
             email=user_data.email,
-            password_hash=get_password_hash(user_data.password),
+            password_hash=await get_password_hash(user_data.password),
             display_name=user_data.display_name or user_data.username
         )
         session.add(user)
@@ -181,7 +250,7 @@ async def login(
         )
     ).first()
     
-    if not user or not verify_password(form_data.password, user.password_hash):
+    if not user or not await verify_password(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email/username or password",
@@ -192,7 +261,7 @@ async def login(
         raise HTTPException(status_code=400, detail="Account is deactivated")
     
     # Create token - sub must be string for PyJWT
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = create_access_token(data={"sub": str(user.id), "username": user.username})
     
     return {"access_token": access_token, "token_type": "bearer"}
 
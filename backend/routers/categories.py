@@ -3,6 +3,7 @@ from sqlmodel import Session, select
 from typing import List
 from ..database import get_session
 from ..models import Category, CategoryPublic, CategoryBase
+from ..services.cache import CATEGORIES, app_cache, category_tag
 import re
 
 router = APIRouter(
@@ -28,6 +29,7 @@ async def create_category(
     session.add(db_category)
     session.commit()
     session.refresh(db_category)
+    app_cache.invalidate_tags(CATEGORIES)
     return db_category
 
 @router.delete("/{category_id}")
@@ -41,6 +43,7 @@ async def delete_category(
         
     session.delete(category)
     session.commit()
+    app_cache.invalidate_tags(CATEGORIES, category_tag(category_id))  # Also re-indexes its videos for search, in every worker
     return {"ok": True}
 
 @router.put("/{category_id}", response_model=CategoryPublic)
@@ -60,4 +63,5 @@ async def update_category(
     session.add(db_category)
     session.commit()
     session.refresh(db_category)
+    app_cache.invalidate_tags(CATEGORIES, category_tag(category_id))  # Also re-indexes its videos for search, in every worker
     return db_category
@@ -2,14 +2,27 @@
 Comments Router - Handles video comments with Super Chat support.
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Dict, List, Optional, Set, Union
 from datetime import datetime
+from sqlalchemy import func
 
-from ..database import get_session
+from ..database import get_async_session
 from ..models import Comment, CommentLike, Video, User
-from .auth import get_current_user, require_user
+from ..services.cache import app_cache, video_tag
+from ..services.counters import increment
+from ..services.loader import BatchLoader, get_loader
+from ..services.pagination import encode_cursor, paginate, page_results
+from .auth import TokenUser, get_token_user, require_user
+
+# Super chats first, then newest; id breaks ties
+COMMENT_KEYSET = (Comment.is_super_chat, Comment.created_at, Comment.id)
+# Replies read oldest first, like a conversation
+REPLY_KEYSET = (Comment.created_at, Comment.id)
+# Replies embedded under each top-level comment; the rest via GET /{id}/replies
+REPLIES_PER_THREAD = 10
 
 router = APIRouter(
     prefix="/comments",
@@ -44,7 +57,9 @@ class CommentResponse(BaseModel):
     is_edited: bool
     created_at: datetime
     user: Optional[dict] = None
+    user_liked: bool = False
     replies: List["CommentResponse"] = []
+    replies_next_cursor: Optional[str] = None
 
 
 # Endpoints
@@ -53,62 +68,93 @@ async def get_video_comments(
     video_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, le=100),
-    session: Session = Depends(get_session),
-    current_user: Optional[User] = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session),
+    loader: BatchLoader = Depends(get_loader),
+    current_user: Optional[TokenUser] = Depends(get_token_user)
 ):
-    """Get all comments for a video with replies."""
+    """Get a page of top-level comments, each with its first replies."""
     # Check video exists
-    video = session.get(Video, video_id)
+    video = await session.get(Video, video_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     
+    return await load_comment_page(session, loader, video_id, video.comment_count, current_user, skip, limit, cursor)
+
+
+async def load_comment_page(
+    session: AsyncSession,
+    loader: BatchLoader,
+    video_id: int,
+    total: int,
+    current_user: Optional[Union[User, TokenUser]] = None,
+    skip: int = 0,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> dict:
+    """The GET /comments/video/{id} body, for callers that already know the video exists (e.g. /videos/{id}/page)."""
     # Get top-level comments (parent_id is None)
-    comments = session.exec(
+    rows = (await session.exec(paginate(
         select(Comment)
         .where(Comment.video_id == video_id)
-        .where(Comment.parent_id == None)
-        .order_by(Comment.is_super_chat.desc())  # Super chats first
-        .order_by(Comment.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-    ).all()
+        .where(Comment.parent_id == None),
+        COMMENT_KEYSET, cursor, skip, limit
+    ))).all()
+    comments, next_cursor = page_results(rows, COMMENT_KEYSET, limit)
     
-    # Build response with user info and replies
-    result = []
-    for comment in comments:
-        comment_data = build_comment_response(comment, session, current_user)
-        result.append(comment_data)
-    
-    # Get total count
-    total = len(session.exec(
-        select(Comment)
-        .where(Comment.video_id == video_id)
-        .where(Comment.parent_id == None)
-    ).all())
+    result = await build_comment_responses(comments, session, loader, current_user)
     
     return {
         "comments": result,
         "total": total,
         "skip": skip,
-        "limit": limit
+        "limit": limit,
+        "next_cursor": next_cursor
+    }
+
+
+@router.get("/{comment_id}/replies")
+async def get_comment_replies(
+    comment_id: int,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_async_session),
+    loader: BatchLoader = Depends(get_loader),
+    current_user: Optional[TokenUser] = Depends(get_token_user)
+):
+    """Page through a thread's replies, oldest first. Pass a comment's replies_next_cursor to continue it."""
+    parent = await session.get(Comment, comment_id)
+    if not parent:
+        raise HTTPException(status_code=404, detail="Comment not found")
+    
+    rows = (await session.exec(paginate(
+        select(Comment).where(Comment.parent_id == comment_id),
+        REPLY_KEYSET, cursor, 0, limit, ascending=True
+    ))).all()
+    replies, next_cursor = page_results(rows, REPLY_KEYSET, limit)
+    
+    return {
+        "replies": await build_comment_responses(replies, session, loader, current_user, with_replies=False),
+        "next_cursor": next_cursor
     }
 
 
 @router.post("/", status_code=201)
 async def create_comment(
     comment_data: CommentCreate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
+    loader: BatchLoader = Depends(get_loader),
     current_user: User = Depends(require_user)
 ):
     """Create a new comment. Requires authentication."""
     # Check video exists
-    video = session.get(Video, comment_data.video_id)
+    video = await session.get(Video, comment_data.video_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     
     # Check parent comment exists if replying
     if comment_data.parent_id:
-        parent = session.get(Comment, comment_data.parent_id)
+        parent = await session.get(Comment, comment_data.parent_id)
         if not parent or parent.video_id != comment_data.video_id:
             raise HTTPException(status_code=400, detail="Invalid parent comment")
     
@@ -138,21 +184,26 @@ async def create_comment(
         super_chat_color=comment_data.super_chat_color
     )
     session.add(comment)
-    session.commit()
-    session.refresh(comment)
+    if not comment_data.parent_id:
+        await session.execute(increment(Video, video.id, comment_count=1))
+    await session.commit()
+    await session.refresh(comment)
+    if not comment_data.parent_id:
+        app_cache.invalidate_tags(video_tag(video.id))  # comment_count changed
     
-    return build_comment_response(comment, session, current_user)
+    return (await build_comment_responses([comment], session, loader, current_user))[0]
 
 
 @router.put("/{comment_id}")
 async def update_comment(
     comment_id: int,
     update_data: CommentUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
+    loader: BatchLoader = Depends(get_loader),
     current_user: User = Depends(require_user)
 ):
     """Update a comment. Only owner can update."""
-    comment = session.get(Comment, comment_id)
+    comment = await session.get(Comment, comment_id)
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     
@@ -162,20 +213,20 @@ async def update_comment(
     comment.content = update_data.content
     comment.is_edited = True
     session.add(comment)
-    session.commit()
-    session.refresh(comment)
+    await session.commit()
+    await session.refresh(comment)
     
-    return build_comment_response(comment, session, current_user)
+    return (await build_comment_responses([comment], session, loader, current_user))[0]
 
 
 @router.delete("/{comment_id}")
 async def delete_comment(
     comment_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_user)
 ):
     """Delete a comment. Only owner can delete."""
-    comment = session.get(Comment, comment_id)
+    comment = await session.get(Comment, comment_id)
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     
@@ -183,21 +234,25 @@ async def delete_comment(
         raise HTTPException(status_code=403, detail="Not authorized to delete this comment")
     
     # Delete replies first
-    replies = session.exec(
+    replies = (await session.exec(
         select(Comment).where(Comment.parent_id == comment_id)
-    ).all()
+    )).all()
     for reply in replies:
-        session.delete(reply)
+        await session.delete(reply)
     
     # Delete comment likes
-    likes = session.exec(
+    likes = (await session.exec(
         select(CommentLike).where(CommentLike.comment_id == comment_id)
-    ).all()
+    )).all()
     for like in likes:
-        session.delete(like)
+        await session.delete(like)
     
-    session.delete(comment)
-    session.commit()
+    await session.delete(comment)
+    if comment.parent_id is None:
+        await session.execute(increment(Video, comment.video_id, comment_count=-1))
+    await session.commit()
+    if comment.parent_id is None:
+        app_cache.invalidate_tags(video_tag(comment.video_id))
     
     return {"message": "Comment deleted"}
 
@@ -205,25 +260,25 @@ async def delete_comment(
 @router.post("/{comment_id}/like")
 async def like_comment(
     comment_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_user)
 ):
     """Like/unlike a comment (toggle)."""
-    comment = session.get(Comment, comment_id)
+    comment = await session.get(Comment, comment_id)
     if not comment:
         raise HTTPException(status_code=404, detail="Comment not found")
     
     # Check if already liked
-    existing = session.exec(
+    existing = (await session.exec(
         select(CommentLike)
         .where(CommentLike.comment_id == comment_id)
         .where(CommentLike.user_id == current_user.id)
-    ).first()
+    )).first()
     
     if existing:
         # Unlike
-        session.delete(existing)
-        comment.likes_count = max(0, comment.likes_count - 1)
+        await session.delete(existing)
+        await session.execute(increment(Comment, comment_id, likes_count=-1))
         action = "unliked"
     else:
         # Like
@@ -232,64 +287,27 @@ async def like_comment(
             user_id=current_user.id
         )
         session.add(like)
-        comment.likes_count += 1
+        await session.execute(increment(Comment, comment_id, likes_count=1))
         action = "liked"
     
-    session.add(comment)
-    session.commit()
+    await session.commit()
     
     return {"action": action, "likes_count": comment.likes_count}
 
 
 # Helper functions
-def build_comment_response(comment: Comment, session: Session, current_user: Optional[User] = None) -> dict:
-    """Build comment response with user info and replies."""
-    # Get user info
-    user = session.get(User, comment.user_id)
-    user_data = None
-    if user:
-        user_data = {
-            "id": user.id,
-            "username": user.username,
-            "display_name": user.display_name,
-            "avatar_url": user.avatar_url
-        }
-    
-    # Get replies (first level only)
-    replies = session.exec(
-        select(Comment)
-        .where(Comment.parent_id == comment.id)
-        .order_by(Comment.created_at.asc())
-        .limit(10)
-    ).all()
-    
-    reply_data = []
-    for reply in replies:
-        reply_user = session.get(User, reply.user_id)
-        reply_user_data = None
-        if reply_user:
-            reply_user_data = {
-                "id": reply_user.id,
-                "username": reply_user.username,
-                "display_name": reply_user.display_name,
-                "avatar_url": reply_user.avatar_url
-            }
-        reply_data.append({
-            "id": reply.id,
-            "video_id": reply.video_id,
-            "user_id": reply.user_id,
-            "parent_id": reply.parent_id,
-            "content": reply.content,
-            "is_super_chat": reply.is_super_chat,
-            "super_chat_amount": reply.super_chat_amount,
-            "super_chat_color": reply.super_chat_color,
-            "likes_count": reply.likes_count,
-            "is_edited": reply.is_edited,
-            "created_at": reply.created_at.isoformat(),
-            "user": reply_user_data,
-            "replies": []
-        })
-    
+def _user_data(user: Optional[User]) -> Optional[dict]:
+    if not user:
+        return None
+    return {
+        "id": user.id,
+        "username": user.username,
+        "display_name": user.display_name,
+        "avatar_url": user.avatar_url
+    }
+
+
+def _comment_data(comment: Comment, users: Dict[int, User], liked: Set[int]) -> dict:
     return {
         "id": comment.id,
         "video_id": comment.video_id,
@@ -302,6 +320,79 @@ def build_comment_response(comment: Comment, session: Session, current_user: Opt
         "likes_count": comment.likes_count,
         "is_edited": comment.is_edited,
         "created_at": comment.created_at.isoformat(),
-        "user": user_data,
-        "replies": reply_data
+        "user": _user_data(users.get(comment.user_id)),
+        "user_liked": comment.id in liked,
+        "replies": []
     }
+
+
+async def _load_reply_threads(session: AsyncSession, parent_ids: List[int]) -> Dict[int, List[Comment]]:
+    """
+    The first REPLIES_PER_THREAD + 1 replies of every thread in one query
+    (row_number() per parent); the extra row tells whether a thread has more.
+    """
+    threads: Dict[int, List[Comment]] = {pid: [] for pid in parent_ids}
+    if not parent_ids:
+        return threads
+    ranked = (
+        select(
+            Comment.id,
+            func.row_number().over(
+                partition_by=Comment.parent_id,
+                order_by=(Comment.created_at, Comment.id)
+            ).label("rn")
+        )
+        .where(Comment.parent_id.in_(parent_ids))
+        .subquery()
+    )
+    replies = (await session.exec(
+        select(Comment)
+        .join(ranked, ranked.c.id == Comment.id)
+        .where(ranked.c.rn <= REPLIES_PER_THREAD + 1)
+        .order_by(Comment.parent_id, Comment.created_at, Comment.id)
+    )).all()
+    for reply in replies:
+        threads[reply.parent_id].append(reply)
+    return threads
+
+
+async def _liked_comment_ids(session: AsyncSession, current_user: Optional[Union[User, TokenUser]], comment_ids: List[int]) -> Set[int]:
+    if not current_user or not comment_ids:
+        return set()
+    return set((await session.exec(
+        select(CommentLike.comment_id)
+        .where(CommentLike.user_id == current_user.id)
+        .where(CommentLike.comment_id.in_(comment_ids))
+    )).all())
+
+
+async def build_comment_responses(
+    comments: List[Comment],
+    session: AsyncSession,
+    loader: BatchLoader,
+    current_user: Optional[Union[User, TokenUser]] = None,
+    with_replies: bool = True
+) -> List[dict]:
+    """
+    Serialize comments with their first page of replies, authors and the
+    current user's like flags, using a fixed number of queries for any page.
+    """
+    threads = await _load_reply_threads(session, [c.id for c in comments]) if with_replies else {}
+    replies = [r for thread in threads.values() for r in thread[:REPLIES_PER_THREAD]]
+    everything = list(comments) + replies
+
+    users = await loader.load_many(session, User, [c.user_id for c in everything])
+    liked = await _liked_comment_ids(session, current_user, [c.id for c in everything])
+
+    result = []
+    for comment in comments:
+        data = _comment_data(comment, users, liked)
+        if with_replies:
+            thread = threads[comment.id]
+            shown = thread[:REPLIES_PER_THREAD]
+            data["replies"] = [_comment_data(r, users, liked) for r in shown]
+            data["replies_next_cursor"] = (
+                encode_cursor(shown[-1].created_at, shown[-1].id) if len(thread) > REPLIES_PER_THREAD else None
+            )
+        result.append(data)
+    return result
@@ -2,14 +2,18 @@
 Watch History Router - Track user watch progress and history.
 """
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from pydantic import BaseModel
 from typing import Optional, List
-from datetime import datetime
 
-from ..database import get_session
+from ..database import get_async_session
+from ..services.db_health import DatabaseUnavailable
 from ..models import WatchHistory, Video, User
-from .auth import get_current_user, require_user
+from ..services.cache import app_cache, video_tag
+from ..services.loader import BatchLoader, get_loader
+from ..services.progress_buffer import progress_buffer
+from .auth import TokenUser, get_token_user, require_user
 
 router = APIRouter(
     prefix="/history",
@@ -26,61 +30,48 @@ class ProgressUpdate(BaseModel):
 @router.post("/")
 async def update_watch_progress(
     data: ProgressUpdate,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_user)
 ):
-    """Update watch progress for a video."""
-    video = session.get(Video, data.video_id)
-    if not video:
-        raise HTTPException(status_code=404, detail="Video not found")
+    """Update watch progress for a video. Buffered and flushed in batches (see progress_buffer)."""
+    async def video_exists():
+        if await session.get(Video, data.video_id) is None:
+            raise HTTPException(status_code=404, detail="Video not found")  # Not cached
+        return True
+
+    try:
+        # Heartbeats arrive every few seconds per viewer; with the user cached
+        # too, a warm heartbeat never checks out a connection
+        await app_cache.get_or_compute(f"video_exists_{data.video_id}", video_exists, ttl=600,
+                                       tags=[video_tag(data.video_id)])
+    except DatabaseUnavailable:
+        # Queue it anyway; the flush skips videos that don't exist
+        progress_buffer.record(current_user.id, data.video_id, data.progress_seconds, data.completed)
+        return {"status": "queued", "progress_seconds": data.progress_seconds}
     
-    # Find existing history entry
-    existing = session.exec(
-        select(WatchHistory)
-        .where(WatchHistory.video_id == data.video_id)
-        .where(WatchHistory.user_id == current_user.id)
-    ).first()
-    
-    if existing:
-        # Update existing
-        existing.progress_seconds = data.progress_seconds
-        existing.watched_at = datetime.utcnow()
-        if data.completed:
-            existing.completed = True
-        existing.duration_watched += 10  # Approximate
-        session.add(existing)
-    else:
-        # Create new
-        history = WatchHistory(
-            video_id=data.video_id,
-            user_id=current_user.id,
-            progress_seconds=data.progress_seconds,
-            completed=data.completed,
-            duration_watched=data.progress_seconds
-        )
-        session.add(history)
-    
-    session.commit()
+    progress_buffer.record(current_user.id, data.video_id, data.progress_seconds, data.completed)
     return {"status": "saved", "progress_seconds": data.progress_seconds}
 
 
 @router.get("/")
 async def get_watch_history(
     limit: int = 50,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
+    loader: BatchLoader = Depends(get_loader),
     current_user: User = Depends(require_user)
 ):
     """Get user's watch history."""
-    history = session.exec(
+    history = (await session.exec(
         select(WatchHistory)
         .where(WatchHistory.user_id == current_user.id)
         .order_by(WatchHistory.watched_at.desc())
         .limit(limit)
-    ).all()
+    )).all()
     
+    videos = await loader.load_many(session, Video, [entry.video_id for entry in history])
     result = []
     for entry in history:
-        video = session.get(Video, entry.video_id)
+        video = videos.get(entry.video_id)
         if video:
             result.append({
                 "id": entry.id,
@@ -99,22 +90,24 @@ async def get_watch_history(
 @router.get("/continue")
 async def get_continue_watching(
     limit: int = 10,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
+    loader: BatchLoader = Depends(get_loader),
     current_user: User = Depends(require_user)
 ):
     """Get videos to continue watching (not completed)."""
-    history = session.exec(
+    history = (await session.exec(
         select(WatchHistory)
         .where(WatchHistory.user_id == current_user.id)
         .where(WatchHistory.completed == False)
         .where(WatchHistory.progress_seconds > 30)  # At least 30s watched
         .order_by(WatchHistory.watched_at.desc())
         .limit(limit)
-    ).all()
+    )).all()
     
+    videos = await loader.load_many(session, Video, [entry.video_id for entry in history])
     result = []
     for entry in history:
-        video = session.get(Video, entry.video_id)
+        video = videos.get(entry.video_id)
         if video:
             result.append({
                 "video_id": video.id,
@@ -131,18 +124,23 @@ async def get_continue_watching(
 @router.get("/video/{video_id}")
 async def get_video_progress(
     video_id: int,
-    session: Session = Depends(get_session),
-    current_user: Optional[User] = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Optional[TokenUser] = Depends(get_token_user)
 ):
     """Get progress for a specific video."""
     if not current_user:
         return {"progress_seconds": 0, "completed": False}
     
-    entry = session.exec(
+    # Heartbeats not yet flushed are the most recent state
+    buffered = progress_buffer.get(current_user.id, video_id)
+    if buffered:
+        return buffered
+    
+    entry = (await session.exec(
         select(WatchHistory)
         .where(WatchHistory.video_id == video_id)
         .where(WatchHistory.user_id == current_user.id)
-    ).first()
+    )).first()
     
     if entry:
         return {
@@ -156,34 +154,36 @@ async def get_video_progress(
 @router.delete("/{history_id}")
 async def delete_history_entry(
     history_id: int,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_user)
 ):
     """Remove a video from watch history."""
-    entry = session.get(WatchHistory, history_id)
+    entry = await session.get(WatchHistory, history_id)
     if not entry:
         raise HTTPException(status_code=404, detail="History entry not found")
     
     if entry.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    session.delete(entry)
-    session.commit()
+    progress_buffer.discard(current_user.id, entry.video_id)
+    await session.delete(entry)
+    await session.commit()
     return {"message": "Removed from history"}
 
 
 @router.delete("/")
 async def clear_history(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_user)
 ):
     """Clear all watch history."""
-    entries = session.exec(
+    progress_buffer.discard(current_user.id)
+    entries = (await session.exec(
         select(WatchHistory).where(WatchHistory.user_id == current_user.id)
-    ).all()
+    )).all()
     
     for entry in entries:
-        session.delete(entry)
+        await session.delete(entry)
     
-    session.commit()
+    await session.commit()
     return {"message": f"Cleared {len(entries)} entries"}
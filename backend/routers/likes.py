@@ -2,13 +2,17 @@
 Video Likes Router - Like/Dislike videos.
 """
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional
 from datetime import datetime
 
-from ..database import get_session
+from ..database import get_async_session
 from ..models import VideoLike, Video, User
-from .auth import get_current_user, require_user
+from ..services.cache import app_cache, video_tag
+from ..services.counters import increment
+from ..services.loader import BatchLoader, get_loader
+from .auth import TokenUser, get_token_user, require_user
 
 router = APIRouter(
     prefix="/likes",
@@ -16,36 +20,44 @@ router = APIRouter(
 )
 
 
+def _counter(is_like: bool) -> str:
+    return "like_count" if is_like else "dislike_count"
+
+
 @router.post("/video/{video_id}")
 async def like_video(
     video_id: int,
     is_like: bool = True,  # True=like, False=dislike
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(require_user)
 ):
     """Like or dislike a video. Toggle if already liked/disliked."""
-    video = session.get(Video, video_id)
+    video = await session.get(Video, video_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     
     # Check if already liked/disliked
-    existing = session.exec(
+    existing = (await session.exec(
         select(VideoLike)
         .where(VideoLike.video_id == video_id)
         .where(VideoLike.user_id == current_user.id)
-    ).first()
+    )).first()
     
     if existing:
         if existing.is_like == is_like:
             # Same action - remove like/dislike (toggle off)
-            session.delete(existing)
-            session.commit()
+            await session.delete(existing)
+            await session.execute(increment(Video, video_id, **{_counter(is_like): -1}))
+            await session.commit()
+            app_cache.invalidate_tags(video_tag(video_id))
             return {"action": "removed", "video_id": video_id}
         else:
             # Different action - switch from like to dislike or vice versa
             existing.is_like = is_like
             session.add(existing)
-            session.commit()
+            await session.execute(increment(Video, video_id, **{_counter(is_like): 1, _counter(not is_like): -1}))
+            await session.commit()
+            app_cache.invalidate_tags(video_tag(video_id))
             return {
                 "action": "switched",
                 "is_like": is_like,
@@ -59,7 +71,9 @@ async def like_video(
             is_like=is_like
         )
         session.add(video_like)
-        session.commit()
+        await session.execute(increment(Video, video_id, **{_counter(is_like): 1}))
+        await session.commit()
+        app_cache.invalidate_tags(video_tag(video_id))
         return {
             "action": "added",
             "is_like": is_like,
@@ -70,64 +84,53 @@ async def like_video(
 @router.get("/video/{video_id}/status")
 async def get_like_status(
     video_id: int,
-    session: Session = Depends(get_session),
-    current_user: Optional[User] = Depends(get_current_user)
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Optional[TokenUser] = Depends(get_token_user)
 ):
     """Get like/dislike status and counts for a video."""
-    video = session.get(Video, video_id)
+    video = await session.get(Video, video_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     
-    # Count likes and dislikes
-    likes = len(session.exec(
-        select(VideoLike)
-        .where(VideoLike.video_id == video_id)
-        .where(VideoLike.is_like == True)
-    ).all())
-    
-    dislikes = len(session.exec(
-        select(VideoLike)
-        .where(VideoLike.video_id == video_id)
-        .where(VideoLike.is_like == False)
-    ).all())
-    
     # Check user's status
     user_liked = None
     if current_user:
-        user_vote = session.exec(
+        user_vote = (await session.exec(
             select(VideoLike)
             .where(VideoLike.video_id == video_id)
             .where(VideoLike.user_id == current_user.id)
-        ).first()
+        )).first()
         if user_vote:
             user_liked = user_vote.is_like
     
     return {
         "video_id": video_id,
-        "likes": likes,
-        "dislikes": dislikes,
+        "likes": video.like_count,
+        "dislikes": video.dislike_count,
         "user_liked": user_liked  # True=liked, False=disliked, None=no vote
     }
 
 
 @router.get("/user/liked")
 async def get_user_liked_videos(
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
+    loader: BatchLoader = Depends(get_loader),
     current_user: User = Depends(require_user)
 ):
     """Get all videos liked by the current user."""
-    likes = session.exec(
+    likes = (await session.exec(
         select(VideoLike)
         .where(VideoLike.user_id == current_user.id)
         .where(VideoLike.is_like == True)
         .order_by(VideoLike.created_at.desc())
-    ).all()
+    )).all()
     
     video_ids = [like.video_id for like in likes]
+    by_id = await loader.load_many(session, Video, video_ids)
     
     videos = []
     for vid_id in video_ids:
-        video = session.get(Video, vid_id)
+        video = by_id.get(vid_id)
         if video:
             videos.append({
                 "id": video.id,
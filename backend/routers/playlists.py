@@ -9,6 +9,8 @@ from datetime import datetime
 
 from ..database import get_session
 from ..models import Playlist, PlaylistItem, Video, User
+from ..services.counters import increment
+from ..services.loader import BatchLoader, get_loader
 from .auth import get_current_user, require_user
 
 router = APIRouter(
@@ -48,18 +50,13 @@ async def get_user_playlists(
     
     result = []
     for pl in playlists:
-        # Count videos
-        count = len(session.exec(
-            select(PlaylistItem).where(PlaylistItem.playlist_id == pl.id)
-        ).all())
-        
         result.append({
             "id": pl.id,
             "name": pl.name,
             "description": pl.description,
             "is_public": pl.is_public,
             "is_watch_later": pl.is_watch_later,
-            "video_count": count,
+            "video_count": pl.item_count,
             "created_at": pl.created_at.isoformat()
         })
     
@@ -96,6 +93,7 @@ async def create_playlist(
 async def get_playlist(
     playlist_id: int,
     session: Session = Depends(get_session),
+    loader: BatchLoader = Depends(get_loader),
     current_user: Optional[User] = Depends(get_current_user)
 ):
     """Get playlist details with videos."""
@@ -115,9 +113,10 @@ async def get_playlist(
         .order_by(PlaylistItem.position)
     ).all()
     
+    by_id = loader.load_many_sync(session, Video, [item.video_id for item in items])
     videos = []
     for item in items:
-        video = session.get(Video, item.video_id)
+        video = by_id.get(item.video_id)
         if video:
             videos.append({
                 "item_id": item.id,
@@ -232,11 +231,8 @@ async def add_video_to_playlist(
     if existing:
         raise HTTPException(status_code=400, detail="Video already in playlist")
     
-    # Get next position
-    items = session.exec(
-        select(PlaylistItem).where(PlaylistItem.playlist_id == playlist_id)
-    ).all()
-    next_pos = len(items)
+    # Next position = current item count
+    next_pos = playlist.item_count
     
     item = PlaylistItem(
         playlist_id=playlist_id,
@@ -244,6 +240,7 @@ async def add_video_to_playlist(
         position=next_pos
     )
     session.add(item)
+    session.exec(increment(Playlist, playlist_id, item_count=1))
     session.commit()
     
     return {"message": "Video added to playlist", "position": next_pos}
@@ -274,6 +271,7 @@ async def remove_video_from_playlist(
         raise HTTPException(status_code=404, detail="Video not in playlist")
     
     session.delete(item)
+    session.exec(increment(Playlist, playlist_id, item_count=-1))
     session.commit()
     
     return {"message": "Video removed from playlist"}
@@ -282,6 +280,7 @@ async def remove_video_from_playlist(
 @router.get("/watch-later/videos")
 async def get_watch_later(
     session: Session = Depends(get_session),
+    loader: BatchLoader = Depends(get_loader),
     current_user: User = Depends(require_user)
 ):
     """Get Watch Later playlist videos."""
@@ -300,9 +299,10 @@ async def get_watch_later(
         .order_by(PlaylistItem.added_at.desc())
     ).all()
     
+    by_id = loader.load_many_sync(session, Video, [item.video_id for item in items])
     videos = []
     for item in items:
-        video = session.get(Video, item.video_id)
+        video = by_id.get(item.video_id)
         if video:
             videos.append({
                 "video_id": video.id,
@@ -354,6 +354,7 @@ async def add_to_watch_later(
     if existing:
         # Remove from Watch Later (toggle)
         session.delete(existing)
+        session.exec(increment(Playlist, playlist.id, item_count=-1))
         session.commit()
         return {"action": "removed", "video_id": video_id}
     
@@ -363,6 +364,7 @@ async def add_to_watch_later(
         position=0
     )
     session.add(item)
+    session.exec(increment(Playlist, playlist.id, item_count=1))
     session.commit()
     
     return {"action": "added", "video_id": video_id}
@@ -1,14 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import RedirectResponse, StreamingResponse
-from sqlmodel import Session, select
-from ..database import get_session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from ..database import get_async_session
 from ..models import Video, TelegramInfo, VideoResolution
+from ..services.cache import app_cache, file_url_cache, video_tag
+from ..services.telegram_pool import TelegramShard, get_shard, is_primary
+import asyncio
 import os
 import httpx
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 import logging
-import time
 
 logger = logging.getLogger(__name__)
 
@@ -17,123 +20,139 @@ router = APIRouter(
     tags=["stream"]
 )
 
-# Cache for file URLs to avoid repeated API calls
-# Format: {file_id: (url, timestamp)}
-file_url_cache = {}
+# File URLs are cached (shared across workers with REDIS_URL) to avoid repeated API calls
 CACHE_EXPIRATION = 3000  # 50 minutes in seconds
+SOURCE_CACHE_TTL = 300  # Resolutions / source lookups; dropped on the video's tag by source changes
 
-# Telethon client singleton for streaming
-_stream_client = None
+# Telethon streaming clients, one per bot in the pool: {bot_id: (bot_token, TelegramClient)}.
+# The token is kept so a rotated token in .env replaces the client instead of reusing it.
+_stream_clients: Dict[str, Tuple[str, object]] = {}
+# Creation is serialized per bot, so concurrent first requests share one client
+_stream_locks: Dict[str, asyncio.Lock] = {}
 
-async def _get_stream_client():
-    """Get or create a Telethon client for streaming."""
-    global _stream_client
-    if _stream_client is not None and _stream_client.is_connected():
-        return _stream_client
-    
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
-    api_id = os.getenv("TELEGRAM_API_ID")
-    api_hash = os.getenv("TELEGRAM_API_HASH")
-    
-    if not token or not api_id or not api_hash:
-        raise ValueError("Telegram credentials not fully configured in .env")
-    
-    from telethon import TelegramClient
-    
-    session_path = str(Path(__file__).resolve().parent.parent / 'bot_session_stream')
-    _stream_client = TelegramClient(
-        session_path,
-        int(api_id),
-        api_hash,
-        timeout=120,
-    )
-    await _stream_client.start(bot_token=token)
-    logger.info("[Stream] Telethon client connected for streaming")
-    return _stream_client
+async def _get_stream_client(shard: TelegramShard):
+    """Get or create the Telethon client used to stream messages owned by a bot."""
+    cached = _stream_clients.get(shard.bot_id)
+    if cached is not None and cached[0] == shard.bot_token and cached[1].is_connected():
+        return cached[1]
+
+    async with _stream_locks.setdefault(shard.bot_id, asyncio.Lock()):
+        # Another request may have connected it while this one waited
+        cached = _stream_clients.get(shard.bot_id)
+        if cached is not None:
+            token, client = cached
+            if token == shard.bot_token and client.is_connected():
+                return client
+            del _stream_clients[shard.bot_id]
+            if client.is_connected():
+                logger.info(f"[Stream] Bot {shard.bot_id} token changed, reconnecting streaming client")
+                await client.disconnect()
+
+        api_id = os.getenv("TELEGRAM_API_ID")
+        api_hash = os.getenv("TELEGRAM_API_HASH")
+
+        if not api_id or not api_hash:
+            raise ValueError("Telegram credentials not fully configured in .env")
 
+        from telethon import TelegramClient
 
-async def get_telegram_file_url(file_id: str) -> str:
+        session_name = 'bot_session_stream' if is_primary(shard) else f'bot_session_stream_{shard.bot_id}'
+        session_path = str(Path(__file__).resolve().parent.parent / session_name)
+        client = TelegramClient(
+            session_path,
+            int(api_id),
+            api_hash,
+            timeout=120,
+        )
+        try:
+            await client.start(bot_token=shard.bot_token)
+        except BaseException:
+            await client.disconnect()
+            raise
+        _stream_clients[shard.bot_id] = (shard.bot_token, client)
+        logger.info(f"[Stream] Telethon client for bot {shard.bot_id} connected for streaming")
+        return client
+
+
+async def get_telegram_file_url(file_id: str, bot_id: Optional[str] = None) -> str:
     """
     Get the download URL for a file from Telegram Bot API (with caching).
     Falls back to Bot API for URL generation since Telethon doesn't directly provide URLs.
+    File IDs are only valid for the bot that uploaded them, so the owning bot is used.
     """
-    current_time = time.time()
-    
-    if file_id in file_url_cache:
-        url, timestamp = file_url_cache[file_id]
-        if current_time - timestamp < CACHE_EXPIRATION:
-            return url
+    shard = get_shard(bot_id)
+    token = shard.bot_token
     
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
-    if not token:
-        raise ValueError("TELEGRAM_BOT_TOKEN not set")
+    async def fetch_url():
+        # Use Bot API HTTP endpoint directly instead of the library
+        async with httpx.AsyncClient() as client:
+            resp = await client.get(
+                f"https://api.telegram.org/bot{token}/getFile",
+                params={"file_id": file_id},
+                timeout=30.0
+            )
+            data = resp.json()
+            
+            if not data.get("ok"):
+                raise ValueError(f"Telegram getFile failed: {data.get('description', 'unknown error')}")
+            
+            file_path = data["result"]["file_path"]
+            return f"https://api.telegram.org/file/bot{token}/{file_path}"
     
-    # Use Bot API HTTP endpoint directly instead of the library
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(
-            f"https://api.telegram.org/bot{token}/getFile",
-            params={"file_id": file_id},
-            timeout=30.0
-        )
-        data = resp.json()
-        
-        if not data.get("ok"):
-            raise ValueError(f"Telegram getFile failed: {data.get('description', 'unknown error')}")
-        
-        file_path = data["result"]["file_path"]
-        file_url = f"https://api.telegram.org/file/bot{token}/{file_path}"
-        
-        file_url_cache[file_id] = (file_url, current_time)
-        return file_url
+    return await file_url_cache.get_or_compute(f"{shard.bot_id}:{file_id}", fetch_url, ttl=CACHE_EXPIRATION)
 
 
 @router.get("/{video_id}/resolutions")
 async def get_video_resolutions(
     video_id: int,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Get all available resolutions for a video."""
-    video = session.get(Video, video_id)
-    if not video:
-        raise HTTPException(status_code=404, detail="Video not found")
-    
-    resolutions = session.exec(
-        select(VideoResolution)
-        .where(VideoResolution.video_id == video_id)
-        .order_by(VideoResolution.resolution.desc())
-    ).all()
-    
-    available = []
-    for res in resolutions:
-        available.append({
-            "resolution": res.resolution,
-            "label": res.resolution,
-            "file_size": res.file_size
-        })
-    
-    if not available and video.telegram_info:
-        available.append({
-            "resolution": video.original_resolution or "original",
-            "label": video.original_resolution or "Original",
-            "file_size": video.telegram_info.file_size
-        })
-    
-    return {
-        "video_id": video_id,
-        "original_resolution": video.original_resolution,
-        "available_resolutions": available
-    }
+    async def load_resolutions():
+        video = await session.get(Video, video_id)
+        if not video:
+            raise HTTPException(status_code=404, detail="Video not found")
+        
+        resolutions = (await session.exec(
+            select(VideoResolution)
+            .where(VideoResolution.video_id == video_id)
+            .order_by(VideoResolution.resolution.desc())
+        )).all()
+        
+        available = []
+        for res in resolutions:
+            available.append({
+                "resolution": res.resolution,
+                "label": res.resolution,
+                "file_size": res.file_size
+            })
+        
+        if not available:
+            tg_info = (await session.exec(
+                select(TelegramInfo).where(TelegramInfo.video_id == video_id)
+            )).first()
+            if tg_info:
+                available.append({
+                    "resolution": video.original_resolution or "original",
+                    "label": video.original_resolution or "Original",
+                    "file_size": tg_info.file_size
+                })
+        
+        return {
+            "video_id": video_id,
+            "original_resolution": video.original_resolution,
+            "available_resolutions": available
+        }
 
+    # Cached (and served stale while the DB is down) so playback keeps starting
+    return await app_cache.get_or_compute(
+        f"stream_resolutions_{video_id}", load_resolutions, ttl=SOURCE_CACHE_TTL, tags=[video_tag(video_id)]
+    )
 
-@router.get("/{video_id}")
-async def stream_video(
-    video_id: int,
-    resolution: Optional[str] = Query(None),
-    provider: Optional[str] = Query(None),
-    session: Session = Depends(get_session)
-):
-    """Stream video - supports both Telegram and external providers."""
-    video = session.get(Video, video_id)
+
+async def _resolve_source(session: AsyncSession, video_id: int, resolution: Optional[str], provider: Optional[str]) -> dict:
+    """Which provider/file plays this request, and for Telegram the bot and message that own it."""
+    video = await session.get(Video, video_id)
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     
@@ -154,11 +173,11 @@ async def stream_video(
             query = query.where(VideoSource.provider == provider)
         
         if resolution.lower() == 'original':
-            src_record = session.exec(query.where(
+            src_record = (await session.exec(query.where(
                 (VideoSource.resolution == None) | (VideoSource.resolution == "Original")
-            )).first()
+            ))).first()
         else:
-            src_record = session.exec(query.where(VideoSource.resolution == resolution)).first()
+            src_record = (await session.exec(query.where(VideoSource.resolution == resolution))).first()
 
         if src_record:
             file_id = src_record.file_id
@@ -167,45 +186,86 @@ async def stream_video(
     
     # If no source found yet and provider is telegram (or no provider specified), fallback to telegram
     if not file_id and (not provider or provider == 'telegram'):
-        src_record = session.exec(
+        src_record = (await session.exec(
             select(VideoSource)
             .where(VideoSource.video_id == video_id)
             .where(VideoSource.provider == "telegram")
-        ).first()
+        )).first()
         
         if src_record:
             file_id = src_record.file_id
             found_provider = "telegram"
-        elif video.telegram_info:  # Legacy fallback
-            file_id = video.telegram_info.file_id
-            found_provider = "telegram"
+        else:  # Legacy fallback
+            legacy_info = (await session.exec(
+                select(TelegramInfo).where(TelegramInfo.video_id == video_id)
+            )).first()
+            if legacy_info:
+                file_id = legacy_info.file_id
+                found_provider = "telegram"
     
     if not file_id:
         raise HTTPException(status_code=404, detail="Video source not found")
     
+    # For Telegram sources, find the record that owns the message: the matching
+    # resolution upload, else the original. Only its bot can fetch the message.
+    owner = None
+    if found_provider == "telegram":
+        owner = (await session.exec(
+            select(VideoResolution)
+            .where(VideoResolution.video_id == video_id)
+            .where(VideoResolution.file_id == file_id)
+        )).first()
+        if not owner or not owner.channel_message_id:
+            owner = (await session.exec(
+                select(TelegramInfo).where(TelegramInfo.video_id == video_id)
+            )).first() or owner
+    
+    return {
+        "provider": found_provider,
+        "file_id": file_id,
+        "embed_url": embed_url,
+        "bot_id": owner.bot_id if owner else None,
+        "channel_id": owner.channel_id if owner else None,
+        "message_id": owner.channel_message_id if owner else None,
+    }
+
+
+@router.get("/{video_id}")
+async def stream_video(
+    video_id: int,
+    resolution: Optional[str] = Query(None),
+    provider: Optional[str] = Query(None),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Stream video - supports both Telegram and external providers."""
+    source = await app_cache.get_or_compute(
+        f"stream_source_{video_id}_{resolution}_{provider}",
+        lambda: _resolve_source(session, video_id, resolution, provider),
+        ttl=SOURCE_CACHE_TTL, tags=[video_tag(video_id)]
+    )
+    # The rest is Telegram round-trips and the stream itself: don't hold a pooled connection through them
+    await session.close()
+    file_id = source["file_id"]
+    found_provider = source["provider"]
+    owner_bot_id = source["bot_id"]
+    
     # For external providers with embed URLs, redirect
-    if embed_url and found_provider in ("streamtape", "doodstream"):
-        return RedirectResponse(url=embed_url)
+    if source["embed_url"] and found_provider in ("streamtape", "doodstream"):
+        return RedirectResponse(url=source["embed_url"])
     
     # For Telegram sources, try to stream via Telethon
     try:
         if found_provider == "telegram" and os.getenv("TELEGRAM_API_ID") and os.getenv("TELEGRAM_API_HASH"):
             # Use Telethon to download and stream (supports large files)
-            client = await _get_stream_client()
-            _channel_id_str = os.getenv("TELEGRAM_CHANNEL_ID")
-            channel_id = int(_channel_id_str.strip()) if _channel_id_str else None
+            shard = get_shard(owner_bot_id)
+            client = await _get_stream_client(shard)
+            channel_id = source["channel_id"] or shard.channel_id
             
             if channel_id:
                 try:
-                    # Get the channel_message_id from TelegramInfo (NOT file_id!)
+                    # Use the owner's channel_message_id (NOT file_id!)
                     # file_id is a Telegram Bot API string like "BAACAgIAA...", NOT a message ID integer
-                    tg_info = session.exec(
-                        select(TelegramInfo).where(TelegramInfo.video_id == video_id)
-                    ).first()
-                    
-                    msg_id = None
-                    if tg_info and tg_info.channel_message_id:
-                        msg_id = tg_info.channel_message_id
+                    msg_id = source["message_id"]
                     
                     if msg_id:
                         message = await client.get_messages(channel_id, ids=msg_id)
@@ -228,7 +288,7 @@ async def stream_video(
                     logger.warning(f"Telethon stream failed, falling back to Bot API: {e}")
         
         # Fallback: use Bot API URL (works for files < 20MB download)
-        file_url = await get_telegram_file_url(file_id)
+        file_url = await get_telegram_file_url(file_id, owner_bot_id)
         logger.info(f"Streaming video {video_id} from Bot API URL")
         
         async def stream_generator():
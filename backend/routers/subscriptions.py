@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import Session, select, func
 from typing import List, Optional
 from ..database import get_session
-from ..models import Subscription, User, Video, VideoPublic
+from ..models import Subscription, User, Video, VideoCard
+from ..services.counters import increment
+from ..services.pagination import VIDEO_KEYSET, paginate, page_results
+from ..services.video_cards import card_response, card_select, parse_fields, to_cards
 from .auth import require_user, get_current_user
 
 router = APIRouter(
@@ -35,12 +38,14 @@ async def toggle_subscription(
     if sub:
         # Unsubscribe
         session.delete(sub)
+        session.exec(increment(User, channel_id, subscriber_count=-1))
         session.commit()
         return {"subscribed": False}
     else:
         # Subscribe
         new_sub = Subscription(subscriber_id=user.id, channel_id=channel_id)
         session.add(new_sub)
+        session.exec(increment(User, channel_id, subscriber_count=1))
         session.commit()
         return {"subscribed": True}
 
@@ -67,21 +72,20 @@ async def get_subscriber_count(
     session: Session = Depends(get_session)
 ):
     """Get total subscribers for a channel."""
-    # Using len() on list for simplicity with SQLModel where count() can be tricky depending on version
-    subs = session.exec(
-        select(Subscription)
-        .where(Subscription.channel_id == channel_id)
-    ).all()
-    return {"count": len(subs)}
+    channel = session.get(User, channel_id)
+    return {"count": channel.subscriber_count if channel else 0}
 
-@router.get("/feed", response_model=List[VideoPublic])
+@router.get("/feed", response_model=List[VideoCard])
 async def subscription_feed(
     skip: int = 0, 
     limit: int = 20, 
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated VideoCard fields to return"),
     user: User = Depends(require_user), 
     session: Session = Depends(get_session)
 ):
     """Get videos from subscribed channels."""
+    wanted = parse_fields(fields)
     # Get IDs of channels user is subscribed to
     subs = session.exec(
         select(Subscription.channel_id)
@@ -89,17 +93,11 @@ async def subscription_feed(
     ).all()
     
     if not subs:
-        return []
-        
-    # Lazy imports to avoid circular deps if any, but VideoPublic is imported at top
-    from sqlalchemy.orm import joinedload
+        return card_response([], wanted)
     
-    videos = session.exec(
-        select(Video)
-        .where(Video.uploader_id.in_(subs))
-        .options(joinedload(Video.category), joinedload(Video.uploader)) # Eager load category and uploader
-        .order_by(Video.upload_date.desc())
-        .offset(skip)
-        .limit(limit)
-    ).all()
-    return videos
+    rows = session.exec(paginate(
+        card_select().where(Video.uploader_id.in_(subs)),
+        VIDEO_KEYSET, cursor, skip, limit
+    )).all()
+    cards, next_cursor = page_results(rows, VIDEO_KEYSET, limit)
+    return card_response(to_cards(cards), wanted, next_cursor)
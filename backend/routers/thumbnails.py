@@ -5,6 +5,7 @@ from ..database import get_session
 from ..models import Video, TelegramInfo
 from ..services.telegram_uploader import get_telegram_file_bytes
 from ..services.crypto import decrypt_file_generator
+from ..services.http_cache import IMMUTABLE
 from sqlmodel import select
 import os
 import logging
@@ -61,7 +62,8 @@ async def get_thumbnail(
     for ext in [".jpg", ".jpeg", ".png", ".webp", ".gif"]:
         thumb_path = os.path.join(THUMBNAIL_DIR, f"{clean_id}{ext}")
         if os.path.exists(thumb_path):
-            return FileResponse(thumb_path)
+            # Written once at upload and never replaced
+            return FileResponse(thumb_path, headers={"Cache-Control": IMMUTABLE})
     
     # 2. No local file — need DB for Telegram fallback or placeholder
     from ..database import get_session as _get_session
@@ -83,17 +85,24 @@ async def get_thumbnail(
         
         # 3. Check Telegram thumbnail (proxy from TG)
         tg_info = session.exec(select(TelegramInfo).where(TelegramInfo.video_id == clean_id)).first()
-        if tg_info and tg_info.thumbnail_file_id:
+        title = video.title
+        thumbnail_file_id, bot_id = (tg_info.thumbnail_file_id, tg_info.bot_id) if tg_info else (None, None)
+        session.close()  # Done with the DB; return the connection before the Telegram download
+        if thumbnail_file_id:
             try:
-                content = await get_telegram_file_bytes(tg_info.thumbnail_file_id)
+                content = await get_telegram_file_bytes(thumbnail_file_id, bot_id)
                 if content:
-                    return Response(content=bytes(content), media_type="image/jpeg")
+                    return Response(
+                        content=bytes(content),
+                        media_type="image/jpeg",
+                        headers={"Cache-Control": "public, max-age=86400"}
+                    )
             except Exception as e:
                 logger.error(f"Failed to fetch thumb from TG: {e}")
         
         # 4. No saved thumbnail - return SVG placeholder
         return Response(
-            content=create_placeholder_image(video.title),
+            content=create_placeholder_image(title),
             media_type="image/svg+xml"
         )
     finally:
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, BackgroundTasks, Query, Response
 from sqlmodel import Session, select
 from typing import Optional, List
 from ..database import get_session, engine
-from ..models import Video, Category, TelegramInfo, VideoResolution, User, VideoPublic
+from ..models import Video, Category, TelegramInfo, VideoResolution, User, VideoCard, VideoPublic
 from ..services.telegram_uploader import upload_video_to_telegram, upload_photo_to_telegram
 from ..services.crypto import encrypt_stream_to_file
 from ..services.transcoder import get_video_info, transcode_video, check_ffmpeg_installed, extract_multi_thumbnails
 from ..services.external_storage import upload_to_streamtape, upload_to_doodstream
+from ..services.cache import FEED_HOME, FEED_SHORTS, app_cache, category_tag, user_tag, video_tag
+from ..services.pagination import VIDEO_KEYSET, paginate, page_results, set_next_cursor
+from ..services.video_cards import card_response, card_select, encode_page, page_tags, parse_fields, to_cards
 from ..models import StorageMode
 from .auth import get_current_user, require_user
 import os
@@ -82,6 +85,7 @@ def background_full_process_task(video_id: int, source_file: str, title: str, or
                         )
                         session_bg.add(source)
                         session_bg.commit()
+                        app_cache.invalidate_tags(video_tag(video_id))
                         logger.info(f"[BG-{video_id}] Source saved: {provider} - {res}")
 
                 # ============================================================
@@ -112,6 +116,7 @@ def background_full_process_task(video_id: int, source_file: str, title: str, or
                                     v_rec.thumbnail_url = dd_res['thumbnail_url']
                                     session_thumb.add(v_rec)
                                     session_thumb.commit()
+                                    app_cache.invalidate_tags(video_tag(video_id))
                                     logger.info(f"[BG-{video_id}] Used DoodStream splash_img as fallback thumbnail")
                     except Exception as e:
                         logger.error(f"[BG-{video_id}] DoodStream Original Error: {e}")
@@ -275,6 +280,7 @@ def transcode_only_task(video_id: int, source_file: str, title: str, original_re
                         )
                         session_bg.add(source)
                         session_bg.commit()
+                        app_cache.invalidate_tags(video_tag(video_id))
                         logger.info(f"[REPROCESS-{video_id}] Source saved: {provider} - {res}")
                 
                 fast_providers = [p for p in active_providers if p != 'telegram']
@@ -434,9 +440,16 @@ async def upload_video(
         else:
             logger.info("Local thumbnail extraction skipped/failed. Waiting for fallback in background task.")
 
-    # Invalidate video list cache to show new video on home page
-    from ..services.cache import app_cache
-    app_cache.invalidate("videos_skip_0")
+    # Show the new video on the feeds it belongs to
+    new_in = [FEED_HOME, user_tag(current_user.id)]
+    if is_short:
+        new_in.append(FEED_SHORTS)
+    if category_id:
+        new_in.append(category_tag(category_id))
+    app_cache.invalidate_tags(*new_in)
+    from ..services.search_index import search_index
+    category = session.get(Category, category_id) if category_id else None
+    search_index.upsert(video.id, video.title, video.description, category.name if category else None)
 
     # 5. Hand off EVERYTHING to background task
     background_full_process_task(video.id, temp_file_path, title, original_resolution, active_providers)
@@ -448,8 +461,10 @@ async def upload_video(
 
 @router.get("/my-videos", response_model=List[VideoPublic])
 async def get_my_videos(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     session: Session = Depends(get_session),
     current_user: Optional[User] = Depends(get_current_user)
 ):
@@ -461,43 +476,56 @@ async def get_my_videos(
         raise HTTPException(status_code=401, detail="Not authenticated")
     
     from sqlalchemy.orm import joinedload
-    videos = session.exec(
+    rows = session.exec(paginate(
         select(Video)
         .where(Video.uploader_id == current_user.id)
-        .options(joinedload(Video.category))
-        .order_by(Video.upload_date.desc())
-        .offset(skip)
-        .limit(limit)
-    ).all()
+        .options(joinedload(Video.category)),
+        VIDEO_KEYSET, cursor, skip, limit
+    )).all()
+    videos, next_cursor = page_results(rows, VIDEO_KEYSET, limit)
+    set_next_cursor(response, next_cursor)
     
     return videos
 
 
-@router.get("/user/{user_id}/videos", response_model=List[VideoPublic])
+@router.get("/user/{user_id}/videos", response_model=List[VideoCard])
 async def get_user_videos(
     user_id: int,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated VideoCard fields to return"),
     session: Session = Depends(get_session)
 ):
     """
     Get all videos uploaded by a specific user (public).
     """
-    user = session.get(User, user_id)
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    wanted = parse_fields(fields)
+
+    async def load_page():
+        user = session.get(User, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        rows = session.exec(paginate(
+            card_select().where(Video.uploader_id == user_id),
+            VIDEO_KEYSET, cursor, skip, limit
+        )).all()
+        cards, next_cursor = page_results(rows, VIDEO_KEYSET, limit)
+        return to_cards(cards), next_cursor
+
+    async def load_encoded():
+        return encode_page(*await load_page(), user_tag(user_id))
     
-    from sqlalchemy.orm import joinedload
-    videos = session.exec(
-        select(Video)
-        .where(Video.uploader_id == user_id)
-        .options(joinedload(Video.category))
-        .order_by(Video.upload_date.desc())
-        .offset(skip)
-        .limit(limit)
-    ).all()
+    # Channel pages: first page cached until the user uploads or one of its videos changes
+    if skip == 0 and not cursor:
+        cards, next_cursor, _ = await app_cache.get_or_compute(
+            f"user_{user_id}_videos_limit_{limit}", load_encoded, ttl=300, tags=page_tags
+        )
+    else:
+        cards, next_cursor = await load_page()
     
-    return videos
+    return card_response(cards, wanted, next_cursor)
 
 
 @router.delete("/video/{video_id}")
@@ -519,14 +547,9 @@ async def delete_my_video(
     if video.uploader_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this video")
     
-    # Delete associated records
-    if video.telegram_info:
-        session.delete(video.telegram_info)
-    for resolution in video.resolutions:
-        session.delete(resolution)
-    
-    session.delete(video)
-    session.commit()
+    # Delete the video and every row referencing it (set-based)
+    from ..services.video_deletion import video_deleter
+    video_deleter.delete_now(session, [video_id])
     
     return {"status": "success", "message": "Video deleted"}
 
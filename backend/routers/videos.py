@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import and_, exists, func
 from sqlalchemy.orm import joinedload, selectinload
-from typing import List, Optional
-from ..database import get_session
-from ..models import Video, Category, VideoPublic, CategoryPublic, ViewHistory
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from ..database import get_async_session
+from ..services.db_health import DatabaseUnavailable
+from ..models import (Video, Category, VideoCard, VideoPublic, CategoryPublic, ViewHistory, User, VideoLike,
+                      WatchHistory, Subscription)
 from fastapi import Request
 
 router = APIRouter(
@@ -11,143 +16,413 @@ router = APIRouter(
     tags=["videos"]
 )
 
-from ..database import engine
-from ..services.cache import app_cache
+from ..services.cache import (CATEGORIES, FEED_HOME, FEED_SHORTS, FEED_TRENDING, app_cache, category_tag,
+                              video_list_tags, video_tags)
+from ..services.feed_refresher import PAGE_SIZE as FEED_PAGE_SIZE, feed_refresher
+from ..services.view_counter import view_counter
+from ..services.pagination import VIDEO_KEYSET, paginate, page_results
+from ..services.loader import BatchLoader, get_loader
+from ..services.progress_buffer import progress_buffer
+from ..services.serialization import dump_model, dump_models, dumps, join_object, json_response
+from ..services.video_cards import (card_response, card_select, encode_page, page_tags, parse_fields, sparse,
+                                   to_cards)
+from ..services.fulltext import search_video_ids
+from ..services.search_index import search_index
+from .auth import TokenUser, get_token_user
+from .comments import load_comment_page
 
-from fastapi.encoders import jsonable_encoder
 
-@router.get("/")
+# Everything VideoPublic serializes. AsyncSession can't lazy-load relationships
+# during response validation, so they must all be loaded up front.
+VIDEO_PUBLIC_OPTIONS = (
+    joinedload(Video.category),
+    joinedload(Video.uploader),
+    selectinload(Video.sources),
+    joinedload(Video.telegram_info),
+    selectinload(Video.resolutions),
+)
+
+TRENDING_DAYS = 7
+BATCH_MAX_IDS = 100
+
+async def load_home_page(session: AsyncSession, limit: int, cursor: Optional[str] = None, skip: int = 0):
+    rows = (await session.exec(paginate(card_select(), VIDEO_KEYSET, cursor, skip, limit))).all()
+    cards, next_cursor = page_results(rows, VIDEO_KEYSET, limit)
+    return to_cards(cards), next_cursor
+
+
+async def load_shorts_page(session: AsyncSession, limit: int, cursor: Optional[str] = None, skip: int = 0):
+    rows = (await session.exec(paginate(
+        card_select().where(Video.is_short == True),
+        VIDEO_KEYSET, cursor, skip, limit
+    ))).all()
+    cards, next_cursor = page_results(rows, VIDEO_KEYSET, limit)
+    return to_cards(cards), next_cursor
+
+
+async def load_category_page(session: AsyncSession, slug: str, limit: int, cursor: Optional[str] = None, skip: int = 0):
+    # First find category by slug
+    category = (await session.exec(select(Category).where(Category.slug == slug))).first()
+    if not category:
+        raise HTTPException(status_code=404, detail="Category not found")
+    
+    rows = (await session.exec(paginate(
+        card_select().where(Video.category_id == category.id),
+        VIDEO_KEYSET, cursor, skip, limit
+    ))).all()
+    cards, next_cursor = page_results(rows, VIDEO_KEYSET, limit)
+    return to_cards(cards), next_cursor, category.id
+
+
+async def load_trending(session: AsyncSession, limit: int):
+    """Most views in the last TRENDING_DAYS, then all-time views for the rest."""
+    since = datetime.utcnow() - timedelta(days=TRENDING_DAYS)
+    recent = (
+        select(ViewHistory.video_id, func.count().label("recent_views"))
+        .where(ViewHistory.viewed_at >= since)
+        .group_by(ViewHistory.video_id)
+        .subquery()
+    )
+    rows = (await session.exec(
+        card_select()
+        .outerjoin(recent, recent.c.video_id == Video.id)
+        .order_by(func.coalesce(recent.c.recent_views, 0).desc(), Video.views.desc(), Video.id.desc())
+        .limit(limit)
+    )).all()
+    return to_cards(rows)
+
+
+async def load_video_body(session: AsyncSession, video_id: int) -> bytes:
+    """GET /videos/{id} as cached JSON bytes; raises 404."""
+    async def load_video():
+        video = (await session.exec(
+            select(Video)
+            .where(Video.id == video_id)
+            .options(*VIDEO_PUBLIC_OPTIONS)
+        )).first()
+        if not video:
+            raise HTTPException(status_code=404, detail="Video not found")
+        # Encoded once here; hits send the bytes without re-validating VideoPublic
+        return dump_model(video, VideoPublic), video_tags({"id": video.id, "category_id": video.category_id})
+
+    body, _ = await app_cache.get_or_compute(f"video_{video_id}", load_video, ttl=60, tags=lambda entry: entry[1])
+    return body
+
+
+def _parse_ids(ids: str) -> List[int]:
+    try:
+        parsed = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if not parsed or len(parsed) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Pass between 1 and {BATCH_MAX_IDS} ids")
+    return list(dict.fromkeys(parsed))  # Drop repeats, keep order
+
+
+def _progress(user_id: int, video_id: int, row) -> dict:
+    """Resume position from a row with WatchHistory columns; heartbeats not yet flushed win."""
+    buffered = progress_buffer.get(user_id, video_id)
+    if buffered:
+        return buffered
+    return {"progress_seconds": row.progress_seconds or 0, "completed": bool(row.completed)}
+
+
+def _prebuilt(name: str, fields: Optional[Tuple[str, ...]]) -> Optional[Response]:
+    if fields is None:
+        return feed_refresher.response(name)
+    page = feed_refresher.page(name)
+    return card_response(page[0], fields, page[1]) if page is not None else None
+
+
+@feed_refresher.source
+async def _prebuilt_feeds(session: AsyncSession):
+    """First pages the background refresher keeps ready (see services/feed_refresher.py)."""
+    size = FEED_PAGE_SIZE
+
+    async def home(s):
+        page, next_cursor = await load_home_page(s, size)
+        return page, next_cursor, video_list_tags(FEED_HOME)(page)
+
+    async def shorts(s):
+        page, next_cursor = await load_shorts_page(s, size)
+        return page, next_cursor, video_list_tags(FEED_SHORTS)(page)
+
+    async def trending(s):
+        page = await load_trending(s, size)
+        return page, None, video_list_tags(FEED_TRENDING)(page)
+
+    def category(slug):
+        async def build(s):
+            page, next_cursor, category_id = await load_category_page(s, slug, size)
+            return page, next_cursor, video_list_tags(category_tag(category_id))(page)
+        return build
+
+    feeds = {f"home:{size}": home, f"shorts:{size}": shorts, f"trending:{size}": trending}
+    for slug in (await session.exec(select(Category.slug))).all():
+        feeds[f"category:{slug}:{size}"] = category(slug)
+    return feeds
+
+
+@router.get("/", response_model=List[VideoCard])
 async def read_videos(
     skip: int = 0, 
     limit: int = 20,
-    session: Session = Depends(get_session)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated VideoCard fields to return"),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    # Cache key for first page only
-    cache_key = f"videos_skip_{skip}_limit_{limit}"
-    if skip == 0:
-        cached = app_cache.get(cache_key)
-        if cached:
-            return cached
-
-    videos = session.exec(
-        select(Video)
-        .options(
-            joinedload(Video.category), 
-            joinedload(Video.uploader),
-            selectinload(Video.sources),
-            joinedload(Video.telegram_info),
-            selectinload(Video.resolutions)
+    wanted = parse_fields(fields)
+    # Cache first page only; concurrent misses share one query
+    if skip == 0 and not cursor:
+        prebuilt = _prebuilt(f"home:{limit}", wanted)
+        if prebuilt is not None:
+            return prebuilt
+        async def load_encoded():
+            return encode_page(*await load_home_page(session, limit), FEED_HOME)
+
+        cache_key = f"videos_skip_{skip}_limit_{limit}"
+        cards, next_cursor, _ = await app_cache.get_or_compute(
+            cache_key, load_encoded, ttl=300, tags=page_tags  # Cache for 5 min
         )
-        .offset(skip).limit(limit)
-    ).all()
-    
-    # Use jsonable_encoder for robust serialization
-    serialized = jsonable_encoder(videos)
+    else:
+        cards, next_cursor = await load_home_page(session, limit, cursor, skip)
     
-    if skip == 0:
-        app_cache.set(cache_key, serialized, ttl=300) # Cache for 5 min
-    
-    return serialized
+    return card_response(cards, wanted, next_cursor)
 
-@router.get("/search", response_model=List[VideoPublic])
+@router.get("/search", response_model=List[VideoCard])
 async def search_videos(
     q: str,
     skip: int = 0,
     limit: int = 20,
-    session: Session = Depends(get_session)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated VideoCard fields to return"),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    statement = select(Video).where(
-        (Video.title.contains(q)) | (Video.description.contains(q))
-    ).options(joinedload(Video.category), joinedload(Video.uploader)).offset(skip).limit(limit)
-    videos = session.exec(statement).all()
-    return videos
+    wanted = parse_fields(fields)
+    # Relevance-ranked ids from the full-text index
+    found = await search_video_ids(session, q, limit=limit, cursor=cursor, skip=skip)
+    if found is not None:
+        ids, next_cursor = found
+        if not ids:
+            return card_response([], wanted, next_cursor)
+        rows = (await session.exec(card_select().where(Video.id.in_(ids)))).all()
+        by_id = {row.id: row for row in rows}
+        return card_response(to_cards(by_id[i] for i in ids if i in by_id), wanted, next_cursor)
+
+    # No text index yet: unranked substring scan
+    rows = (await session.exec(paginate(
+        card_select().where(
+            (Video.title.contains(q)) | (Video.description.contains(q))
+        ),
+        VIDEO_KEYSET, cursor, skip, limit
+    ))).all()
+    cards, next_cursor = page_results(rows, VIDEO_KEYSET, limit)
+    return card_response(to_cards(cards), wanted, next_cursor)
 
-@router.get("/shorts", response_model=List[VideoPublic])
+@router.get("/suggest")
+async def suggest_videos(q: str, limit: int = Query(8, ge=1, le=20)):
+    """Type-ahead completions and matching videos, served from the in-memory index (no DB round-trip)."""
+    return search_index.suggest(q, limit)
+
+@router.get("/shorts", response_model=List[VideoCard])
 async def read_shorts(
     skip: int = 0,
     limit: int = 20,
-    session: Session = Depends(get_session)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated VideoCard fields to return"),
+    session: AsyncSession = Depends(get_async_session)
+):
+    wanted = parse_fields(fields)
+    if skip == 0 and not cursor:
+        prebuilt = _prebuilt(f"shorts:{limit}", wanted)
+        if prebuilt is not None:
+            return prebuilt
+        async def load_encoded():
+            return encode_page(*await load_shorts_page(session, limit), FEED_SHORTS)
+
+        cards, next_cursor, _ = await app_cache.get_or_compute(
+            f"shorts_limit_{limit}", load_encoded, ttl=300, tags=page_tags
+        )
+    else:
+        cards, next_cursor = await load_shorts_page(session, limit, cursor, skip)
+    return card_response(cards, wanted, next_cursor)
+
+@router.get("/trending", response_model=List[VideoCard])
+async def read_trending(
+    limit: int = Query(20, ge=1, le=50),
+    fields: Optional[str] = Query(None, description="Comma-separated VideoCard fields to return"),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    videos = session.exec(
-        select(Video)
-        .where(Video.is_short == True)
-        .options(joinedload(Video.category), joinedload(Video.uploader))
-        .offset(skip).limit(limit)
-    ).all()
-    return videos
+    wanted = parse_fields(fields)
+    prebuilt = _prebuilt(f"trending:{limit}", wanted)
+    if prebuilt is not None:
+        return prebuilt
+    async def load_encoded():
+        return encode_page(await load_trending(session, limit), None, FEED_TRENDING)
+
+    cards, _, _ = await app_cache.get_or_compute(
+        f"trending_limit_{limit}", load_encoded, ttl=300, tags=page_tags
+    )
+    return card_response(cards, wanted)
 
 @router.get("/categories/all")
-async def read_categories(session: Session = Depends(get_session)):
-    cache_key = "categories_all"
-    cached = app_cache.get(cache_key)
-    if cached:
-        return cached
-        
-    categories = session.exec(select(Category)).all()
-    # Use jsonable_encoder for consistency and safety
-    serialized = jsonable_encoder(categories)
-    
-    app_cache.set(cache_key, serialized, ttl=600) # Cache for 10 min
-    return serialized
+async def read_categories(session: AsyncSession = Depends(get_async_session)):
+    async def load_categories():
+        categories = (await session.exec(select(Category))).all()
+        return dump_models(categories, CategoryPublic)
 
-@router.get("/category/{slug}", response_model=List[VideoPublic])
+    body = await app_cache.get_or_compute("categories_all", load_categories, ttl=600, tags=[CATEGORIES]) # Cache for 10 min
+    return json_response(body)
+
+@router.get("/category/{slug}", response_model=List[VideoCard])
 async def read_videos_by_category(
     slug: str,
     skip: int = 0,
     limit: int = 20,
-    session: Session = Depends(get_session)
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated VideoCard fields to return"),
+    session: AsyncSession = Depends(get_async_session)
 ):
-    # First find category by slug
-    category = session.exec(select(Category).where(Category.slug == slug)).first()
-    if not category:
-        raise HTTPException(status_code=404, detail="Category not found")
-    
-    videos = session.exec(
-        select(Video)
-        .where(Video.category_id == category.id)
-        .options(joinedload(Video.category), joinedload(Video.uploader))
-        .offset(skip).limit(limit)
-    ).all()
-    return videos
+    wanted = parse_fields(fields)
+    if skip == 0 and not cursor:
+        prebuilt = _prebuilt(f"category:{slug}:{limit}", wanted)
+        if prebuilt is not None:
+            return prebuilt
+        async def load_encoded():
+            page, next_cursor, category_id = await load_category_page(session, slug, limit)
+            return encode_page(page, next_cursor, category_tag(category_id))
 
-@router.get("/{video_id}", response_model=VideoPublic)
-async def read_video(video_id: int, session: Session = Depends(get_session)):
-    video = session.exec(
-        select(Video)
-        .where(Video.id == video_id)
-        .options(
-            joinedload(Video.category), 
-            joinedload(Video.uploader), 
-            selectinload(Video.sources),
-            joinedload(Video.telegram_info),
-            selectinload(Video.resolutions)
+        cards, next_cursor, _ = await app_cache.get_or_compute(
+            f"category_{slug}_limit_{limit}", load_encoded, ttl=300, tags=page_tags
+        )
+    else:
+        cards, next_cursor, _ = await load_category_page(session, slug, limit, cursor, skip)
+    return card_response(cards, wanted, next_cursor)
+
+@router.get("/batch")
+async def read_videos_batch(
+    ids: str = Query(..., description=f"Comma-separated video ids, at most {BATCH_MAX_IDS}"),
+    fields: Optional[str] = Query(None, description="Comma-separated VideoCard fields to return"),
+    session: AsyncSession = Depends(get_async_session),
+    current_user: Optional[TokenUser] = Depends(get_token_user)
+):
+    """
+    Cards for a set of videos in one query, in the order asked, plus the
+    caller's vote and resume position for each when signed in.
+    """
+    wanted = parse_fields(fields)
+    video_ids = _parse_ids(ids)
+    statement = card_select().where(Video.id.in_(video_ids))
+    if current_user:
+        statement = (
+            statement
+            .add_columns(VideoLike.is_like.label("user_liked"), WatchHistory.progress_seconds, WatchHistory.completed)
+            .outerjoin(VideoLike, and_(VideoLike.video_id == Video.id, VideoLike.user_id == current_user.id))
+            .outerjoin(WatchHistory, and_(WatchHistory.video_id == Video.id, WatchHistory.user_id == current_user.id))
         )
-    ).first()
-    if not video:
+    by_id = {row.id: row for row in (await session.exec(statement)).all()}
+    found = [by_id[i] for i in video_ids if i in by_id]
+
+    user_state = None
+    if current_user:
+        user_state = {
+            str(row.id): {"user_liked": row.user_liked, **_progress(current_user.id, row.id, row)} for row in found
+        }
+    return json_response(dumps({
+        "videos": sparse(to_cards(found), wanted),
+        "missing": [i for i in video_ids if i not in by_id],
+        "user_state": user_state,
+    }))
+
+@router.get("/{video_id}/page")
+async def read_video_page(
+    video_id: int,
+    comments_limit: int = Query(50, ge=0, le=100),
+    session: AsyncSession = Depends(get_async_session),
+    loader: BatchLoader = Depends(get_loader),
+    current_user: Optional[TokenUser] = Depends(get_token_user)
+):
+    """
+    Everything the watch page loads, in one round trip: the video (as GET
+    /videos/{id}), like counts and the caller's vote, resume position,
+    subscription state and the first page of comments. Each part has the
+    same shape as its own endpoint.
+    """
+    video = await load_video_body(session, video_id)
+
+    # Counts and every per-user flag in a single row
+    columns = [
+        Video.like_count, Video.dislike_count, Video.comment_count, Video.uploader_id,
+        select(User.subscriber_count).where(User.id == Video.uploader_id)
+        .scalar_subquery().label("subscriber_count"),
+    ]
+    if current_user:
+        columns += [
+            select(VideoLike.is_like)
+            .where(VideoLike.video_id == Video.id, VideoLike.user_id == current_user.id)
+            .limit(1).scalar_subquery().label("user_liked"),
+            select(WatchHistory.progress_seconds)
+            .where(WatchHistory.video_id == Video.id, WatchHistory.user_id == current_user.id)
+            .scalar_subquery().label("progress_seconds"),
+            select(WatchHistory.completed)
+            .where(WatchHistory.video_id == Video.id, WatchHistory.user_id == current_user.id)
+            .scalar_subquery().label("completed"),
+            exists().where(Subscription.subscriber_id == current_user.id,
+                           Subscription.channel_id == Video.uploader_id).label("subscribed"),
+        ]
+    state = (await session.exec(select(*columns).where(Video.id == video_id))).first()
+    if state is None:
         raise HTTPException(status_code=404, detail="Video not found")
-    return video
+
+    comments = {"comments": [], "total": state.comment_count, "skip": 0, "limit": 0, "next_cursor": None}
+    if comments_limit:
+        comments = await load_comment_page(session, loader, video_id, state.comment_count, current_user,
+                                           limit=comments_limit)
+
+    return json_response(join_object({
+        "video": video,
+        "likes": {
+            "video_id": video_id,
+            "likes": state.like_count,
+            "dislikes": state.dislike_count,
+            "user_liked": state.user_liked if current_user else None,
+        },
+        "progress": (_progress(current_user.id, video_id, state) if current_user
+                     else {"progress_seconds": 0, "completed": False}),
+        "subscription": {
+            "channel_id": state.uploader_id,
+            "subscribed": bool(current_user and state.subscribed),
+            "count": state.subscriber_count or 0,
+        },
+        "comments": comments,
+    }))
+
+@router.get("/{video_id}", response_model=VideoPublic)
+async def read_video(video_id: int, session: AsyncSession = Depends(get_async_session)):
+    return json_response(await load_video_body(session, video_id))
 
 @router.post("/{video_id}/view")
 async def increment_view(
     video_id: int, 
     request: Request,
-    session: Session = Depends(get_session)
+    session: AsyncSession = Depends(get_async_session)
 ):
-    video = session.get(Video, video_id)
-    if not video:
-        raise HTTPException(status_code=404, detail="Video not found")
-    
-    # Increment counter
-    video.views += 1
-    session.add(video)
+    try:
+        video = await session.get(Video, video_id)
+    except DatabaseUnavailable:
+        video = None  # Queue it anyway; the flush skips videos that don't exist
+    else:
+        if not video:
+            raise HTTPException(status_code=404, detail="Video not found")
     
-    # Log history
-    history = ViewHistory(
-        video_id=video_id,
-        ip_address=request.client.host,
+    # Buffer the increment + history row; they are flushed to the DB in batches
+    pending = view_counter.record(
+        video_id,
+        ip_address=request.client.host if request.client else None,
         user_agent=request.headers.get("user-agent")
     )
-    session.add(history)
     
-    session.commit()
-    return {"status": "success", "views": video.views}
+    if video is None:
+        return {"status": "queued", "views": None}
+    # Approximate live count: last flushed value + views still in the buffer
+    return {"status": "success", "views": video.views + pending}
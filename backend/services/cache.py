@@ -1,45 +1,515 @@
-import time
+"""
+In-process response cache: bounded, thread-safe, LRU + TTL.
+
+- Bounded by entry count (CACHE_MAX_ENTRIES) and by an estimate of the bytes
+  held (CACHE_MAX_BYTES); the least recently used entries are evicted first.
+- Expired entries are dropped when read, and by a periodic sweep
+  (CACHE_SWEEP_INTERVAL seconds) so keys that are never read again don't pile up.
+- get() takes no lock. Recency is tracked CLOCK-style: a read only sets the
+  entry's `referenced` bit, and eviction (under the lock) gives referenced
+  entries a second chance instead of reordering on every hit.
+- get_or_compute() is single-flight: when a hot key is missing, the first
+  request computes it and concurrent requests for the same key await that
+  result instead of all hitting the database.
+
+Writers (set / invalidate / sweep) hold a lock, so background threads can
+invalidate safely while the event loop serves reads.
+
+Entries are tagged with what they were built from (see the *_tag helpers):
+a home feed page carries `feed:home` plus `video:{id}` for every video on it.
+Write paths call invalidate_tags() with what they touched — a like on video 7
+drops exactly the entries tagged `video:7` — and a reverse index makes that
+O(entries with the tag) instead of a scan over every key.
+
+With REDIS_URL set this cache is the L1 in front of a shared backend
+(services/cache_backend.py): misses check Redis before computing, and
+invalidations are broadcast so every worker drops the same entries.
+
+The last good value of the most recent CACHE_STALE_ENTRIES keys (at most
+CACHE_STALE_MAX_BYTES in total) outlives expiry and eviction; when a recompute
+fails because the database is down (stale_if, wired to services/db_health),
+get_or_compute returns it instead. Invalidation drops it too: an invalidated
+value is known to be wrong (a deleted video, a deactivated user).
+"""
+import asyncio
 import logging
-from typing import Any, Dict, Optional
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
-class SimpleCache:
-    """A very simple in-memory cache with expiration."""
-    def __init__(self):
-        self._cache: Dict[str, Dict[str, Any]] = {}
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2000"))
+MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SWEEP_INTERVAL = float(os.getenv("CACHE_SWEEP_INTERVAL", "30"))
+STALE_ENTRIES = int(os.getenv("CACHE_STALE_ENTRIES", "256"))
+STALE_MAX_BYTES = int(os.getenv("CACHE_STALE_MAX_BYTES", str(16 * 1024 * 1024)))
 
-    def set(self, key: str, value: Any, ttl: int = 60):
-        """Set a value in the cache with a time-to-live in seconds."""
-        self._cache[key] = {
-            "value": value,
-            "expiry": time.time() + ttl
-        }
-        logger.info(f"Cache SET: {key} (ttl: {ttl}s)")
+_MISSING = object()
+
+FEED_HOME = "feed:home"
+FEED_SHORTS = "feed:shorts"
+FEED_TRENDING = "feed:trending"
+CATEGORIES = "categories"
+
+Tags = Union[Iterable[str], Callable[[Any], Iterable[str]]]
+
+
+def video_tag(video_id: int) -> str:
+    return f"video:{video_id}"
+
+
+def category_tag(category_id: int) -> str:
+    return f"category:{category_id}"
+
+
+def user_tag(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def video_tags(video: dict) -> List[str]:
+    """Tags for one serialized video: itself, plus its category (shown by name)."""
+    tags = [video_tag(video["id"])]
+    if video.get("category_id"):
+        tags.append(category_tag(video["category_id"]))
+    return tags
+
+
+def video_list_tags(*tags: str) -> Callable[[Any], Iterable[str]]:
+    """Tags for a cached page of serialized videos (or a (page, ...) tuple): `tags` plus video_tags() of each item."""
+    def tags_for(value):
+        videos = value[0] if isinstance(value, tuple) else value
+        return list(tags) + [tag for video in videos for tag in video_tags(video)]
+    return tags_for
+
+
+def _sizeof(value: Any, _depth: int = 0) -> int:
+    """Rough deep size of JSON-like data (dicts, lists, tuples, scalars)."""
+    size = sys.getsizeof(value)
+    if _depth > 16:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _sizeof(k, _depth + 1) + _sizeof(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for v in value:
+            size += _sizeof(v, _depth + 1)
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "expiry", "size", "tags", "referenced")
+
+    def __init__(self, value: Any, expiry: float, size: int, tags: Tuple[str, ...]):
+        self.value = value
+        self.expiry = expiry
+        self.size = size
+        self.tags = tags
+        self.referenced = False
+
+
+class TTLCache:
+    """Bounded LRU + TTL cache with single-flight computation."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES,
+                 sweep_interval: float = SWEEP_INTERVAL, namespace: str = "app",
+                 stale_entries: int = STALE_ENTRIES, stale_max_bytes: int = STALE_MAX_BYTES):
+        self.namespace = namespace
+        # Last good value per key, kept past expiry and eviction. get_or_compute
+        # serves it when compute fails and stale_if(error) says the source is down.
+        # Budgeted on its own: once the live entry is gone it is the only copy.
+        self.stale_if: Optional[Callable[[BaseException], bool]] = None
+        self.stale_entries = stale_entries
+        self.stale_max_bytes = stale_max_bytes
+        self._stale: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._stale_bytes = 0
+        self.backend = None  # Optional shared L2 (services/cache_backend.py)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Set[asyncio.Future] = set()
+        self._listeners: List[Callable[[Optional[Tuple[str, ...]]], None]] = []
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._tags: Dict[str, Set[str]] = {}  # tag -> keys
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Invalidations are numbered; a compute only stores its result if nothing
+        # invalidated its key or one of its tags after it started
+        self._epoch = 0
+        self._cleared_epoch = 0  # Last invalidate-everything
+        self._tag_epochs: Dict[str, int] = {}  # tag -> last invalidation, while computes run
+        self._prefix_epochs: List[Tuple[int, str]] = []  # (invalidation, prefix), while computes run
+        self._inflight_tags: Dict[str, Tuple[str, ...]] = {}  # Tags an in-flight key is expected to carry
+        self._computing = 0
+        self._sweep_task: Optional[asyncio.Task] = None
+        # Counters are bumped without the lock; they are statistics, not invariants
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.coalesced = 0
+        self.l2_hits = 0
+        self.stale_served = 0
+
+    # -- Lifecycle ------------------------------------------------------------
+
+    def add_listener(self, listener: Callable[[Optional[Tuple[str, ...]]], None]):
+        """
+        Call listener(tags) after every local or remote invalidation; tags is None
+        when keys were dropped by prefix. Runs on the invalidating thread.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, tags: Optional[Tuple[str, ...]]):
+        for listener in self._listeners:
+            try:
+                listener(tags)
+            except Exception as e:
+                logger.error(f"[Cache] Invalidation listener failed: {e}")
+
+    def attach(self, backend):
+        """Put a shared backend behind this cache (None detaches). Call from the event loop."""
+        self.backend = backend
+        self._loop = asyncio.get_running_loop() if backend is not None else None
+
+    def start(self):
+        """Start the periodic expiry sweep. Call this from the FastAPI startup event."""
+        if self._sweep_task or self.sweep_interval <= 0:
+            return
+        self._sweep_task = asyncio.create_task(self._sweeper())
+
+    async def stop(self):
+        if self._sweep_task:
+            self._sweep_task.cancel()
+            self._sweep_task = None
+
+    async def _sweeper(self):
+        while True:
+            try:
+                await asyncio.sleep(self.sweep_interval)
+                removed = self.sweep()
+                if removed:
+                    logger.debug(f"[Cache] Swept {removed} expired entries")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"[Cache] Sweep failed: {e}")
+
+    # -- Reads ----------------------------------------------------------------
+
+    def _lookup(self, key: str) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return _MISSING
+        if entry.expiry <= time.time():
+            with self._lock:
+                if self._data.get(key) is entry:
+                    self._remove(key)
+                    self.expirations += 1
+            self.misses += 1
+            return _MISSING
+        entry.referenced = True
+        self.hits += 1
+        return entry.value
 
     def get(self, key: str) -> Optional[Any]:
         """Get a value from the cache if it exists and has not expired."""
-        if key in self._cache:
-            item = self._cache[key]
-            if time.time() < item["expiry"]:
-                logger.debug(f"Cache HIT: {key}")
-                return item["value"]
-            else:
-                logger.debug(f"Cache EXPIRED: {key}")
-                del self._cache[key]
+        value = self._lookup(key)
+        return None if value is _MISSING else value
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]], ttl: int = 60,
+                             tags: Tags = ()) -> Any:
+        """
+        Return the cached value, or await compute() and cache its result.
+        Concurrent callers for the same missing key share one compute() call;
+        if it raises, they all see the exception and nothing is cached.
+        `tags` may be a function of the computed value.
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise  # This request was cancelled, not the leader
+                # The leader's request went away mid-compute; take over
+                return await self.get_or_compute(key, compute, ttl, tags)
+
+        future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self._inflight[key] = future
+            self._inflight_tags[key] = self._expected_tags(key, tags)
+            started = self._epoch
+            self._computing += 1
+        try:
+            shared = await self.backend.get(self.namespace, key) if self.backend is not None else None
+            if shared is not None:
+                # Another worker already computed it; keep it only as long as L2 does
+                value, remaining, shared_tags = shared
+                self.l2_hits += 1
+                if self._still_valid(key, started, shared_tags):
+                    self.set(key, value, remaining, shared_tags)
+                future.set_result(value)
+                return value
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            stale = _MISSING
+            if self.stale_if is not None and self.stale_if(e):
+                with self._lock:
+                    last_good = self._stale.get(key)
+                stale = last_good.value if last_good is not None else _MISSING
+            if stale is not _MISSING:
+                self.stale_served += 1
+                logger.warning(f"[Cache] Serving last good {key}: {type(e).__name__}")
+                future.set_result(stale)
+                return stale
+            future.set_exception(e)
+            future.exception()  # Mark retrieved so an unawaited future doesn't warn
+            raise
         else:
-            logger.debug(f"Cache MISS: {key}")
-        return None
+            # An invalidation of this key or its tags while computing means the value may predate the write
+            value_tags = list(tags(value) if callable(tags) else tags)
+            if self._still_valid(key, started, value_tags):
+                self.set(key, value, ttl, value_tags)
+                if self.backend is not None:
+                    self._spawn(self.backend.set(self.namespace, key, value, ttl, value_tags))
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    self._inflight.pop(key, None)
+                    self._inflight_tags.pop(key, None)
+                self._computing -= 1
+                if not self._computing:
+                    self._tag_epochs.clear()
+                    self._prefix_epochs.clear()
+
+    def _expected_tags(self, key: str, tags: Tags) -> Tuple[str, ...]:
+        """Tags of a key about to be computed: the given ones, or (computed tags) its last known value's."""
+        if not callable(tags):
+            return tuple(tags)
+        last = self._data.get(key) or self._stale.get(key)
+        return last.tags if last is not None else ()
+
+    def _still_valid(self, key: str, started: int, tags: Iterable[str]) -> bool:
+        with self._lock:
+            if self._cleared_epoch > started:
+                return False
+            if any(epoch > started and key.startswith(prefix) for epoch, prefix in self._prefix_epochs):
+                return False
+            return all(self._tag_epochs.get(tag, -1) <= started for tag in tags)
+
+    # -- Writes ---------------------------------------------------------------
+
+    def set(self, key: str, value: Any, ttl: int = 60, tags: Iterable[str] = ()):
+        """Set a value in the cache with a time-to-live in seconds and optional dependency tags."""
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            logger.debug(f"[Cache] Not caching {key}: {size} bytes exceeds the budget")
+            return
+        entry = _Entry(value, time.time() + ttl, size, tuple(dict.fromkeys(tags)))
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = entry
+            self._bytes += size
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            self._evict()
+            if self.stale_entries > 0 and size <= self.stale_max_bytes:
+                self._remove_stale(key)
+                self._stale[key] = entry
+                self._stale_bytes += size
+                while len(self._stale) > self.stale_entries or self._stale_bytes > self.stale_max_bytes:
+                    self._stale_bytes -= self._stale.popitem(last=False)[1].size
+        logger.debug(f"Cache SET: {key} (ttl: {ttl}s, {size} bytes)")
+
+    def invalidate(self, key_prefix: Optional[str] = None):
+        """Invalidate specific key or all keys starting with prefix, in every worker."""
+        self._invalidate_local(key_prefix)
+        if self.backend is not None:
+            self._spawn_threadsafe(lambda: self.backend.invalidate(
+                self.namespace, prefix=key_prefix, everything=key_prefix is None))
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """Drop every entry carrying any of the tags, in every worker. Returns how many were removed here."""
+        removed = self._invalidate_local_tags(tags)
+        if self.backend is not None and tags:
+            self._spawn_threadsafe(lambda: self.backend.invalidate(self.namespace, tags=list(tags)))
+        return removed
+
+    def apply_remote(self, message: dict):
+        """Apply another worker's invalidation to this process only."""
+        if message.get("all"):
+            self._invalidate_local(None)
+        elif message.get("prefix") is not None:
+            self._invalidate_local(message["prefix"])
+        if message.get("tags"):
+            self._invalidate_local_tags(message["tags"])
+
+    def _invalidate_local(self, key_prefix: Optional[str]):
+        with self._lock:
+            self._epoch += 1
+            if key_prefix is None:
+                self._cleared_epoch = self._epoch
+                self._data.clear()
+                self._tags.clear()
+                self._stale.clear()
+                self._bytes = 0
+                self._stale_bytes = 0
+            else:
+                for k in [k for k in self._data if k.startswith(key_prefix)]:
+                    self._remove(k)
+                for k in [k for k in self._stale if k.startswith(key_prefix)]:
+                    self._remove_stale(k)
+            # Later callers must not join a computation that started before this
+            for k in [k for k in self._inflight if key_prefix is None or k.startswith(key_prefix)]:
+                self._inflight.pop(k, None)
+                self._inflight_tags.pop(k, None)
+            if key_prefix is not None and self._computing:
+                self._prefix_epochs.append((self._epoch, key_prefix))
+        logger.debug(f"Cache invalidated (prefix: {key_prefix})")
+        self._notify(None)
+
+    def _invalidate_local_tags(self, tags: Iterable[str]) -> int:
+        removed = 0
+        with self._lock:
+            self._epoch += 1
+            if self._computing:
+                for tag in tags:
+                    self._tag_epochs[tag] = self._epoch
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    if key in self._data:
+                        self._remove(key)
+                        removed += 1
+            # Last good copies whose live entry already expired are no longer in _tags
+            dropped = set(tags)
+            for key in [k for k, e in self._stale.items() if dropped.intersection(e.tags)]:
+                self._remove_stale(key)
+            # Later callers recompute keys expected to carry these tags; other computes carry on
+            for key in [k for k, t in self._inflight_tags.items() if dropped.intersection(t)]:
+                self._inflight.pop(key, None)
+                self._inflight_tags.pop(key, None)
+        logger.debug(f"Cache invalidated tags {tags} ({removed} entries)")
+        self._notify(tuple(tags))
+        return removed
+
+    def sweep(self) -> int:
+        """Drop every expired entry. Returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [k for k, e in self._data.items() if e.expiry <= now]
+            for k in expired:
+                self._remove(k)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def _remove(self, key: str):
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _remove_stale(self, key: str):
+        entry = self._stale.pop(key, None)
+        if entry is not None:
+            self._stale_bytes -= entry.size
+
+    def _evict(self):
+        """Evict until within budget. Caller holds the lock."""
+        now = time.time()
+        while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+            key, entry = next(iter(self._data.items()))
+            if entry.expiry <= now:
+                self._remove(key)
+                self.expirations += 1
+            elif entry.referenced:
+                # Read since it last reached the head: second chance
+                entry.referenced = False
+                self._data.move_to_end(key)
+            else:
+                self._remove(key)
+                self.evictions += 1
+
+    # -- Shared backend -------------------------------------------------------
 
-    def invalidate(self, key_prefix: str = None):
-        """Invalidate specific key or all keys starting with prefix."""
-        if key_prefix is None:
-            self._cache.clear()
+    def _spawn(self, coro: Awaitable):
+        """Run an L2 call in the background; the backend logs its own failures."""
+        task = asyncio.ensure_future(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def _spawn_threadsafe(self, make_coro: Callable[[], Awaitable]):
+        """_spawn from any thread: invalidations also come from worker threads and sync routes."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._spawn(make_coro())
         else:
-            keys_to_del = [k for k in self._cache.keys() if k.startswith(key_prefix)]
-            for k in keys_to_del:
-                del self._cache[k]
-        logger.info(f"Cache invalidated (prefix: {key_prefix})")
+            loop.call_soon_threadsafe(lambda: self._spawn(make_coro()))
+
+    async def flush(self):
+        """Wait for background L2 writes and invalidations (tests, shutdown)."""
+        while self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    # -- Introspection --------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "tags": len(self._tags),
+            "shared": self.backend is not None,
+            "l2_hits": self.l2_hits,
+            "stale_entries": len(self._stale),
+            "stale_bytes": self._stale_bytes,
+            "stale_served": self.stale_served,
+        }
+
+
+# Kept for existing imports
+SimpleCache = TTLCache
 
 # Global instances
-app_cache = SimpleCache()
+app_cache = TTLCache()
+file_url_cache = TTLCache(max_entries=5000, namespace="tg_url")  # Telegram file_id -> download URL
+user_cache = TTLCache(max_entries=10000, namespace="users")  # JWT user id -> User snapshot (routers/auth.py)
@@ -0,0 +1,229 @@
+"""
+Shared (L2) cache backend for multi-worker deployments.
+
+Each uvicorn worker has its own in-process TTLCache (services/cache.py). On
+its own that means N workers pay N cold misses for the same homepage, and an
+invalidation in one worker leaves the others serving stale data. When
+REDIS_URL is set, every TTLCache gets a Redis-protocol backend behind it:
+
+    get_or_compute:  L1 (process) -> L2 (Redis) -> compute, then fill both
+    invalidate:      drop locally, delete from L2, PUBLISH on cache:invalidate
+    subscriber:      every worker drops the same L1 entries when it hears it
+
+Values are stored as JSON with their tags; a tag is a Redis set of the keys
+carrying it, so invalidate_tags() is SMEMBERS + DEL per tag. Pre-encoded
+response bodies (bytes, see services/serialization.py) are stored as text and
+come back as bytes.
+
+Redis is optional and best-effort: if it is down or slow (CACHE_REDIS_TIMEOUT)
+the caches quietly fall back to L1 only. Any client speaking the protocol works
+(redis.asyncio, or fakeredis for tests) — pass it as `client=`.
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_TIMEOUT = float(os.getenv("CACHE_REDIS_TIMEOUT", "0.5"))
+CHANNEL = "cache:invalidate"
+TAG_SET_TTL = 24 * 3600  # Tag sets outlive their entries; DEL of a gone key is harmless
+_BYTES = "__bytes__"
+
+
+def _encode_default(value: Any):
+    if isinstance(value, bytes):
+        return {_BYTES: value.decode("utf-8")}
+    return str(value)
+
+
+def _decode_hook(obj: dict):
+    if len(obj) == 1 and _BYTES in obj:
+        return obj[_BYTES].encode("utf-8")
+    return obj
+
+
+class CacheBackend:
+    """Interface for a shared cache behind the per-process TTLCache."""
+
+    async def get(self, namespace: str, key: str) -> Optional[Tuple[Any, float, List[str]]]:
+        """(value, seconds left, tags) or None."""
+        raise NotImplementedError
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: float, tags: Iterable[str]):
+        raise NotImplementedError
+
+    async def invalidate(self, namespace: str, tags: Optional[List[str]] = None,
+                         prefix: Optional[str] = None, everything: bool = False):
+        """Delete matching entries and tell every other worker to drop them too."""
+        raise NotImplementedError
+
+    async def listen(self, dispatch: Callable[[str, dict], None]):
+        """Run forever, calling dispatch(namespace, message) for other workers' invalidations."""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class RedisBackend(CacheBackend):
+    def __init__(self, url: Optional[str] = None, client=None):
+        if client is None:
+            import redis.asyncio as redis  # Optional dependency, only needed with REDIS_URL
+            client = redis.from_url(url, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT)
+        self.client = client
+        self.origin = uuid.uuid4().hex  # Lets a worker skip its own broadcasts
+        self._down_logged = False
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f"cache:{namespace}:k:{key}"
+
+    @staticmethod
+    def _tag(namespace: str, tag: str) -> str:
+        return f"cache:{namespace}:t:{tag}"
+
+    def _failed(self, op: str, e: Exception):
+        # Once per outage, not once per request
+        if not self._down_logged:
+            logger.warning(f"[Cache] Redis {op} failed, serving from process cache only: {e}")
+            self._down_logged = True
+
+    def _ok(self):
+        if self._down_logged:
+            logger.info("[Cache] Redis reachable again")
+            self._down_logged = False
+
+    async def get(self, namespace, key):
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.get(self._key(namespace, key))
+            pipe.pttl(self._key(namespace, key))
+            raw, pttl = await pipe.execute()
+            self._ok()
+        except Exception as e:
+            self._failed("GET", e)
+            return None
+        if raw is None or pttl is None or pttl <= 0:
+            return None
+        payload = json.loads(raw, object_hook=_decode_hook)
+        return payload["v"], pttl / 1000, payload["t"]
+
+    async def set(self, namespace, key, value, ttl, tags):
+        tags = list(tags)
+        try:
+            raw = json.dumps({"v": value, "t": tags}, separators=(",", ":"), default=_encode_default)
+        except (TypeError, ValueError, UnicodeDecodeError) as e:
+            logger.debug(f"[Cache] Not sharing {key}: {e}")
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.set(self._key(namespace, key), raw, px=max(int(ttl * 1000), 1))
+            for tag in tags:
+                pipe.sadd(self._tag(namespace, tag), key)
+                pipe.expire(self._tag(namespace, tag), TAG_SET_TTL)
+            await pipe.execute()
+            self._ok()
+        except Exception as e:
+            self._failed("SET", e)
+
+    async def invalidate(self, namespace, tags=None, prefix=None, everything=False):
+        message: Dict[str, Any] = {"origin": self.origin, "ns": namespace}
+        try:
+            if everything or prefix is not None:
+                pattern = self._key(namespace, (prefix or "") + "*")
+                doomed = [k async for k in self.client.scan_iter(match=pattern, count=500)]
+                if everything:
+                    doomed += [k async for k in self.client.scan_iter(match=self._tag(namespace, "*"), count=500)]
+                    message["all"] = True
+                else:
+                    message["prefix"] = prefix
+                if doomed:
+                    await self.client.delete(*doomed)
+            if tags:
+                message["tags"] = list(tags)
+                tag_keys = [self._tag(namespace, tag) for tag in tags]
+                pipe = self.client.pipeline(transaction=False)
+                for tag_key in tag_keys:
+                    pipe.smembers(tag_key)
+                members = await pipe.execute()
+                doomed = {self._key(namespace, k.decode() if isinstance(k, bytes) else k)
+                          for keys in members for k in keys}
+                await self.client.delete(*doomed, *tag_keys)
+            await self.client.publish(CHANNEL, json.dumps(message))
+            self._ok()
+        except Exception as e:
+            self._failed("invalidate", e)
+
+    async def listen(self, dispatch):
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(CHANNEL)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    data = json.loads(message["data"])
+                    if data.get("origin") != self.origin:
+                        dispatch(data["ns"], data)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                self._failed("SUBSCRIBE", e)
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose() if hasattr(pubsub, "aclose") else await pubsub.close()
+                except Exception:
+                    pass
+
+    async def close(self):
+        try:
+            await self.client.aclose() if hasattr(self.client, "aclose") else await self.client.close()
+        except Exception:
+            pass
+
+
+_backend: Optional[CacheBackend] = None
+_listener: Optional[asyncio.Task] = None
+
+
+async def start_shared_cache(*caches, backend: Optional[CacheBackend] = None):
+    """
+    Put a shared backend behind the given TTLCaches (REDIS_URL, or `backend`)
+    and start relaying other workers' invalidations. No-op without either.
+    """
+    global _backend, _listener
+    if backend is None:
+        if not REDIS_URL:
+            return
+        backend = RedisBackend(REDIS_URL)
+    by_namespace = {cache.namespace: cache for cache in caches}
+    for cache in caches:
+        cache.attach(backend)
+
+    def dispatch(namespace: str, message: dict):
+        cache = by_namespace.get(namespace)
+        if cache is not None:
+            cache.apply_remote(message)
+
+    _backend = backend
+    _listener = asyncio.create_task(backend.listen(dispatch))
+    logger.info(f"[Cache] Shared backend enabled for {', '.join(by_namespace)}")
+
+
+async def stop_shared_cache(*caches):
+    global _backend, _listener
+    if _listener:
+        _listener.cancel()
+        _listener = None
+    for cache in caches:
+        cache.attach(None)
+    if _backend:
+        await _backend.close()
+        _backend = None
@@ -0,0 +1,132 @@
+"""
+Denormalized counters — O(1) reads for like/dislike/comment/subscriber/playlist counts.
+
+Write endpoints bump the counter columns with a single atomic
+UPDATE ... SET col = col + :delta in the same transaction as the row they
+insert/delete (see increment()). reconcile_counters() recomputes every counter
+from the source tables to repair drift; it runs periodically from main.py (one
+worker per run, under a PostgreSQL advisory lock) and on demand via
+POST /admin/counters/reconcile.
+
+Counter semantics:
+    Video.like_count / dislike_count   VideoLike rows with is_like True / False
+    Video.comment_count                top-level comments only (matches the
+                                       paginated total of GET /comments/video/{id})
+    Comment.likes_count                CommentLike rows
+    User.subscriber_count              Subscription rows where channel_id = user
+    Playlist.item_count                PlaylistItem rows
+"""
+import logging
+import os
+from typing import Dict, Optional
+
+from sqlalchemy import and_, bindparam, func, or_, select, text, update
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_INTERVAL = int(os.getenv("COUNTER_RECONCILE_INTERVAL", str(6 * 60 * 60)))  # 0 disables
+RECONCILE_LOCK_KEY = 0x636F756E  # pg advisory lock id ("coun")
+
+
+def increment(model, row_id: int, **deltas: int):
+    """
+    Build an atomic counter update, e.g. increment(Video, 5, like_count=1, dislike_count=-1).
+    Safe under concurrency (no read-modify-write) and keeps loaded ORM objects in sync.
+    """
+    values = {getattr(model, col): getattr(model, col) + delta for col, delta in deltas.items()}
+    return update(model).where(model.id == row_id).values(values)
+
+
+def _count(model, *conditions):
+    return select(func.count()).select_from(model).where(and_(*conditions)).scalar_subquery()
+
+
+def _reconcile_specs():
+    """Per table: the model and, per counter column, the count it should hold."""
+    from ..models import Comment, CommentLike, Playlist, PlaylistItem, Subscription, User, Video, VideoLike
+
+    return {
+        "videos": (Video, {
+            "like_count": _count(VideoLike, VideoLike.video_id == Video.id, VideoLike.is_like == True),
+            "dislike_count": _count(VideoLike, VideoLike.video_id == Video.id, VideoLike.is_like == False),
+            "comment_count": _count(Comment, Comment.video_id == Video.id, Comment.parent_id == None),
+        }),
+        "comments": (Comment, {"likes_count": _count(CommentLike, CommentLike.comment_id == Comment.id)}),
+        "users": (User, {"subscriber_count": _count(Subscription, Subscription.channel_id == User.id)}),
+        "playlists": (Playlist, {"item_count": _count(PlaylistItem, PlaylistItem.playlist_id == Playlist.id)}),
+    }
+
+
+def _try_lock(session) -> bool:
+    """One reconcile at a time across workers (PostgreSQL; held until commit). SQLite is single-process."""
+    if session.get_bind().dialect.name != "postgresql":
+        return True
+    return bool(session.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": RECONCILE_LOCK_KEY}).scalar())
+
+
+def reconcile_counters(session) -> Optional[Dict[str, int]]:
+    """
+    Recompute all counters from source rows. Returns drifted rows fixed per
+    table, or None if another worker is reconciling right now.
+
+    Corrections are applied as deltas (col = col + (actual - stored), both
+    read in one snapshot) rather than by assigning the count: an increment
+    that commits between that read and the UPDATE is kept, not overwritten.
+    """
+    if not _try_lock(session):
+        logger.info("[Counters] Reconcile already running in another worker, skipping")
+        return None
+    fixed = {}
+    for name, (model, counts) in _reconcile_specs().items():
+        table = model.__table__
+        drifted = session.execute(
+            select(table.c.id, *[(actual - table.c[col]).label(col) for col, actual in counts.items()])
+            .where(or_(*[table.c[col] != actual for col, actual in counts.items()]))
+        ).all()
+        if drifted:
+            correct = (
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values({col: table.c[col] + bindparam(f"d_{col}") for col in counts})
+            )
+            session.execute(correct, [
+                {"b_id": row.id, **{f"d_{col}": getattr(row, col) for col in counts}} for row in drifted
+            ])
+        fixed[name] = len(drifted)
+    session.commit()
+    if any(fixed.values()):
+        logger.warning(f"[Counters] Reconciled drifted counters: {fixed}")
+    else:
+        logger.info("[Counters] Reconcile found no drift")
+    return fixed
+
+
+async def reconcile_loop():
+    """
+    Background task: reconcile every RECONCILE_INTERVAL seconds (in a worker
+    thread). Runs are aligned to the wall clock, so every worker wakes for
+    the same tick and the advisory lock lets exactly one of them do the work.
+    """
+    import asyncio
+    import time
+    from sqlmodel import Session
+    from ..database import engine
+
+    def run_once():
+        with Session(engine) as session:
+            return reconcile_counters(session)
+
+    while True:
+        await asyncio.sleep(RECONCILE_INTERVAL - time.time() % RECONCILE_INTERVAL)
+        try:
+            await asyncio.to_thread(run_once)
+        except Exception as e:
+            logger.error(f"[Counters] Reconcile failed: {e}")
+
+
+if __name__ == "__main__":
+    from sqlmodel import Session
+    from backend.database import engine
+
+    with Session(engine) as session:
+        print(reconcile_counters(session))
@@ -0,0 +1,193 @@
+"""
+Database circuit breaker.
+
+When Neon is suspended or unreachable, every request used to wait out the
+connect and pool timeouts (30 s+) before failing. DBHealth counts
+connection-level failures; after DB_BREAKER_FAILURES in a row it opens:
+
+    closed --N failures--> open --cooldown--> probe (background SELECT 1)
+       ^                     |                   |
+       +------ success ------+------ success ----+   (failure: stay open)
+
+While open, every ORM statement and every new connection raises
+DatabaseUnavailable (a 503 with Retry-After) immediately instead of touching
+the network. Nothing waits for the probe; it runs in its own thread every
+DB_BREAKER_COOLDOWN seconds until the database answers.
+
+Reads degrade instead of failing where we have something to show:
+app_cache keeps the last good value of every key and serves it when the
+compute fails with an outage (see TTLCache.stale_if), and prebuilt feeds keep
+being served past their staleness limit. Buffered writes (views, watch
+progress) stay queued and are replayed once the breaker closes.
+
+Only connection-level errors count: a SQL error or a missing table is a bug,
+not an outage, and must not take the site read-only.
+"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import event, exc as sa_exc, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+FAILURE_THRESHOLD = int(os.getenv("DB_BREAKER_FAILURES", "3"))
+COOLDOWN = float(os.getenv("DB_BREAKER_COOLDOWN", "15"))
+
+# Connection-level driver messages (psycopg2, asyncpg, sqlite)
+_OUTAGE_HINTS = (
+    "could not connect", "connection refused", "connection reset", "connection is closed",
+    "server closed the connection", "connection was closed", "terminating connection",
+    "timeout", "timed out", "could not translate host name", "network is unreachable",
+    "ssl syscall", "ssl connection has been closed", "endpoint is disabled",
+    "unable to open database file",
+)
+
+
+class DatabaseUnavailable(HTTPException):
+    """Raised instead of waiting on a database that is known to be down."""
+
+    def __init__(self, retry_after: float = COOLDOWN):
+        super().__init__(
+            status_code=503,
+            detail="Database temporarily unavailable",
+            headers={"Retry-After": str(max(1, int(retry_after)))},
+        )
+
+
+def is_outage(error: BaseException) -> bool:
+    """Whether an exception means "can't reach the database" rather than a bad query."""
+    if isinstance(error, DatabaseUnavailable):
+        return True
+    if isinstance(error, sa_exc.TimeoutError):  # Pool exhausted
+        return True
+    if isinstance(error, sa_exc.DBAPIError):
+        if error.connection_invalidated:
+            return True
+        if isinstance(error, (sa_exc.OperationalError, sa_exc.InterfaceError)):
+            message = str(error.orig).lower()
+            if "canceling statement" in message:
+                return False  # statement_timeout / lock_timeout: a slow query, not an outage
+            return any(hint in message for hint in _OUTAGE_HINTS)
+        return False
+    return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError, socket.gaierror))
+
+
+class DBHealth:
+    def __init__(self, threshold: int = FAILURE_THRESHOLD, cooldown: float = COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe: Optional[threading.Thread] = None
+        self._probe_ident: Optional[int] = None
+        self._engine = None
+        # Counters are bumped without the lock; they are statistics, not invariants
+        self.trips = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    # -- Wiring ---------------------------------------------------------------
+
+    def install(self, engine, async_engine=None):
+        """Gate statements and new connections on both engines. Call once, at import of database.py."""
+        self._engine = engine
+        event.listen(Session, "do_orm_execute", self._gate_statement)
+        for target in filter(None, (engine, getattr(async_engine, "sync_engine", None))):
+            event.listen(target, "do_connect", self._gate_connect)
+            event.listen(target.pool, "checkout", self._on_checkout)
+
+    def _gate_statement(self, orm_execute_state):
+        self.check()
+
+    def _gate_connect(self, dialect, conn_rec, cargs, cparams):
+        self.check()
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        if self._failures:
+            self.record_success()
+
+    # -- Breaker --------------------------------------------------------------
+
+    def check(self):
+        """Raise DatabaseUnavailable while the breaker is open (the probe thread is let through)."""
+        opened_at = self._opened_at
+        if opened_at is None or threading.get_ident() == self._probe_ident:
+            return
+        elapsed = time.monotonic() - opened_at
+        if elapsed >= self.cooldown:
+            self._start_probe()
+        self.rejected += 1
+        raise DatabaseUnavailable(retry_after=self.cooldown - elapsed if elapsed < self.cooldown else self.cooldown)
+
+    def observe(self, error: BaseException) -> bool:
+        """Count `error` against the breaker if it is an outage. Returns whether it is one."""
+        if not is_outage(error):
+            return False
+        if not isinstance(error, DatabaseUnavailable):
+            self.record_failure(error)
+        return True
+
+    def record_failure(self, error: BaseException):
+        with self._lock:
+            self._failures += 1
+            detail = str(getattr(error, "orig", None) or error).strip().splitlines()
+            self.last_error = f"{type(error).__name__}: {detail[0] if detail else ''}"[:300]
+            if self._opened_at is None and self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+                self.trips += 1
+                logger.error(f"[DBHealth] Database unreachable after {self._failures} failures, "
+                             f"failing fast and serving cached data: {self.last_error}")
+
+    def record_success(self):
+        with self._lock:
+            was_open = self._opened_at is not None
+            self._failures = 0
+            self._opened_at = None
+        if was_open:
+            logger.info("[DBHealth] Database reachable again, breaker closed")
+
+    def _start_probe(self):
+        with self._lock:
+            if self._probe is not None and self._probe.is_alive():
+                return
+            self._probe = threading.Thread(target=self._run_probe, name="db-health-probe", daemon=True)
+            self._probe.start()
+
+    def _run_probe(self):
+        self._probe_ident = threading.get_ident()
+        try:
+            with self._engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            self.record_success()
+        except Exception as e:
+            with self._lock:
+                if self._opened_at is not None:
+                    self._opened_at = time.monotonic()  # Next probe after another cooldown
+            logger.warning(f"[DBHealth] Probe failed, database still unreachable: {e}")
+        finally:
+            self._probe_ident = None
+
+    def stats(self) -> dict:
+        return {
+            "state": "open" if self.is_open else "closed",
+            "consecutive_failures": self._failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+        }
+
+
+# Global singleton
+db_health = DBHealth()
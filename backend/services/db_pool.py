@@ -0,0 +1,390 @@
+"""
+Connection pool metrics, warm-up and optional auto-sizing.
+
+Both engines use the instrumented pools below, so every checkout is timed:
+
+- wait: how long the request waited for a connection (queueing for a free
+  one, or opening an overflow connection). Kept as a histogram per engine;
+  checkouts that found no idle connection are counted as "starved".
+- hold: how long the connection stayed checked out, per route. A route that
+  holds connections for seconds is what exhausts a 3+5 pool.
+
+GET /admin/db/pool shows both, with the current size, overflow and
+checked-out counts.
+
+PoolMonitor.start() replaces the old sync keep-alive loop (a blocking
+`SELECT 1` on the event loop every 4 minutes). It opens DB_POOL_WARM
+connections per engine at startup so the first requests don't pay Neon's
+connect/cold-start, then pings through the async engine every
+DB_KEEPALIVE_INTERVAL seconds to keep the compute from suspending.
+
+With DB_POOL_AUTOTUNE=1 it also resizes the pools every DB_POOL_TUNE_INTERVAL
+seconds, within [DB_POOL_MIN, DB_POOL_MAX]:
+
+- grow by one when the average wait in the last interval exceeded
+  DB_POOL_TARGET_WAIT_MS, or a checkout timed out;
+- shrink by one after DB_POOL_SHRINK_AFTER intervals in which fewer than
+  `size - 1` connections were ever in use at once.
+
+max_overflow stays as configured, so the hard cap moves with the size. The
+tuner works per process: with several uvicorn workers, DB_POOL_MAX times the
+worker count must stay under the database's connection limit.
+"""
+import asyncio
+import bisect
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, exc as sa_exc, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.util import queue as sqla_queue
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "3"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+WARM_CONNECTIONS = int(os.getenv("DB_POOL_WARM", str(POOL_SIZE)))
+KEEPALIVE_INTERVAL = float(os.getenv("DB_KEEPALIVE_INTERVAL", "240"))  # Neon suspends after ~5 min idle
+
+AUTOTUNE = os.getenv("DB_POOL_AUTOTUNE", "0").lower() in ("1", "true", "yes")
+TUNE_INTERVAL = float(os.getenv("DB_POOL_TUNE_INTERVAL", "30"))
+MIN_SIZE = int(os.getenv("DB_POOL_MIN", "2"))
+MAX_SIZE = int(os.getenv("DB_POOL_MAX", "10"))
+TARGET_WAIT_MS = float(os.getenv("DB_POOL_TARGET_WAIT_MS", "50"))
+SHRINK_AFTER = int(os.getenv("DB_POOL_SHRINK_AFTER", "3"))
+
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+# ASGI scope of the request being served; set by SessionReleaseMiddleware
+request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+
+def current_route() -> str:
+    scope = request_scope.get()
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return f"{scope.get('method', '')} {path}" if path else "unmatched"
+
+
+class PoolMetrics:
+    """Checkout wait times for one pool. Counters are bumped without a lock; statistics, not invariants."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.starved = 0  # No idle connection at checkout time
+        self.timeouts = 0
+        self.wait_ms_total = 0.0
+        self.max_wait_ms = 0.0
+        self.buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self._reset_window()
+
+    def _reset_window(self):
+        self.window_checkouts = 0
+        self.window_wait_ms = 0.0
+        self.window_timeouts = 0
+        self.window_peak = 0
+
+    def observe(self, wait_ms: float, starved: bool, in_use: int):
+        self.checkouts += 1
+        self.starved += starved
+        self.wait_ms_total += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.buckets[bisect.bisect_left(WAIT_BUCKETS_MS, wait_ms)] += 1
+        self.window_checkouts += 1
+        self.window_wait_ms += wait_ms
+        self.window_peak = max(self.window_peak, in_use)
+
+    def observe_timeout(self):
+        self.timeouts += 1
+        self.window_timeouts += 1
+
+    def take_window(self) -> dict:
+        window = {
+            "checkouts": self.window_checkouts,
+            "avg_wait_ms": self.window_wait_ms / self.window_checkouts if self.window_checkouts else 0.0,
+            "timeouts": self.window_timeouts,
+            "peak_in_use": self.window_peak,
+        }
+        self._reset_window()
+        return window
+
+    def histogram(self) -> Dict[str, int]:
+        labels = [f"<={b}ms" for b in WAIT_BUCKETS_MS] + [f">{WAIT_BUCKETS_MS[-1]}ms"]
+        return dict(zip(labels, self.buckets))
+
+
+class _InstrumentedPool:
+    """Times QueuePool._do_get (the blocking part of a checkout) and allows resizing in place."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        starved = self._pool.qsize() == 0
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except sa_exc.TimeoutError:
+            self.metrics.observe_timeout()
+            raise
+        self.metrics.observe((time.perf_counter() - started) * 1000, starved, self.checkedout() + 1)
+        return record
+
+    def resize(self, size: int):
+        """
+        Change pool_size, keeping max_overflow. `_overflow` counts connections
+        beyond pool_size, so it moves by the same amount in the other direction.
+        """
+        with self._overflow_lock:
+            delta = size - self._pool.maxsize
+            self._pool.maxsize = size
+            queue = self._pool.__dict__.get("_queue")  # AsyncAdaptedQueue's asyncio.Queue, once created
+            if queue is not None:
+                queue._maxsize = size
+            self._overflow -= delta
+        if delta < 0:
+            self._close_excess()
+
+    def _close_excess(self):
+        # The sync queue only refuses a returned connection when exactly full,
+        # so idle connections above the new size must go now
+        while self._pool.qsize() > self._pool.maxsize:
+            try:
+                record = self._pool.get(False)
+            except sqla_queue.Empty:
+                break
+            try:
+                record.close()
+            finally:
+                self._dec_overflow()
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    def _close_excess(self):
+        # asyncio.Queue refuses puts once full, so surplus idle connections are
+        # closed as they come back instead (closing here needs a greenlet)
+        pass
+
+
+class RouteHolds:
+    """How long each route keeps a connection checked out."""
+
+    def __init__(self):
+        self.routes: Dict[str, List[float]] = {}  # route -> [count, total_ms, max_ms]
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out"] = (time.perf_counter(), current_route())
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        checked_out = connection_record.info.pop("checked_out", None)
+        if checked_out is None:
+            return
+        started, route = checked_out
+        held_ms = (time.perf_counter() - started) * 1000
+        entry = self.routes.setdefault(route, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += held_ms
+        entry[2] = max(entry[2], held_ms)
+
+    def stats(self) -> Dict[str, dict]:
+        ranked = sorted(self.routes.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            route: {"checkouts": count, "avg_hold_ms": round(total / count, 1), "max_hold_ms": round(peak, 1)}
+            for route, (count, total, peak) in ranked
+        }
+
+
+class PoolMonitor:
+    def __init__(self, autotune: bool = AUTOTUNE, min_size: int = MIN_SIZE, max_size: int = MAX_SIZE,
+                 target_wait_ms: float = TARGET_WAIT_MS, shrink_after: int = SHRINK_AFTER):
+        self.autotune = autotune
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.target_wait_ms = target_wait_ms
+        self.shrink_after = shrink_after
+        self.holds = RouteHolds()
+        self._engines: Dict[str, object] = {}
+        self._quiet: Dict[str, int] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.resizes: List[dict] = []  # Most recent last
+        self.last_ping_error: Optional[str] = None
+
+    def install(self, engine, async_engine=None):
+        """Record hold times on both engines. Call once, at import of database.py."""
+        self._engines = {"sync": engine}
+        if async_engine is not None:
+            self._engines["async"] = async_engine
+        for target in self._engines.values():
+            pool = self._pool(target)
+            event.listen(pool, "checkout", self.holds.on_checkout)
+            event.listen(pool, "checkin", self.holds.on_checkin)
+
+    @staticmethod
+    def _pool(engine):
+        return getattr(engine, "sync_engine", engine).pool
+
+    # -- Lifecycle ------------------------------------------------------------
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._keep_warm())]
+        if self.autotune:
+            self._tasks.append(asyncio.create_task(self._tune_loop()))
+            logger.info(f"[DBPool] Auto-sizing pools between {self.min_size} and {self.max_size} "
+                        f"(target wait {self.target_wait_ms:.0f} ms)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    # -- Warm-up and keep-alive -------------------------------------------------
+
+    async def warm_up(self, connections: int = WARM_CONNECTIONS):
+        """Open `connections` per engine concurrently, so they sit idle in the pools."""
+        from .db_health import db_health
+        if connections <= 0 or db_health.is_open:
+            return
+        started = time.perf_counter()
+        jobs = []
+        if "async" in self._engines:
+            jobs += [self._ping_async(self._engines["async"]) for _ in range(connections)]
+        jobs.append(asyncio.to_thread(self._warm_sync, self._engines["sync"], connections))
+        results = await asyncio.gather(*jobs, return_exceptions=True)
+        failed = [r for r in results if isinstance(r, Exception)]
+        if failed:
+            logger.warning(f"[DBPool] Warm-up incomplete ({len(failed)} failed): {failed[0]}")
+        else:
+            logger.info(f"[DBPool] Warmed {connections} connections per engine "
+                        f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    @staticmethod
+    async def _ping_async(engine):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await asyncio.sleep(0)  # Keep it checked out while the others connect
+
+    @staticmethod
+    def _warm_sync(engine, connections: int):
+        # Hold them all at once, or the pool would hand the same one back each time
+        held = []
+        try:
+            for _ in range(connections):
+                conn = engine.connect()
+                held.append(conn)
+                conn.execute(text("SELECT 1"))
+        finally:
+            for conn in held:
+                conn.close()
+
+    async def _keep_warm(self):
+        from .db_health import db_health
+        await self.warm_up()
+        engine = self._engines.get("async")
+        while True:
+            await asyncio.sleep(KEEPALIVE_INTERVAL)
+            if db_health.is_open:
+                continue  # The breaker's probe is already knocking
+            try:
+                if engine is not None:
+                    await self._ping_async(engine)
+                else:
+                    await asyncio.to_thread(self._warm_sync, self._engines["sync"], 1)
+                self.last_ping_error = None
+                logger.debug("[DBPool] Keep-alive ping OK")
+            except Exception as e:
+                self.last_ping_error = str(e)[:300]
+                logger.warning(f"[DBPool] Keep-alive ping failed: {e}")
+
+    # -- Auto-sizing ------------------------------------------------------------
+
+    async def _tune_loop(self):
+        while True:
+            await asyncio.sleep(TUNE_INTERVAL)
+            try:
+                await self.tune()
+            except Exception as e:
+                logger.error(f"[DBPool] Auto-sizing failed: {e}")
+
+    async def tune(self):
+        """One auto-sizing step for every pool, from the checkouts since the previous step."""
+        for name, engine in self._engines.items():
+            pool = self._pool(engine)
+            if not isinstance(pool, _InstrumentedPool):
+                continue
+            window = pool.metrics.take_window()
+            size = pool.size()
+            target = size
+            if window["timeouts"] or window["avg_wait_ms"] > self.target_wait_ms:
+                self._quiet[name] = 0
+                target = min(size + 1, self.max_size)
+            elif window["peak_in_use"] < size - 1:
+                self._quiet[name] = self._quiet.get(name, 0) + 1
+                if self._quiet[name] >= self.shrink_after:
+                    self._quiet[name] = 0
+                    target = max(size - 1, self.min_size)
+            else:
+                self._quiet[name] = 0
+            if target != size:
+                if name == "sync":
+                    await asyncio.to_thread(pool.resize, target)  # May close idle connections
+                else:
+                    pool.resize(target)
+                self.resizes = (self.resizes + [{
+                    "pool": name, "from": size, "to": target, "at": time.time(), **window,
+                }])[-20:]
+                logger.info(f"[DBPool] {name} pool {size} -> {target} (avg wait "
+                            f"{window['avg_wait_ms']:.1f} ms, peak {window['peak_in_use']}, "
+                            f"timeouts {window['timeouts']})")
+
+    # -- Reporting ----------------------------------------------------------------
+
+    def pool_stats(self, pool) -> dict:
+        stats = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),
+            "max_overflow": pool._max_overflow,
+            "timeout_s": pool.timeout(),
+        }
+        metrics = getattr(pool, "metrics", None)
+        if metrics is not None:
+            done = metrics.checkouts or 1
+            stats.update({
+                "checkouts": metrics.checkouts,
+                "starved": metrics.starved,
+                "timeouts": metrics.timeouts,
+                "avg_wait_ms": round(metrics.wait_ms_total / done, 2),
+                "max_wait_ms": round(metrics.max_wait_ms, 1),
+                "wait_histogram": metrics.histogram(),
+            })
+        return stats
+
+    def stats(self) -> dict:
+        return {
+            "pools": {name: self.pool_stats(self._pool(engine)) for name, engine in self._engines.items()},
+            "routes": self.holds.stats(),
+            "autotune": {
+                "enabled": self.autotune,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "target_wait_ms": self.target_wait_ms,
+                "recent_resizes": self.resizes,
+            },
+            "keepalive_error": self.last_ping_error,
+        }
+
+
+# Global singleton
+pool_monitor = PoolMonitor()
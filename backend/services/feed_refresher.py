@@ -0,0 +1,218 @@
+"""
+Stale-while-revalidate feeds.
+
+The homepage, shorts, trending and each category's first page are rebuilt in
+the background every FEED_REFRESH_INTERVAL seconds and kept as ready-to-send
+JSON bytes with their ETag. Requests for those pages never touch the database:
+they get the last body built, even while a rebuild is running or the database
+is slow to wake up.
+
+Freshness comes from app_cache invalidations: every feed remembers the tags of
+what it shows (services/cache.py), and an invalidation that hits one marks the
+feed dirty and wakes the refresher, which rebuilds just the dirty feeds after
+FEED_REFRESH_DEBOUNCE seconds (so a burst of likes costs one rebuild). Until
+the rebuild lands the previous body is served. A feed older than FEED_MAX_STALE
+is no longer served and requests fall back to the regular cached query
+path, unless the database is down (services/db_health): then the last page
+built is still the best answer.
+
+Routers register what to build with @feed_refresher.source: an async function
+taking an AsyncSession and returning {feed name: builder}, where a builder
+returns (data, next_cursor, tags). Sources are re-read on every cycle, so a
+new category gets its feed on the next refresh.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from fastapi import Response
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .db_health import db_health
+from .http_cache import make_etag
+from .pagination import NEXT_CURSOR_HEADER
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = float(os.getenv("FEED_REFRESH_INTERVAL", "60"))
+REFRESH_DEBOUNCE = float(os.getenv("FEED_REFRESH_DEBOUNCE", "1"))
+MAX_STALE = float(os.getenv("FEED_MAX_STALE", "3600"))
+PAGE_SIZE = 20  # What the frontend requests; other sizes use the regular path
+
+Builder = Callable[[AsyncSession], Awaitable[Tuple[Any, Optional[str], List[str]]]]
+Source = Callable[[AsyncSession], Awaitable[Dict[str, Builder]]]
+
+
+class _Feed:
+    __slots__ = ("data", "body", "etag", "next_cursor", "tags", "built_at", "dirty")
+
+    def __init__(self, data: Any, body: bytes, next_cursor: Optional[str], tags: FrozenSet[str]):
+        self.data = data
+        self.body = body
+        self.etag = make_etag(body)
+        self.next_cursor = next_cursor
+        self.tags = tags
+        self.built_at = time.time()
+        self.dirty = False
+
+
+class FeedRefresher:
+    def __init__(self, interval: float = REFRESH_INTERVAL, debounce: float = REFRESH_DEBOUNCE,
+                 max_stale: float = MAX_STALE):
+        self.interval = interval
+        self.debounce = debounce
+        self.max_stale = max_stale
+        self._sources: List[Source] = []
+        self._feeds: Dict[str, _Feed] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.served = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.last_cycle_ms: Optional[float] = None
+
+    def source(self, fn: Source) -> Source:
+        """Decorator: register a function returning {feed name: builder}."""
+        self._sources.append(fn)
+        return fn
+
+    # -- Lifecycle ------------------------------------------------------------
+
+    def start(self, cache):
+        """Build every feed now, then keep them fresh. Call this from the FastAPI startup event."""
+        if self._task or self.interval <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        cache.add_listener(self._on_invalidate)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._loop = None
+
+    # -- Serving --------------------------------------------------------------
+
+    def _usable(self, name: str) -> Optional[_Feed]:
+        feed = self._feeds.get(name)
+        if feed is None:
+            return None
+        if time.time() - feed.built_at > self.max_stale and not db_health.is_open:
+            return None
+        self.served += 1
+        return feed
+
+    def page(self, name: str) -> Optional[Tuple[Any, Optional[str]]]:
+        """The prebuilt (data, next_cursor), for callers that reshape it (e.g. sparse fieldsets)."""
+        feed = self._usable(name)
+        return (feed.data, feed.next_cursor) if feed is not None else None
+
+    def response(self, name: str) -> Optional[Response]:
+        """The prebuilt page as a Response, or None if there isn't a usable one."""
+        feed = self._usable(name)
+        if feed is None:
+            return None
+        headers = {"ETag": feed.etag}
+        if feed.next_cursor:
+            headers[NEXT_CURSOR_HEADER] = feed.next_cursor
+        return Response(content=feed.body, media_type="application/json", headers=headers)
+
+    # -- Refreshing -----------------------------------------------------------
+
+    def _on_invalidate(self, tags: Optional[Tuple[str, ...]]):
+        """app_cache listener; runs on whichever thread invalidated."""
+        touched = set(tags) if tags is not None else None
+        hit = False
+        for feed in list(self._feeds.values()):
+            if touched is None or not feed.tags.isdisjoint(touched):
+                feed.dirty = True
+                hit = True
+        loop = self._loop
+        if hit and loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake.set)
+
+    async def _run(self):
+        full = True
+        while True:
+            try:
+                await self.refresh(only_dirty=not full)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                db_health.observe(e)
+                logger.error(f"[Feeds] Refresh failed, serving previous pages: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+                full = False
+                await asyncio.sleep(self.debounce)
+            except asyncio.TimeoutError:
+                full = True
+            except asyncio.CancelledError:
+                break
+            self._wake.clear()
+
+    async def refresh(self, only_dirty: bool = False) -> int:
+        """Rebuild feeds (all, or only dirty and new ones). Returns how many were rebuilt."""
+        from ..database import async_engine
+
+        if db_health.is_open:
+            return 0  # Keep serving what we have; the breaker's probe decides when to retry
+        started = time.perf_counter()
+        rebuilt = 0
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            builders: Dict[str, Builder] = {}
+            for source in self._sources:
+                builders.update(await source(session))
+            for name in [name for name in self._feeds if name not in builders]:
+                del self._feeds[name]  # e.g. a deleted category
+
+            for name, build in builders.items():
+                feed = self._feeds.get(name)
+                if only_dirty and feed is not None and not feed.dirty:
+                    continue
+                if feed is not None:
+                    feed.dirty = False  # An invalidation during the build sets it again
+                try:
+                    data, next_cursor, tags = await build(session)
+                except Exception as e:
+                    db_health.observe(e)
+                    self.failures += 1
+                    if feed is not None:
+                        feed.dirty = True
+                    logger.warning(f"[Feeds] Building {name} failed, keeping the previous page: {e}")
+                    continue
+                body = dumps(data)
+                fresh = _Feed(data, body, next_cursor, frozenset(tags))
+                fresh.dirty = feed is not None and feed.dirty
+                self._feeds[name] = fresh
+                rebuilt += 1
+
+        self.refreshes += rebuilt
+        self.last_cycle_ms = round((time.perf_counter() - started) * 1000, 1)
+        if rebuilt:
+            logger.debug(f"[Feeds] Rebuilt {rebuilt} feeds in {self.last_cycle_ms}ms")
+        return rebuilt
+
+    # -- Introspection --------------------------------------------------------
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "feeds": len(self._feeds),
+            "dirty": sum(1 for feed in self._feeds.values() if feed.dirty),
+            "oldest_age_s": round(max((now - f.built_at for f in self._feeds.values()), default=0), 1),
+            "served": self.served,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_cycle_ms": self.last_cycle_ms,
+        }
+
+
+# Global singleton
+feed_refresher = FeedRefresher()
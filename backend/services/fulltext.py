@@ -0,0 +1,117 @@
+"""
+Full-text video search backed by the database's text index (migration 0007).
+
+SQLite uses the video_fts FTS5 table (bm25), Postgres the video.search_vector
+GIN index (ts_rank_cd). Both return the matching video ids best-first; every
+word must match and the last one is treated as a prefix, so results keep up
+with type-ahead queries ("funny ca" finds "funny cats").
+
+Scores are normalised to "lower is better" on both backends so one keyset
+cursor, (score, id) ascending, pages through either.
+
+If the index has not been created yet (migrations not run), search_video_ids()
+returns None and the caller falls back to the old LIKE scan.
+"""
+import logging
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+
+from .pagination import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_MAX_TERMS = 8
+
+_fts_enabled: Optional[bool] = None  # Checked once per process
+
+SQLITE_SEARCH = """
+SELECT id, score FROM (
+    SELECT rowid AS id, bm25(video_fts, 10.0, 1.0) AS score
+    FROM video_fts WHERE video_fts MATCH :query
+) matches
+{after}
+ORDER BY score, id
+LIMIT :limit OFFSET :offset
+"""
+
+POSTGRES_SEARCH = """
+SELECT id, score FROM (
+    SELECT id, -ts_rank_cd(search_vector, q, 32)::float8 AS score
+    FROM video, to_tsquery('simple', :query) q
+    WHERE search_vector @@ q
+) matches
+{after}
+ORDER BY score, id
+LIMIT :limit OFFSET :offset
+"""
+
+AFTER_CURSOR = "WHERE (score, id) > (:after_score, :after_id)"
+
+
+def _terms(q: str) -> List[str]:
+    return _WORD_RE.findall(q.lower())[:_MAX_TERMS]
+
+
+def _fts5_query(terms: List[str]) -> str:
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _tsquery(terms: List[str]) -> str:
+    return " & ".join(terms[:-1] + [terms[-1] + ":*"])
+
+
+async def _check_enabled(session) -> bool:
+    global _fts_enabled
+    if _fts_enabled is None:
+        if session.bind.dialect.name == "postgresql":
+            row = (await session.execute(text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'video' AND column_name = 'search_vector'"
+            ))).first()
+        else:
+            row = (await session.execute(text(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'video_fts'"
+            ))).first()
+        _fts_enabled = row is not None
+        if not _fts_enabled:
+            logger.warning("[Search] Full-text index missing (run python -m backend.migrations); using LIKE scan")
+    return _fts_enabled
+
+
+async def search_video_ids(session, q: str, limit: int = 20, cursor: Optional[str] = None,
+                           skip: int = 0) -> Optional[Tuple[List[int], Optional[str]]]:
+    """
+    Ranked ids of videos matching q, plus the cursor for the next page.
+    Returns None when the full-text index is unavailable.
+    """
+    if not await _check_enabled(session):
+        return None
+
+    terms = _terms(q)
+    if not terms:
+        return [], None
+
+    postgres = session.bind.dialect.name == "postgresql"
+    params = {
+        "query": _tsquery(terms) if postgres else _fts5_query(terms),
+        "limit": limit + 1,
+        "offset": 0 if cursor else skip,
+    }
+    after = ""
+    if cursor:
+        params["after_score"], params["after_id"] = decode_cursor(cursor, 2)
+        after = AFTER_CURSOR
+
+    sql = (POSTGRES_SEARCH if postgres else SQLITE_SEARCH).format(after=after)
+    rows = (await session.execute(text(sql), params)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].score, rows[-1].id)
+    return [row.id for row in rows], next_cursor
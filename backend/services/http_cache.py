@@ -0,0 +1,228 @@
+"""
+HTTP caching: ETags, conditional GETs and Cache-Control per route.
+
+HTTPCacheMiddleware is plain ASGI and only looks at successful GET/HEAD
+responses:
+
+- Cache-Control comes from the first matching policy in POLICIES unless the
+  handler already set one (thumbnails do: local files are immutable, the
+  placeholder is not).
+- Small text/JSON/SVG bodies get a strong ETag, a hash of the exact bytes
+  sent. Those bodies mostly come straight out of app_cache, so the hash is
+  the only extra work on a hit.
+- If-None-Match (or If-Modified-Since for responses that carry Last-Modified,
+  like FileResponse) that still matches turns the response into a bodiless 304.
+
+Public feeds use `max-age=0, s-maxage=N`: browsers revalidate every time (a
+like must show up on the next fetch) and get 304s, while a fronting CDN may
+serve the page for N seconds without reaching the app or the database.
+Anything per-user is `private, no-cache`; admin and auth are `no-store`.
+"""
+import hashlib
+import logging
+import os
+import re
+from email.utils import parsedate_to_datetime
+from typing import List, Optional, Pattern
+
+from starlette.datastructures import Headers, MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+MAX_ETAG_BYTES = int(os.getenv("HTTP_CACHE_MAX_ETAG_BYTES", str(2 * 1024 * 1024)))
+CDN_MAX_AGE = int(os.getenv("HTTP_CACHE_CDN_MAX_AGE", "60"))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+PRIVATE = "private, no-cache"
+NO_STORE = "no-store"
+
+
+def public(s_maxage: int = CDN_MAX_AGE, max_age: int = 0) -> str:
+    return f"public, max-age={max_age}, s-maxage={s_maxage}, stale-while-revalidate={s_maxage}"
+
+
+class Policy:
+    def __init__(self, path: str, cache_control: Optional[str], etag: bool = True):
+        self.pattern: Pattern = re.compile(path)
+        self.cache_control = cache_control  # None: leave the response alone
+        self.etag = etag
+
+
+POLICIES: List[Policy] = [
+    Policy(r"^/stream/", None, etag=False),  # Redirects and byte ranges
+    Policy(r"^/(admin|auth)/", NO_STORE, etag=False),
+    Policy(r"^/assets/", IMMUTABLE),  # Vite output, content-hashed file names
+    Policy(r"^/thumbnails/download-all/", PRIVATE),
+    Policy(r"^/thumbnails/", public(s_maxage=300, max_age=300)),
+    Policy(r"^/videos/categories/all$", public(s_maxage=600, max_age=60)),
+    Policy(r"^/videos/(suggest|search)$", public(s_maxage=60, max_age=30)),
+    Policy(r"^/videos/(shorts|trending|category/[^/]+)?/?$", public()),
+    Policy(r"^/videos/\d+$", public(s_maxage=30)),
+    Policy(r"^/upload/user/\d+/videos$", public()),
+    Policy(r"^/subscriptions/channel/\d+/count$", public(s_maxage=30)),
+    Policy(r"", PRIVATE),  # Per-user or unknown: revalidate, never shared
+]
+
+# Headers a 304 keeps (RFC 9110 15.4.5); the body-describing ones go
+_NOT_MODIFIED_HEADERS = {
+    b"cache-control", b"content-location", b"date", b"etag", b"expires", b"vary",
+    b"last-modified", b"x-next-cursor",
+    b"access-control-allow-origin", b"access-control-expose-headers",
+}
+_ETAG_TYPES = (b"application/json", b"image/svg+xml", b"text/")
+
+
+def match_policy(path: str) -> Policy:
+    for policy in POLICIES:
+        if policy.pattern.search(path):
+            return policy
+    return POLICIES[-1]
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires."""
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def is_not_modified(request_headers: Headers, response_headers: MutableHeaders) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    etag = response_headers.get("etag")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since when both are sent
+        return etag is not None and _etag_matches(if_none_match, etag)
+    if_modified_since = request_headers.get("if-modified-since")
+    last_modified = response_headers.get("last-modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class HTTPCacheStats:
+    """Counters are bumped without a lock; they are statistics, not invariants."""
+
+    def __init__(self):
+        self.responses = 0
+        self.etagged = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self.bytes_saved = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "responses": self.responses,
+            "etagged": self.etagged,
+            "not_modified": self.not_modified,
+            "not_modified_ratio": round(self.not_modified / self.responses, 3) if self.responses else None,
+            "bytes_sent": self.bytes_sent,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+http_cache_stats = HTTPCacheStats()
+
+
+def _not_modified_message(start: dict) -> dict:
+    headers = [(k, v) for k, v in start["headers"] if k.lower() in _NOT_MODIFIED_HEADERS]
+    return {"type": "http.response.start", "status": 304, "headers": headers}
+
+
+class HTTPCacheMiddleware:
+    def __init__(self, app, max_etag_bytes: int = MAX_ETAG_BYTES, stats: HTTPCacheStats = http_cache_stats):
+        self.app = app
+        self.max_etag_bytes = max_etag_bytes
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        policy = match_policy(scope["path"])
+        if policy.cache_control is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        stats = self.stats
+        state: dict = {"mode": "pass", "start": None, "body": []}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                await on_start(message)
+            elif message["type"] == "http.response.body":
+                await on_body(message)
+            else:
+                await send(message)
+
+        async def on_start(message):
+            if message["status"] != 200:
+                await send(message)
+                return
+            stats.responses += 1
+            headers = MutableHeaders(raw=message["headers"])
+            if "cache-control" not in headers:
+                headers["Cache-Control"] = policy.cache_control
+            if "etag" in headers or "last-modified" in headers:
+                # FileResponse / StaticFiles validators: decide now, before the body
+                if is_not_modified(request_headers, headers):
+                    stats.not_modified += 1
+                    stats.bytes_saved += int(headers.get("content-length", 0))
+                    state["mode"] = "drop"
+                    await send(_not_modified_message(message))
+                    return
+                await send(message)
+                return
+            length = headers.get("content-length")
+            content_type = headers.get("content-type", "").encode()
+            if (policy.etag and scope["method"] == "GET" and length is not None and int(length) <= self.max_etag_bytes
+                    and content_type.startswith(_ETAG_TYPES)):
+                state["mode"] = "buffer"
+                state["start"] = message
+                return
+            await send(message)
+
+        async def on_body(message):
+            mode = state["mode"]
+            if mode == "pass":
+                stats.bytes_sent += len(message.get("body", b""))
+                await send(message)
+                return
+            if mode == "drop":
+                return
+            state["body"].append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(state["body"])
+            start = state["start"]
+            headers = MutableHeaders(raw=start["headers"])
+            headers["ETag"] = make_etag(body)
+            stats.etagged += 1
+            if is_not_modified(request_headers, headers):
+                stats.not_modified += 1
+                stats.bytes_saved += len(body)
+                await send(_not_modified_message(start))
+                await send({"type": "http.response.body", "body": b""})
+                return
+            stats.bytes_sent += len(body)
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
+        if state["mode"] == "drop":
+            # The app's body was swallowed; close the 304 ourselves
+            await send({"type": "http.response.body", "body": b""})
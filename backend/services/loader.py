@@ -0,0 +1,111 @@
+"""
+Per-request batch loader (DataLoader-style).
+
+List endpoints used to fetch the page and then call session.get(Video, id) for
+every row — 1 + N round-trips, which on Neon means N network hops per page.
+The loader collects the keys first and fetches them with a single
+`WHERE id IN (...)` query, so an endpoint costs the same number of queries
+whatever the page size.
+
+One BatchLoader lives on request.state for the duration of a request (see
+get_loader), so rows already loaded by one part of the request are served from
+memory to the next. It works with both Session and AsyncSession:
+
+    videos = await loader.load_many(session, Video, [h.video_id for h in history])
+    sources = loader.load_groups_sync(session, VideoSource.video_id, video_ids)
+"""
+from typing import Any, Dict, Iterable, List, Tuple
+
+from fastapi import Request
+from sqlmodel import select
+
+# Stay well below SQLite's bound-parameter limit (999 on older builds)
+IN_CHUNK = 500
+
+
+def _chunks(keys: List[Any]):
+    for i in range(0, len(keys), IN_CHUNK):
+        yield keys[i:i + IN_CHUNK]
+
+
+class BatchLoader:
+    def __init__(self):
+        self._rows: Dict[Tuple[type, Any], Any] = {}
+        self._groups: Dict[Tuple[Any, Any], List[Any]] = {}
+
+    def _missing_rows(self, model, ids: Iterable[Any]) -> List[Any]:
+        return list(dict.fromkeys(i for i in ids if i is not None and (model, i) not in self._rows))
+
+    def _store_rows(self, model, missing: List[Any], rows: List[Any]):
+        for row in rows:
+            self._rows[(model, row.id)] = row
+        for i in missing:
+            self._rows.setdefault((model, i), None)  # Remember misses too
+
+    def _rows_for(self, model, ids: Iterable[Any]) -> Dict[Any, Any]:
+        found = {}
+        for i in ids:
+            row = self._rows.get((model, i))
+            if row is not None:
+                found[i] = row
+        return found
+
+    def _missing_groups(self, column, keys: Iterable[Any]) -> List[Any]:
+        return list(dict.fromkeys(k for k in keys if k is not None and (column, k) not in self._groups))
+
+    def _store_groups(self, column, missing: List[Any], rows: List[Any]):
+        for k in missing:
+            self._groups[(column, k)] = []
+        for row in rows:
+            self._groups[(column, getattr(row, column.key))].append(row)
+
+    def _groups_for(self, column, keys: Iterable[Any]) -> Dict[Any, List[Any]]:
+        return {k: self._groups.get((column, k), []) for k in keys}
+
+    # -- AsyncSession ---------------------------------------------------------
+
+    async def load_many(self, session, model, ids: Iterable[Any]) -> Dict[Any, Any]:
+        """Rows of `model` by primary key. Missing ids are absent from the result."""
+        ids = list(ids)
+        missing = self._missing_rows(model, ids)
+        for chunk in _chunks(missing):
+            rows = (await session.exec(select(model).where(model.id.in_(chunk)))).all()
+            self._store_rows(model, chunk, rows)
+        return self._rows_for(model, ids)
+
+    async def load_groups(self, session, column, keys: Iterable[Any]) -> Dict[Any, List[Any]]:
+        """Child rows grouped by a foreign key column, e.g. VideoSource.video_id."""
+        keys = list(keys)
+        missing = self._missing_groups(column, keys)
+        model = column.class_
+        for chunk in _chunks(missing):
+            rows = (await session.exec(select(model).where(column.in_(chunk)).order_by(model.id))).all()
+            self._store_groups(column, chunk, rows)
+        return self._groups_for(column, keys)
+
+    # -- Session --------------------------------------------------------------
+
+    def load_many_sync(self, session, model, ids: Iterable[Any]) -> Dict[Any, Any]:
+        ids = list(ids)
+        missing = self._missing_rows(model, ids)
+        for chunk in _chunks(missing):
+            rows = session.exec(select(model).where(model.id.in_(chunk))).all()
+            self._store_rows(model, chunk, rows)
+        return self._rows_for(model, ids)
+
+    def load_groups_sync(self, session, column, keys: Iterable[Any]) -> Dict[Any, List[Any]]:
+        keys = list(keys)
+        missing = self._missing_groups(column, keys)
+        model = column.class_
+        for chunk in _chunks(missing):
+            rows = session.exec(select(model).where(column.in_(chunk)).order_by(model.id)).all()
+            self._store_groups(column, chunk, rows)
+        return self._groups_for(column, keys)
+
+
+def get_loader(request: Request) -> BatchLoader:
+    """FastAPI dependency: the BatchLoader for the current request."""
+    loader = getattr(request.state, "loader", None)
+    if loader is None:
+        loader = request.state.loader = BatchLoader()
+    return loader
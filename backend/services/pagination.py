@@ -0,0 +1,79 @@
+"""
+Keyset (cursor) pagination.
+
+OFFSET makes the database walk and discard every row before the page, so deep
+pages of an infinite-scroll feed get slower and slower. A cursor instead
+encodes the sort key of the last row served, and the next page starts with
+    WHERE (upload_date, id) < (:last_date, :last_id)
+which the (…, upload_date) indexes answer directly — page 500 costs the same
+as page 1.
+
+Cursors are opaque base64 strings. List endpoints return the cursor for the
+next page in the X-Next-Cursor response header (absent on the last page), so
+their JSON bodies stay plain arrays; `skip` keeps working for old clients.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+from ..models import Video
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Newest first; id breaks ties between videos uploaded in the same instant
+VIDEO_KEYSET = (Video.upload_date, Video.id)
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> Tuple[Any, ...]:
+    """Decode a cursor of `size` values. Raises 400 on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != size:
+            raise ValueError("wrong cursor length")
+        return tuple(datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in payload)
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def paginate(statement, columns: Sequence, cursor: Optional[str] = None, skip: int = 0, limit: int = 20,
+             ascending: bool = False):
+    """
+    Order `statement` by `columns` (all descending unless `ascending`, last one
+    unique — normally the id) and apply the cursor, or fall back to OFFSET when
+    no cursor is given. Fetches limit + 1 rows so page_results() can tell
+    whether a next page exists.
+    """
+    statement = statement.order_by(*[col.asc() if ascending else col.desc() for col in columns])
+    if cursor:
+        # Python tuple on the right so each value is bound with its column's type
+        after = decode_cursor(cursor, len(columns))
+        keys = tuple_(*columns)
+        statement = statement.where(keys > after if ascending else keys < after)
+    elif skip:
+        statement = statement.offset(skip)
+    return statement.limit(limit + 1)
+
+
+def page_results(rows: List, columns: Sequence, limit: int) -> Tuple[List, Optional[str]]:
+    """Split the limit + 1 rows fetched by paginate() into (page, next_cursor)."""
+    if len(rows) <= limit:
+        return list(rows), None
+    page = list(rows[:limit])
+    last = page[-1]
+    return page, encode_cursor(*[getattr(last, col.key) for col in columns])
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
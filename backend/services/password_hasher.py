@@ -0,0 +1,140 @@
+"""
+bcrypt off the event loop.
+
+A bcrypt hash or check is 100-300 ms of pure CPU by design. Called inside an
+`async def` handler it freezes the event loop for that long: every stream,
+heartbeat and page in flight on the worker waits for one login. PasswordHasher
+runs them on a small dedicated thread pool instead (bcrypt releases the GIL
+while hashing, so the loop keeps serving in the meantime).
+
+Sign-in bursts are shaped, not queued without limit:
+
+- at most AUTH_HASH_WORKERS hashes run at once, so logins can never take more
+  than that many cores away from streaming;
+- at most AUTH_HASH_QUEUE more wait for a slot, each for up to
+  AUTH_HASH_QUEUE_TIMEOUT seconds. Beyond that the request gets a 503 with
+  Retry-After right away, which is cheaper for everyone than a login that
+  answers after 30 s.
+
+Queue depth, wait and run times and rejections are in stats()
+(GET /admin/cache/stats, "auth_hashing").
+"""
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import bcrypt
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+MAX_QUEUE = int(os.getenv("AUTH_HASH_QUEUE", "32"))
+QUEUE_TIMEOUT = float(os.getenv("AUTH_HASH_QUEUE_TIMEOUT", "5"))
+RETRY_AFTER = 2
+
+BCRYPT_MAX_BYTES = 72  # bcrypt ignores (newer versions reject) anything longer
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode("utf-8")[:BCRYPT_MAX_BYTES], bcrypt.gensalt()).decode("utf-8")
+
+
+def _verify(password: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(password.encode("utf-8")[:BCRYPT_MAX_BYTES], hashed.encode("utf-8"))
+    except ValueError:  # Malformed stored hash
+        return False
+
+
+class PasswordHasher:
+    def __init__(self, workers: int = WORKERS, max_queue: int = MAX_QUEUE, queue_timeout: float = QUEUE_TIMEOUT):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Counters are only touched on the event loop; statistics, not invariants
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_ms_total = 0.0
+        self.run_ms_total = 0.0
+        self.max_wait_ms = 0.0
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(_verify, password, hashed)
+
+    def _busy(self) -> HTTPException:
+        return HTTPException(status_code=503, detail="Too many sign-ins right now, please retry",
+                             headers={"Retry-After": str(RETRY_AFTER)})
+
+    def _get_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(self.workers)
+            self._slots_loop = loop
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._slots
+
+    async def _run(self, fn: Callable, *args):
+        slots = self._get_slots()
+        if self.running + self.waiting >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise self._busy()
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"[Auth] Password hashing queue full for {self.queue_timeout}s, shedding a sign-in")
+            raise self._busy()
+        finally:
+            self.waiting -= 1
+
+        started = time.perf_counter()
+        wait_ms = (started - queued_at) * 1000
+        self.wait_ms_total += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.running += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.run_ms_total += (time.perf_counter() - started) * 1000
+            slots.release()
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        done = self.completed or 1
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected + self.timed_out,
+            "avg_wait_ms": round(self.wait_ms_total / done, 1),
+            "max_wait_ms": round(self.max_wait_ms, 1),
+            "avg_hash_ms": round(self.run_ms_total / done, 1),
+        }
+
+
+# Global singleton
+password_hasher = PasswordHasher()
@@ -0,0 +1,208 @@
+"""
+Watch Progress Buffer — coalesces POST /history/ heartbeats.
+
+The player reports progress every few seconds per viewer. Rather than a
+SELECT + UPDATE/INSERT + commit per heartbeat, the latest state per
+(user_id, video_id) is kept in memory and flushed every
+PROGRESS_FLUSH_INTERVAL seconds with a single upsert:
+
+    INSERT INTO watchhistory ... ON CONFLICT (user_id, video_id) DO UPDATE ...
+
+backed by the unique index ux_watchhistory_user_video.
+
+duration_watched keeps its old approximation: the first report of a new entry
+counts its progress, every later heartbeat adds 10 seconds.
+"""
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, or_, select
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = float(os.getenv("PROGRESS_FLUSH_INTERVAL", "10"))
+HEARTBEAT_SECONDS = 10  # Approximate watch time credited per heartbeat
+
+
+class ProgressBuffer:
+    """Latest watch progress per (user, video), flushed periodically as one upsert."""
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._entries: Dict[Tuple[int, int], dict] = {}
+        # Batch being upserted: still readable until its commit lands
+        self._flushing: Dict[Tuple[int, int], dict] = {}
+        self._lock = threading.Lock()
+        self._worker_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the flush loop. Call this from the FastAPI startup event."""
+        if self._worker_task:
+            return
+        self._worker_task = asyncio.create_task(self._worker())
+        logger.info(f"[ProgressBuffer] Started (flush every {self.flush_interval}s)")
+
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still buffered."""
+        if self._worker_task:
+            self._worker_task.cancel()
+            self._worker_task = None
+        await self.flush()
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._entries)
+
+    def record(self, user_id: int, video_id: int, progress_seconds: int, completed: bool = False):
+        """Buffer one progress heartbeat."""
+        key = (user_id, video_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = {
+                    "progress_seconds": progress_seconds,
+                    "completed": completed,
+                    "watched_at": datetime.utcnow(),
+                    "first_progress": progress_seconds,
+                    "heartbeats": 1,
+                }
+            else:
+                entry["progress_seconds"] = progress_seconds
+                entry["completed"] = entry["completed"] or completed
+                entry["watched_at"] = datetime.utcnow()
+                entry["heartbeats"] += 1
+
+    def get(self, user_id: int, video_id: int) -> Optional[dict]:
+        """Buffered (not yet committed) progress for a user/video, if any."""
+        key = (user_id, video_id)
+        with self._lock:
+            entry = self._entries.get(key) or self._flushing.get(key)
+        if entry is None:
+            return None
+        return {"progress_seconds": entry["progress_seconds"], "completed": entry["completed"]}
+
+    def discard(self, user_id: int, video_id: Optional[int] = None):
+        """Drop buffered progress, e.g. when the user deletes history, so the flush can't resurrect it."""
+        with self._lock:
+            for entries in (self._entries, self._flushing):
+                if video_id is not None:
+                    entries.pop((user_id, video_id), None)
+                else:
+                    for key in [k for k in entries if k[0] == user_id]:
+                        del entries[key]
+
+    def discard_videos(self, video_ids: List[int]):
+        """Drop buffered progress of deleted videos."""
+        ids = set(video_ids)
+        with self._lock:
+            for entries in (self._entries, self._flushing):
+                for key in [k for k in entries if k[1] in ids]:
+                    del entries[key]
+
+    async def flush(self) -> int:
+        """Upsert buffered progress. Returns the number of rows written."""
+        from .db_health import db_health
+
+        if db_health.is_open:
+            return 0  # Queued until the database is back
+        with self._lock:
+            entries, self._entries = self._entries, {}
+            self._flushing = dict(entries)
+
+        if not entries:
+            return 0
+        try:
+            return await self._write(entries)
+        finally:
+            # Committed, or merged back into _entries by _write
+            with self._lock:
+                self._flushing = {}
+
+    async def _write(self, entries: Dict[Tuple[int, int], dict]) -> int:
+        from .db_health import db_health
+
+        from ..database import async_engine
+        from ..models import Video, WatchHistory
+        from sqlmodel.ext.asyncio.session import AsyncSession
+
+        if async_engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        table = WatchHistory.__table__
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.video_id],
+            set_={
+                "progress_seconds": stmt.excluded.progress_seconds,
+                "watched_at": stmt.excluded.watched_at,
+                "completed": or_(table.c.completed, stmt.excluded.completed),
+                "duration_watched": table.c.duration_watched + bindparam("b_increment"),
+            },
+        )
+
+        try:
+            async with AsyncSession(async_engine) as session:
+                # Videos deleted since the heartbeat would fail the whole batch on the FK
+                video_ids = {video_id for _, video_id in entries}
+                existing = set((await session.execute(
+                    select(Video.id).where(Video.id.in_(video_ids))
+                )).scalars().all())
+
+                params = [
+                    {
+                        "user_id": user_id,
+                        "video_id": video_id,
+                        "progress_seconds": e["progress_seconds"],
+                        "completed": e["completed"],
+                        "watched_at": e["watched_at"],
+                        # New row: first report's progress, then +10s per later heartbeat
+                        "duration_watched": e["first_progress"] + HEARTBEAT_SECONDS * (e["heartbeats"] - 1),
+                        # Existing row: +10s per heartbeat
+                        "b_increment": HEARTBEAT_SECONDS * e["heartbeats"],
+                    }
+                    for (user_id, video_id), e in sorted(entries.items())
+                    if video_id in existing
+                ]
+                if params:
+                    await session.execute(stmt, params)
+                    await session.commit()
+        except Exception as e:
+            db_health.observe(e)
+            logger.error(f"[ProgressBuffer] Flush of {len(entries)} entries failed, will retry: {e}")
+            self._merge_back(entries)
+            return 0
+
+        logger.debug(f"[ProgressBuffer] Flushed {len(params)} progress entries")
+        return len(params)
+
+    def _merge_back(self, entries: Dict[Tuple[int, int], dict]):
+        with self._lock:
+            for key, old in entries.items():
+                new = self._entries.get(key)
+                if new is None:
+                    self._entries[key] = old
+                else:
+                    # Newer heartbeats win; keep the older batch's watch time and first report
+                    new["completed"] = new["completed"] or old["completed"]
+                    new["first_progress"] = old["first_progress"]
+                    new["heartbeats"] += old["heartbeats"]
+
+    async def _worker(self):
+        while True:
+            try:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"[ProgressBuffer] Worker error: {e}", exc_info=True)
+
+
+# Global singleton
+progress_buffer = ProgressBuffer()
@@ -0,0 +1,572 @@
+"""
+In-memory search index — BM25 ranking and prefix autocomplete for /videos/suggest.
+
+Type-ahead fires a request per keystroke; answering those from process memory
+keeps them off the database entirely. The index covers Video.title,
+Video.description and Category.name:
+
+- Postings are compact arrays per term: array('I') of document slots
+  (ascending) and array('H') of field-weighted term frequencies.
+- Scoring is BM25 (k1=1.2, b=0.75) with title/category/description weighted
+  3/2/1 into the term frequency.
+- A character trie over the vocabulary keeps, at every node, the most frequent
+  terms below it, so completing a prefix is a walk of len(prefix) nodes.
+- Single-word queries read a per-term "champion list" (its best-scoring
+  documents, cached), so the common case never scans a whole posting list.
+  Multi-word queries score a bounded candidate set drawn from the rarest
+  word (its champions plus its newest SCAN_BUDGET postings) and probe the
+  other words' posting lists by binary search.
+
+The index is built at startup from a streamed scan (yield_per) in a worker
+thread and then kept current by upsert()/remove() calls from the upload and
+admin endpoints. Each worker process has its own index; they converge through
+app_cache invalidations, which reach every worker over the shared cache's
+pub/sub channel: a `video:N` or `category:N` tag re-reads those videos (a
+renamed or deleted category included) and re-indexes what changed. A full
+rebuild every SEARCH_INDEX_REBUILD_INTERVAL seconds catches anything missed
+(Redis down, prefix invalidations). Deletes tombstone the document and lower the df of its
+terms right away (BM25 needs df <= live documents); posting lists are
+compacted once enough of them are dead.
+"""
+import asyncio
+import heapq
+import logging
+import math
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+FIELD_WEIGHTS = (("title", 3), ("category", 2), ("description", 1))
+K1 = 1.2
+B = 0.75
+TRIE_TOP_K = 8  # Completions remembered per trie node
+CHAMPIONS = 64  # Best documents cached per term for single-word queries
+SCAN_BUDGET = 128  # Extra (newest) candidates examined for multi-word queries
+SEARCH_EXPANSIONS = 4  # Completions of the last word that videos are matched against
+MAX_TF = 0xFFFF
+COMPACT_RATIO = 0.2  # Compact postings once this fraction of slots is dead
+BUILD_BATCH = 2000
+REBUILD_INTERVAL = float(os.getenv("SEARCH_INDEX_REBUILD_INTERVAL", "3600"))  # 0 disables
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _WORD_RE.findall(text.lower()) if text else []
+
+
+class _Postings:
+    __slots__ = ("slots", "tfs", "df", "champions")
+
+    def __init__(self):
+        self.slots = array("I")
+        self.tfs = array("H")
+        self.df = 0
+        self.champions: Optional[List[Tuple[float, int]]] = None
+
+
+class _TrieNode:
+    __slots__ = ("children", "term", "top", "dirty")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.term: Optional[str] = None
+        self.top: List[str] = []  # Most frequent terms in this subtree, df descending
+        self.dirty = False
+
+
+class InvertedIndex:
+    """Index data and query algorithms. Not thread-safe; SearchIndex serializes access."""
+
+    def __init__(self):
+        self.postings: Dict[str, _Postings] = {}
+        self.root = _TrieNode()
+        # Per slot; compact() renumbers the live ones
+        self.video_ids = array("q")
+        self.doc_lens = array("I")
+        self.alive = bytearray()
+        self.titles: List[Optional[str]] = []
+        self.terms: List[Tuple[str, ...]] = []  # So remove() can keep df exact
+        self.sources = array("q")  # Hash of the indexed text, so unchanged re-adds are no-ops
+        self.slot_of: Dict[int, int] = {}
+        self.live_docs = 0
+        self.total_len = 0
+        self.dead = 0
+
+    # ----- writes -----
+
+    def add(self, video_id: int, title: Optional[str], description: Optional[str], category: Optional[str],
+            promote: bool = True):
+        """Index one video. Bulk builds pass promote=False and call finish_build() at the end."""
+        source = hash((title, description, category))
+        if video_id in self.slot_of:
+            if self.sources[self.slot_of[video_id]] == source:
+                return
+            self.remove(video_id)
+
+        tf: Dict[str, int] = {}
+        fields = {"title": title, "category": category, "description": description}
+        for field, weight in FIELD_WEIGHTS:
+            for term in tokenize(fields[field]):
+                tf[term] = tf.get(term, 0) + weight
+        doc_len = sum(tf.values())
+
+        slot = len(self.video_ids)
+        self.video_ids.append(video_id)
+        self.doc_lens.append(doc_len)
+        self.alive.append(1)
+        self.titles.append(title or "")
+        self.terms.append(tuple(tf))
+        self.sources.append(source)
+        self.slot_of[video_id] = slot
+        self.live_docs += 1
+        self.total_len += doc_len
+
+        for term, freq in tf.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = _Postings()
+                self._trie_insert(term)
+            postings.slots.append(slot)
+            postings.tfs.append(min(freq, MAX_TF))
+            postings.df += 1
+            if postings.champions is not None:
+                self._offer_champion(postings, freq, slot)
+            if promote:
+                self._trie_promote(term, postings.df)
+
+    def finish_build(self):
+        """Trie top lists are filled lazily, per node, on first use."""
+        self._mark_all_dirty(self.root)
+
+    def remove(self, video_id: int):
+        slot = self.slot_of.pop(video_id, None)
+        if slot is None:
+            return
+        self.alive[slot] = 0
+        self.titles[slot] = None
+        self.live_docs -= 1
+        self.total_len -= self.doc_lens[slot]
+        self.dead += 1
+        # df counts live documents only; the dead slot stays in the posting lists until compaction
+        for term in self.terms[slot]:
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            postings.df -= 1
+            postings.champions = None  # Scores depend on df; recomputed on next use
+            if postings.df <= 0:
+                del self.postings[term]
+                node = self._trie_node(term)
+                if node is not None:
+                    node.term = None
+                self._mark_dirty_path(term)
+        self.terms[slot] = ()
+        if self.dead > COMPACT_RATIO * len(self.video_ids):
+            self.compact()
+
+    def compact(self):
+        """
+        Drop dead slots: renumber the live documents densely (in their old
+        order, so posting lists stay ascending), rebuild every posting list
+        and recompute document frequencies.
+        """
+        alive = self.alive
+        new_slot: Dict[int, int] = {}
+        video_ids, doc_lens, titles, terms, sources = array("q"), array("I"), [], [], array("q")
+        for slot, is_alive in enumerate(alive):
+            if is_alive:
+                new_slot[slot] = len(video_ids)
+                video_ids.append(self.video_ids[slot])
+                doc_lens.append(self.doc_lens[slot])
+                titles.append(self.titles[slot])
+                terms.append(self.terms[slot])
+                sources.append(self.sources[slot])
+        self.video_ids, self.doc_lens, self.titles, self.terms = video_ids, doc_lens, titles, terms
+        self.sources = sources
+        self.alive = bytearray(b"\x01" * len(video_ids))
+        self.slot_of = {video_id: slot for slot, video_id in enumerate(video_ids)}
+
+        for term in list(self.postings):
+            old = self.postings[term]
+            fresh = _Postings()
+            for slot, freq in zip(old.slots, old.tfs):
+                if alive[slot]:
+                    fresh.slots.append(new_slot[slot])
+                    fresh.tfs.append(freq)
+            fresh.df = len(fresh.slots)
+            if fresh.df:
+                self.postings[term] = fresh
+            else:
+                del self.postings[term]
+                self._trie_node(term).term = None
+        self._mark_all_dirty(self.root)
+        self.dead = 0
+
+    # ----- trie -----
+
+    def _trie_node(self, term: str) -> Optional[_TrieNode]:
+        node = self.root
+        for ch in term:
+            node = node.children.get(ch)
+            if node is None:
+                return None
+        return node
+
+    def _trie_insert(self, term: str):
+        node = self.root
+        for ch in term:
+            node = node.children.setdefault(ch, _TrieNode())
+        node.term = term
+
+    def _trie_promote(self, term: str, df: int):
+        """df of term grew: keep it in the top lists along its path."""
+        postings = self.postings
+
+        def rank(t: str) -> int:
+            # Lists of dirty nodes may still name terms dropped by compaction
+            return -postings[t].df if t in postings else 0
+
+        node = self.root
+        for ch in term:
+            node = node.children[ch]
+            top = node.top
+            if term in top:
+                top.sort(key=rank)
+            elif len(top) < TRIE_TOP_K:
+                top.append(term)
+                top.sort(key=rank)
+            elif df > -rank(top[-1]):
+                top[-1] = term
+                top.sort(key=rank)
+
+    def _mark_dirty_path(self, term: str):
+        """A term left the vocabulary: top lists along its path may name it."""
+        node = self.root
+        for ch in term:
+            node = node.children.get(ch)
+            if node is None:
+                return
+            node.dirty = True
+
+    def _mark_all_dirty(self, node: _TrieNode):
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            n.dirty = True
+            stack.extend(n.children.values())
+
+    def _refresh(self, node: _TrieNode):
+        """Recompute a stale top list from its subtree (after compaction)."""
+        terms = []
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            if n.term is not None and n.term in self.postings:
+                terms.append(n.term)
+            stack.extend(n.children.values())
+        node.top = heapq.nlargest(TRIE_TOP_K, terms, key=lambda t: self.postings[t].df)
+        node.dirty = False
+
+    def completions(self, prefix: str, limit: int = TRIE_TOP_K) -> List[str]:
+        node = self._trie_node(prefix)
+        if node is None or node is self.root:
+            return []
+        if node.dirty:
+            self._refresh(node)
+        return [t for t in node.top if t in self.postings][:limit]
+
+    # ----- scoring -----
+
+    def _idf(self, df: int) -> float:
+        n = max(self.live_docs, 1)
+        df = min(df, n)  # Keeps idf positive even if df were ever ahead of live_docs
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _bm25(self, idf: float, freq: int, slot: int, avgdl: float) -> float:
+        norm = K1 * (1 - B + B * self.doc_lens[slot] / avgdl)
+        return idf * freq * (K1 + 1) / (freq + norm)
+
+    def _champions(self, term: str) -> List[Tuple[float, int]]:
+        postings = self.postings[term]
+        if postings.champions is None:
+            idf = self._idf(postings.df)
+            avgdl = self.total_len / max(self.live_docs, 1) or 1.0
+            alive = self.alive
+            postings.champions = heapq.nlargest(CHAMPIONS, (
+                (self._bm25(idf, freq, slot, avgdl), slot)
+                for slot, freq in zip(postings.slots, postings.tfs) if alive[slot]
+            ))
+        return postings.champions
+
+    def _score(self, terms: List[Tuple[_Postings, float]], slot: int, avgdl: float,
+               require_all: bool) -> Optional[float]:
+        """
+        Sum of BM25 over terms (None if one is missing) or, with require_all=False,
+        the best one (None if none matches).
+        """
+        total = 0.0 if require_all else -math.inf
+        for postings, idf in terms:
+            i = bisect_left(postings.slots, slot)
+            if i < len(postings.slots) and postings.slots[i] == slot:
+                score = self._bm25(idf, postings.tfs[i], slot, avgdl)
+                total = total + score if require_all else max(total, score)
+            elif require_all:
+                return None
+        return None if total == -math.inf else total
+
+    def _offer_champion(self, postings: _Postings, freq: int, slot: int):
+        """Keep a cached champion list current as documents are added."""
+        avgdl = self.total_len / max(self.live_docs, 1) or 1.0
+        score = self._bm25(self._idf(postings.df), min(freq, MAX_TF), slot, avgdl)
+        champions = postings.champions
+        if len(champions) < CHAMPIONS or score > champions[-1][0]:
+            champions.append((score, slot))
+            postings.champions = heapq.nlargest(CHAMPIONS, champions)
+
+    def search(self, terms: List[str], expansions: List[str], limit: int) -> List[Tuple[float, int]]:
+        """
+        Top (score, slot) pairs for documents containing every term in `terms`
+        and at least one of `expansions` (the completions of the last word).
+        """
+        if not expansions or any(t not in self.postings for t in terms):
+            return []
+
+        if not terms:
+            # Single word being typed: merge the expansions' champion lists
+            best: Dict[int, float] = {}
+            for term in expansions:
+                for score, slot in self._champions(term):
+                    if self.alive[slot] and score > best.get(slot, -math.inf):
+                        best[slot] = score
+            return heapq.nlargest(limit, ((s, slot) for slot, s in best.items()))
+
+        avgdl = self.total_len / max(self.live_docs, 1) or 1.0
+        required = [(self.postings[t], self._idf(self.postings[t].df)) for t in set(terms)]
+        optional = [(self.postings[t], self._idf(self.postings[t].df)) for t in expansions]
+
+        # Candidates come from the rarest required term (or the expansions, if
+        # rarer still): champion lists plus the newest postings, capped at
+        # SCAN_BUDGET so common words stay cheap. Exact whenever the driving
+        # posting lists fit in the budget.
+        driver = min(set(terms), key=lambda t: self.postings[t].df)
+        if sum(self.postings[t].df for t in expansions) < self.postings[driver].df:
+            sources = expansions
+        else:
+            sources = [driver]
+        candidates = []
+        for term in sources:
+            candidates.extend(slot for _, slot in self._champions(term))
+            candidates.extend(self.postings[term].slots[-1:-SCAN_BUDGET - 1:-1])
+
+        results = []
+        seen = set()
+        for slot in candidates:
+            if slot in seen or not self.alive[slot]:
+                continue
+            seen.add(slot)
+            score = self._score(required, slot, avgdl, require_all=True)
+            if score is not None:
+                prefix_score = self._score(optional, slot, avgdl, require_all=False)
+                if prefix_score is not None:
+                    results.append((score + prefix_score, slot))
+        return heapq.nlargest(limit, results)
+
+
+class SearchIndex:
+    """
+    Process-wide index. A lock serializes queries with incremental updates
+    (both are sub-millisecond); a rebuild scans into a separate index and only
+    takes the lock to swap it in.
+    """
+
+    def __init__(self):
+        self._index = InvertedIndex()
+        self._lock = threading.Lock()
+        self._building = False
+        self._pending: List[tuple] = []  # Updates that arrive during a rebuild
+        self.ready = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._rebuild_task: Optional[asyncio.Task] = None
+        # Invalidated videos/categories waiting to be re-read (see _on_invalidate)
+        self._stale_videos: Set[int] = set()
+        self._stale_categories: Set[int] = set()
+        self._refresh_scheduled = False
+
+    def start(self, cache=None):
+        """
+        Build the index in a worker thread. Call this from the FastAPI startup
+        event; pass app_cache to follow its (local and remote) invalidations.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._loop.run_in_executor(None, self.rebuild)
+        if cache is not None:
+            cache.add_listener(self._on_invalidate)
+        if REBUILD_INTERVAL > 0:
+            self._rebuild_task = asyncio.create_task(self._rebuild_loop())
+
+    async def stop(self):
+        if self._rebuild_task:
+            self._rebuild_task.cancel()
+            self._rebuild_task = None
+
+    async def _rebuild_loop(self):
+        while True:
+            await asyncio.sleep(REBUILD_INTERVAL)
+            await asyncio.get_running_loop().run_in_executor(None, self.rebuild)
+
+    def _on_invalidate(self, tags: Optional[Tuple[str, ...]]):
+        """Cache listener: queue the videos and categories behind `video:N` / `category:N` tags for re-indexing."""
+        if not tags:
+            return  # Prefix or full invalidations: left to the periodic rebuild
+        videos, categories = set(), set()
+        for tag in tags:
+            kind, _, ident = tag.partition(":")
+            if ident.isdigit():
+                if kind == "video":
+                    videos.add(int(ident))
+                elif kind == "category":
+                    categories.add(int(ident))
+        if not videos and not categories:
+            return
+        with self._lock:
+            self._stale_videos |= videos
+            self._stale_categories |= categories
+            if self._refresh_scheduled:
+                return
+            self._refresh_scheduled = True
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            with self._lock:
+                self._refresh_scheduled = False
+            return
+        # Invalidations also come from worker threads; the re-read runs in the default executor
+        loop.call_soon_threadsafe(loop.run_in_executor, None, self.refresh_stale)
+
+    def refresh_stale(self):
+        """Re-index the videos queued by _on_invalidate from the database; drop the ones that are gone."""
+        from sqlalchemy import or_
+        from sqlmodel import Session, select
+        from ..database import engine
+        from ..models import Category, Video
+
+        with self._lock:
+            videos, self._stale_videos = self._stale_videos, set()
+            categories, self._stale_categories = self._stale_categories, set()
+            self._refresh_scheduled = False
+        if not videos and not categories:
+            return
+
+        conditions = []
+        if videos:
+            conditions.append(Video.id.in_(videos))
+        if categories:
+            conditions.append(Video.category_id.in_(categories))
+        try:
+            with Session(engine) as session:
+                rows = session.exec(
+                    select(Video.id, Video.title, Video.description, Category.name)
+                    .outerjoin(Category, Video.category_id == Category.id)
+                    .where(or_(*conditions))
+                ).all()
+        except Exception as e:
+            logger.warning(f"[SearchIndex] Refresh of {len(videos)} videos / {len(categories)} categories "
+                           f"failed, the next rebuild will catch up: {e}")
+            return
+
+        found = set()
+        for video_id, title, description, category in rows:
+            self.upsert(video_id, title, description, category)
+            found.add(video_id)
+        for video_id in videos - found:
+            self.remove(video_id)
+
+    def rebuild(self):
+        """Build a fresh index from a streamed scan of the video table, then swap it in."""
+        from sqlmodel import Session, select
+        from ..database import engine
+        from ..models import Category, Video
+
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+            self._pending = []
+
+        t0 = time.perf_counter()
+        fresh = InvertedIndex()
+        try:
+            with Session(engine) as session:
+                rows = session.exec(
+                    select(Video.id, Video.title, Video.description, Category.name)
+                    .outerjoin(Category, Video.category_id == Category.id)
+                    .execution_options(yield_per=BUILD_BATCH)
+                )
+                for video_id, title, description, category in rows:
+                    fresh.add(video_id, title, description, category, promote=False)
+            fresh.finish_build()
+        except Exception as e:
+            logger.error(f"[SearchIndex] Build failed: {e}")
+            with self._lock:
+                self._building = False
+            return
+
+        with self._lock:
+            for op, args in self._pending:
+                getattr(fresh, op)(*args)
+            self._index = fresh
+            self._building = False
+            self._pending = []
+            self.ready = True
+        logger.info(
+            f"[SearchIndex] Indexed {fresh.live_docs} videos, {len(fresh.postings)} terms "
+            f"in {time.perf_counter() - t0:.1f}s"
+        )
+
+    def _apply(self, op: str, *args):
+        with self._lock:
+            getattr(self._index, op)(*args)
+            if self._building:
+                self._pending.append((op, args))
+
+    def upsert(self, video_id: int, title: Optional[str], description: Optional[str] = None,
+               category: Optional[str] = None):
+        self._apply("add", video_id, title, description, category)
+
+    def remove(self, video_id: int):
+        self._apply("remove", video_id)
+
+    def clear(self):
+        with self._lock:
+            self._index = InvertedIndex()
+            self._pending = []
+
+    def suggest(self, q: str, limit: int = 8) -> dict:
+        """Query completions and best-matching videos for a partially typed query."""
+        terms = tokenize(q)
+        if not terms:
+            return {"query": q, "completions": [], "videos": []}
+        head, prefix = terms[:-1], terms[-1]
+
+        with self._lock:
+            index = self._index
+            expansions = index.completions(prefix)
+            # A finished word ranks ahead of longer words it is a prefix of
+            if prefix in index.postings:
+                expansions = [prefix] + [t for t in expansions if t != prefix][:TRIE_TOP_K - 1]
+            hits = index.search(head, expansions[:SEARCH_EXPANSIONS], limit)
+            videos = [{"id": index.video_ids[slot], "title": index.titles[slot]} for _, slot in hits]
+
+        stem = " ".join(head)
+        completions = [f"{stem} {t}".strip() for t in expansions[:limit]]
+        return {"query": q, "completions": completions, "videos": videos}
+
+
+# Global singleton
+search_index = SearchIndex()
@@ -0,0 +1,89 @@
+"""
+Fast JSON for API responses.
+
+FastAPI's default path for a handler returning data is jsonable_encoder (a
+Python walk over every value) followed by the stdlib json module, and with a
+response_model it first re-validates whatever the handler returned — for a
+cached page that means rebuilding VideoPublic models from dicts we serialized
+ourselves a minute ago. This module gives the app three shortcuts:
+
+- FastJSONResponse, the app's default response class: orjson when it is
+  installed, stdlib json otherwise. Routes with a response_model still have
+  Pydantic produce the JSON-ready data first; orjson only does the encoding.
+- dump_models(): ORM rows -> Pydantic models -> JSON bytes in one pass through
+  pydantic-core, with no jsonable_encoder in between.
+- json_response(): send bytes that are already JSON. Cached endpoints store the
+  encoded body (see routers/videos.py), so a cache hit is a copy of bytes
+  into the response, with no validation and no encoding.
+  join_object() splices such bodies into a bigger response unchanged.
+"""
+import json
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson  # Optional; see bench_serialization.py
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def _json_default(value: Any):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return _default(value)
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON. datetimes come out as ISO 8601, like jsonable_encoder."""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_json_default, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def loads(raw: bytes) -> Any:
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def dump_models(objects: Iterable[Any], model: Type[BaseModel]) -> bytes:
+    """Serialize ORM objects (or dicts) as a JSON list of `model`, validating each once."""
+    adapter = _list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(list(objects), from_attributes=True))
+
+
+def dump_model(obj: Any, model: Type[BaseModel]) -> bytes:
+    return model.__pydantic_serializer__.to_json(model.model_validate(obj))
+
+
+def join_object(parts: Dict[str, Any]) -> bytes:
+    """A JSON object from `parts`; bytes values are spliced in as already-encoded JSON."""
+    return b"{" + b",".join(
+        dumps(key) + b":" + (value if isinstance(value, bytes) else dumps(value)) for key, value in parts.items()
+    ) + b"}"
+
+
+def json_response(body: bytes, headers: Optional[Dict[str, str]] = None, status_code: int = 200) -> Response:
+    """A response for a body that is already JSON."""
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,131 @@
+"""
+Telegram Bot Pool — shards uploads/streams across several bots and channels.
+
+Configure a pool with comma-separated lists:
+    TELEGRAM_BOT_TOKENS=123:AAA,456:BBB
+    TELEGRAM_CHANNEL_IDS=-1001111,-1002222
+
+If only TELEGRAM_BOT_TOKEN / TELEGRAM_CHANNEL_ID are set, the pool has a single
+shard and everything behaves exactly as before.
+
+Channels are paired with bots by position. With fewer channels than bots, the
+list wraps around (e.g. one channel shared by every bot — each bot must be an
+admin of it).
+
+Every uploaded message records the bot_id/channel_id that owns it, because a
+Telegram file_id / message can only be fetched by the bot that posted it.
+"""
+import hashlib
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# "hash" (rendezvous hashing of video_id) or "least_load" (fewest queued jobs)
+SHARD_STRATEGY = os.getenv("TELEGRAM_SHARD_STRATEGY", "least_load").strip().lower()
+
+
+@dataclass(frozen=True)
+class TelegramShard:
+    """A single bot token paired with the channel it uploads to."""
+    bot_token: str = field(repr=False)  # Never log the token
+    channel_id: int = 0
+
+    @property
+    def bot_id(self) -> str:
+        """Numeric bot ID (the part of the token before ':'). Safe to store/log."""
+        return self.bot_token.split(":", 1)[0]
+
+
+def _split_env(name: str) -> List[str]:
+    raw = os.getenv(name) or ""
+    return [part.strip() for part in raw.split(",") if part.strip()]
+
+
+def _parse_channel_id(channel_id_str: str) -> int:
+    """Parse channel ID string to integer, handling various formats."""
+    try:
+        return int(channel_id_str.strip())
+    except (ValueError, AttributeError) as e:
+        raise ValueError(f"Invalid Telegram channel ID: '{channel_id_str}' - {e}")
+
+
+def load_shards() -> List[TelegramShard]:
+    """
+    Build the shard list from env. Read at call time so credential changes in
+    .env are picked up without a restart (same as the single-bot code did).
+    """
+    tokens = _split_env("TELEGRAM_BOT_TOKENS") or _split_env("TELEGRAM_BOT_TOKEN")
+    channels = _split_env("TELEGRAM_CHANNEL_IDS") or _split_env("TELEGRAM_CHANNEL_ID")
+
+    if not tokens or not channels:
+        return []
+
+    shards = []
+    seen = set()
+    for i, token in enumerate(tokens):
+        shard = TelegramShard(bot_token=token, channel_id=_parse_channel_id(channels[i % len(channels)]))
+        if shard.bot_id in seen:
+            logger.warning(f"[TelegramPool] Duplicate bot {shard.bot_id} in TELEGRAM_BOT_TOKENS, ignoring")
+            continue
+        seen.add(shard.bot_id)
+        shards.append(shard)
+    return shards
+
+
+def get_shard(bot_id: Optional[str] = None) -> TelegramShard:
+    """
+    Look up the shard that owns a message. Rows uploaded before sharding have
+    no bot_id and belong to the primary (first) bot.
+    """
+    shards = load_shards()
+    if not shards:
+        raise ValueError("Telegram credentials not configured (TELEGRAM_BOT_TOKEN(S) / TELEGRAM_CHANNEL_ID(S))")
+    if bot_id:
+        for shard in shards:
+            if shard.bot_id == str(bot_id):
+                return shard
+        logger.warning(f"[TelegramPool] Bot {bot_id} is no longer configured, falling back to primary bot")
+    return shards[0]
+
+
+def is_primary(shard: TelegramShard) -> bool:
+    shards = load_shards()
+    return bool(shards) and shards[0].bot_id == shard.bot_id
+
+
+def shard_for_video(video_id: int, shards: Optional[List[TelegramShard]] = None) -> TelegramShard:
+    """
+    Rendezvous (highest-random-weight) hashing: each video maps to a stable bot,
+    and adding/removing a bot only moves the videos that hashed to it.
+    """
+    shards = shards if shards is not None else load_shards()
+    if not shards:
+        raise ValueError("Telegram credentials not configured")
+
+    def weight(shard: TelegramShard) -> int:
+        digest = hashlib.blake2b(f"{shard.bot_id}:{video_id}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    return max(shards, key=weight)
+
+
+def pick_shard(video_id: int, loads: Optional[Dict[str, int]] = None) -> TelegramShard:
+    """
+    Choose the bot for a new upload.
+
+    loads maps bot_id -> queued/in-flight jobs. With the least_load strategy the
+    least busy bot wins; ties are broken by the video's hash so one video's
+    resolutions tend to stay on the same bot.
+    """
+    shards = load_shards()
+    if not shards:
+        raise ValueError("Telegram credentials not configured")
+
+    preferred = shard_for_video(video_id, shards)
+    if SHARD_STRATEGY != "least_load" or not loads:
+        return preferred
+
+    return min(shards, key=lambda s: (loads.get(s.bot_id, 0), s.bot_id != preferred.bot_id))
@@ -1,17 +1,20 @@
 """
-Telegram Upload Queue — processes Telegram uploads one-at-a-time in background.
+Telegram Upload Queue — processes Telegram uploads in background.
 
 Fast providers (StreamTape, DoodStream) upload immediately.
-Telegram uploads are queued here and processed sequentially to avoid
-timeouts, rate limits, and resource contention.
+Telegram uploads are queued here. Each bot in the pool (see telegram_pool.py)
+has its own queue and processes its jobs sequentially to avoid timeouts,
+rate limits, and resource contention — so throughput scales with the number of bots.
 """
 import asyncio
 import logging
 import os
 import shutil
-from typing import Optional
+from typing import Dict, Optional
 from dataclasses import dataclass, field
 
+from .telegram_pool import get_shard, load_shards, pick_shard
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -25,44 +28,85 @@ class TelegramUploadJob:
     is_original: bool = True
     # If True, this file is a temp copy that should be deleted after upload
     cleanup_after: bool = False
+    # Bot that will upload this job; assigned on enqueue when left empty
+    bot_id: Optional[str] = None
 
 
 class TelegramUploadQueue:
     """
-    Background queue that processes Telegram uploads one at a time.
-    Runs as an asyncio task in the main event loop.
+    Background queues that process Telegram uploads one at a time per bot.
+    Runs as asyncio tasks in the main event loop.
     """
     
     def __init__(self):
-        self._queue: asyncio.Queue[TelegramUploadJob] = asyncio.Queue()
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._current_jobs: Dict[str, TelegramUploadJob] = {}
         self._running = False
-        self._worker_task: Optional[asyncio.Task] = None
-        self._current_job: Optional[TelegramUploadJob] = None
         self._loop: Optional[asyncio.AbstractEventLoop] = None
     
     def start(self):
-        """Start the background worker. Call this from the FastAPI startup event."""
+        """Start a worker per configured bot. Call this from the FastAPI startup event."""
         if self._running:
             return
         self._running = True
         self._loop = asyncio.get_running_loop()
-        self._worker_task = asyncio.create_task(self._worker())
-        logger.info("[TelegramQueue] Worker started")
+        for shard in load_shards():
+            self._get_queue(shard.bot_id)
+        # Jobs enqueued before startup already have queues without workers
+        for bot_id in list(self._queues):
+            self._ensure_worker(bot_id)
+        logger.info(f"[TelegramQueue] Started {len(self._workers)} worker(s)")
     
     def stop(self):
-        """Stop the background worker."""
+        """Stop all background workers."""
         self._running = False
-        if self._worker_task:
-            self._worker_task.cancel()
-            logger.info("[TelegramQueue] Worker stopped")
+        for task in self._workers.values():
+            task.cancel()
+        if self._workers:
+            logger.info("[TelegramQueue] Workers stopped")
+        self._workers.clear()
     
     @property
     def pending_count(self) -> int:
-        return self._queue.qsize()
+        return sum(q.qsize() for q in self._queues.values())
     
     @property
     def current_job(self) -> Optional[TelegramUploadJob]:
-        return self._current_job
+        return next(iter(self._current_jobs.values()), None)
+    
+    def loads(self) -> Dict[str, int]:
+        """Queued + in-flight jobs per bot, used for least-load assignment."""
+        return {
+            bot_id: q.qsize() + (1 if bot_id in self._current_jobs else 0)
+            for bot_id, q in self._queues.items()
+        }
+    
+    def _get_queue(self, bot_id: str) -> asyncio.Queue:
+        queue = self._queues.get(bot_id)
+        if queue is None:
+            queue = asyncio.Queue()
+            self._queues[bot_id] = queue
+        return queue
+    
+    def _ensure_worker(self, bot_id: str):
+        task = self._workers.get(bot_id)
+        if self._running and (task is None or task.done()):
+            self._workers[bot_id] = asyncio.create_task(self._worker(bot_id))
+    
+    def _dispatch(self, job: TelegramUploadJob):
+        """Assign the job to a bot and put it on that bot's queue. Runs on the queue's loop."""
+        if not job.bot_id:
+            try:
+                job.bot_id = pick_shard(job.video_id, self.loads()).bot_id
+            except ValueError:
+                # No credentials configured — the worker will log the upload failure
+                job.bot_id = "default"
+        queue = self._get_queue(job.bot_id)
+        queue.put_nowait(job)
+        self._ensure_worker(job.bot_id)
+        logger.info(f"[TelegramQueue] Enqueued: video_id={job.video_id}, res={job.resolution}, "
+                    f"bot={job.bot_id}, queue_size={queue.qsize()}")
     
     def enqueue(self, job: TelegramUploadJob):
         """Add an upload job to the queue. Thread-safe for calls from background threads."""
@@ -73,35 +117,33 @@ class TelegramUploadQueue:
             
         if self._loop and current_loop != self._loop:
             # We are calling from a different thread/loop, use threadsafe
-            self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+            self._loop.call_soon_threadsafe(self._dispatch, job)
         else:
-            self._queue.put_nowait(job)
-            
-        logger.info(f"[TelegramQueue] Enqueued via {'threadsafe ' if self._loop and current_loop != self._loop else ''}put: video_id={job.video_id}, "
-                    f"res={job.resolution}, queue_size={self._queue.qsize()}")
+            self._dispatch(job)
     
-    async def _worker(self):
-        """Process jobs one at a time."""
+    async def _worker(self, bot_id: str):
+        """Process one bot's jobs one at a time."""
         from .telegram_uploader import upload_video_to_telegram
         from ..database import engine
         from sqlmodel import Session as SqlSession, select
         from ..models import VideoSource, TelegramInfo, Video, VideoResolution
         
-        logger.info("[TelegramQueue] Worker loop started, waiting for jobs...")
+        queue = self._get_queue(bot_id)
+        logger.info(f"[TelegramQueue] Worker for bot {bot_id} started, waiting for jobs...")
         
         while self._running:
             try:
                 # Wait for next job (blocks until available)
-                job = await self._queue.get()
-                self._current_job = job
+                job = await queue.get()
+                self._current_jobs[bot_id] = job
                 
                 logger.info(f"[TelegramQueue] Processing: video_id={job.video_id}, "
-                           f"res={job.resolution}, file={job.file_path}")
+                           f"res={job.resolution}, bot={bot_id}, file={job.file_path}")
                 
                 if not os.path.exists(job.file_path):
                     logger.error(f"[TelegramQueue] File not found: {job.file_path}")
-                    self._queue.task_done()
-                    self._current_job = None
+                    queue.task_done()
+                    self._current_jobs.pop(bot_id, None)
                     continue
                 
                 try:
@@ -109,7 +151,8 @@ class TelegramUploadQueue:
                     data = await upload_video_to_telegram(
                         job.file_path,
                         caption=job.caption,
-                        is_encrypted=False
+                        is_encrypted=False,
+                        shard=get_shard(bot_id)
                     )
                     
                     # Save to database
@@ -122,7 +165,9 @@ class TelegramUploadQueue:
                                 file_unique_id=data["file_unique_id"],
                                 file_size=data["file_size"],
                                 mime_type=data["mime_type"],
-                                channel_message_id=data["channel_message_id"]
+                                channel_message_id=data["channel_message_id"],
+                                bot_id=data["bot_id"],
+                                channel_id=data["channel_id"]
                             )
                             session_bg.add(tg_info)
                         
@@ -147,7 +192,9 @@ class TelegramUploadQueue:
                                 file_id=data["file_id"],
                                 file_unique_id=data["file_unique_id"],
                                 file_size=data["file_size"],
-                                channel_message_id=data["channel_message_id"]
+                                channel_message_id=data["channel_message_id"],
+                                bot_id=data["bot_id"],
+                                channel_id=data["channel_id"]
                             )
                             session_bg.add(new_res)
                         
@@ -161,8 +208,11 @@ class TelegramUploadQueue:
                         session_bg.add(source)
                         session_bg.commit()
                     
+                    from .cache import app_cache, video_tag
+                    app_cache.invalidate_tags(video_tag(job.video_id))
+                    
                     logger.info(f"[TelegramQueue] SUCCESS: video_id={job.video_id}, "
-                               f"res={job.resolution}, msg_id={data.get('channel_message_id')}")
+                               f"res={job.resolution}, bot={data.get('bot_id')}, msg_id={data.get('channel_message_id')}")
                 
                 except Exception as e:
                     logger.error(f"[TelegramQueue] FAILED: video_id={job.video_id}, "
@@ -177,14 +227,14 @@ class TelegramUploadQueue:
                         except Exception:
                             pass
                     
-                    self._queue.task_done()
-                    self._current_job = None
+                    queue.task_done()
+                    self._current_jobs.pop(bot_id, None)
                     
                     # Small delay between uploads to avoid rate limits
                     await asyncio.sleep(2)
             
             except asyncio.CancelledError:
-                logger.info("[TelegramQueue] Worker cancelled")
+                logger.info(f"[TelegramQueue] Worker for bot {bot_id} cancelled")
                 break
             except Exception as e:
                 logger.error(f"[TelegramQueue] Worker error: {e}", exc_info=True)
@@ -10,6 +10,8 @@ import logging
 from pathlib import Path
 from typing import Optional
 
+from .telegram_pool import TelegramShard, get_shard, is_primary
+
 logger = logging.getLogger(__name__)
 if not logger.handlers:
     logger.setLevel(logging.INFO)
@@ -22,59 +24,61 @@ if not logger.handlers:
     s_handler.setFormatter(formatter)
     logger.addHandler(s_handler)
 
-# --- Telethon Client (Lazy Singleton) ---
-_client = None
+# --- Telethon Clients (one lazy singleton per bot in the pool) ---
+_clients = {}           # bot_id -> TelegramClient
+_channel_entities = {}  # bot_id -> resolved channel entity
+_client_tokens = {}     # bot_id -> token the client was created with
 _client_lock = asyncio.Lock()
-_channel_entity = None  # Cached resolved channel entity
-_current_token = None   # Track which token the client was created with
 
-async def _get_client():
-    """Get or create a Telethon client. Reads credentials from env at call time."""
-    global _client, _channel_entity, _current_token
-    
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
+
+def _session_path(shard: TelegramShard) -> str:
+    """Primary bot keeps the original session file; extra bots get their own."""
+    name = 'bot_session' if is_primary(shard) else f'bot_session_{shard.bot_id}'
+    return str(Path(__file__).resolve().parent.parent / name)
+
+
+async def _get_client(shard: Optional[TelegramShard] = None):
+    """Get or create the Telethon client for a bot. Reads credentials from env at call time."""
+    shard = shard or get_shard()
+    bot_id = shard.bot_id
     api_id = os.getenv("TELEGRAM_API_ID")
     api_hash = os.getenv("TELEGRAM_API_HASH")
-    channel_id_str = os.getenv("TELEGRAM_CHANNEL_ID")
-    
-    logger.info(f"[TelegramUploader] Credentials: TOKEN={'Yes' if token else 'No'}, "
-                f"API_ID={'Yes' if api_id else 'No'}, "
-                f"API_HASH={'Yes' if api_hash else 'No'}, "
-                f"CHANNEL_ID={channel_id_str}")
-    
+
     # Fast path without lock
-    if _client is not None and _client.is_connected() and _current_token == token:
-        return _client
-    
+    client = _clients.get(bot_id)
+    if client is not None and client.is_connected() and _client_tokens.get(bot_id) == shard.bot_token:
+        return client
+
     async with _client_lock:
         # Double-check after acquiring lock
-        if _client is not None and _client.is_connected() and _current_token == token:
-            return _client
-        
+        client = _clients.get(bot_id)
+        if client is not None and client.is_connected() and _client_tokens.get(bot_id) == shard.bot_token:
+            return client
+
+        logger.info(f"[TelegramUploader] Connecting bot {bot_id}: "
+                    f"API_ID={'Yes' if api_id else 'No'}, "
+                    f"API_HASH={'Yes' if api_hash else 'No'}, "
+                    f"CHANNEL_ID={shard.channel_id}")
+
         # If token changed, disconnect old client
-        if _client is not None and _current_token != token:
-            logger.info("[TelegramUploader] Token changed, reconnecting...")
+        if client is not None and _client_tokens.get(bot_id) != shard.bot_token:
+            logger.info(f"[TelegramUploader] Token for bot {bot_id} changed, reconnecting...")
             try:
-                await _client.disconnect()
+                await client.disconnect()
             except Exception:
                 pass
-            _client = None
-            _channel_entity = None
-        
-        if not token:
-            raise ValueError("TELEGRAM_BOT_TOKEN is not set")
+            _clients.pop(bot_id, None)
+            _channel_entities.pop(bot_id, None)
+
         if not api_id:
             raise ValueError("TELEGRAM_API_ID is not set (required for large file uploads)")
         if not api_hash:
             raise ValueError("TELEGRAM_API_HASH is not set (required for large file uploads)")
-        
+
         from telethon import TelegramClient
-        
-        # Session file stored in backend directory
-        session_path = str(Path(__file__).resolve().parent.parent / 'bot_session')
-        
-        _client = TelegramClient(
-            session_path,
+
+        client = TelegramClient(
+            _session_path(shard),
             int(api_id),
             api_hash,
             timeout=120,
@@ -84,61 +88,51 @@ async def _get_client():
             flood_sleep_threshold=60,  # Auto-sleep on rate limits up to 60s
             use_ipv6=False,            # Avoid IPv6 fallback delays
         )
-        
-        await _client.start(bot_token=token)
-        _current_token = token
-        logger.info("[TelegramUploader] Telethon client connected successfully!")
-        
+
+        await client.start(bot_token=shard.bot_token)
+        _clients[bot_id] = client
+        _client_tokens[bot_id] = shard.bot_token
+        logger.info(f"[TelegramUploader] Telethon client for bot {bot_id} connected successfully!")
+
         # Pre-resolve the channel entity so send_file works
-        if channel_id_str:
-            try:
-                channel_id = _parse_channel_id(channel_id_str)
-                _channel_entity = await _client.get_entity(channel_id)
-                logger.info(f"[TelegramUploader] Channel entity resolved: {getattr(_channel_entity, 'title', channel_id)}")
-            except Exception as e:
-                logger.error(f"[TelegramUploader] Failed to resolve channel entity: {e}")
-                _channel_entity = None
-        
-        return _client
+        try:
+            entity = await client.get_entity(shard.channel_id)
+            _channel_entities[bot_id] = entity
+            logger.info(f"[TelegramUploader] Channel entity resolved: {getattr(entity, 'title', shard.channel_id)}")
+        except Exception as e:
+            logger.error(f"[TelegramUploader] Failed to resolve channel entity for bot {bot_id}: {e}")
+            _channel_entities.pop(bot_id, None)
 
+        return client
 
-async def _get_channel_entity():
-    """Get the resolved channel entity, resolving it if needed."""
-    global _channel_entity
-    
-    if _channel_entity is not None:
-        return _channel_entity
-    
-    client = await _get_client()
-    channel_id_str = os.getenv("TELEGRAM_CHANNEL_ID")
-    channel_id = _parse_channel_id(channel_id_str)
-    _channel_entity = await client.get_entity(channel_id)
-    return _channel_entity
 
+async def _get_channel_entity(shard: Optional[TelegramShard] = None):
+    """Get the resolved channel entity for a bot, resolving it if needed."""
+    shard = shard or get_shard()
+    entity = _channel_entities.get(shard.bot_id)
+    if entity is not None:
+        return entity
 
-def _parse_channel_id(channel_id_str: str) -> int:
-    """Parse channel ID string to integer, handling various formats."""
-    try:
-        cid = int(channel_id_str.strip())
-        return cid
-    except (ValueError, AttributeError) as e:
-        raise ValueError(f"Invalid TELEGRAM_CHANNEL_ID: '{channel_id_str}' - {e}")
+    client = await _get_client(shard)
+    entity = await client.get_entity(shard.channel_id)
+    _channel_entities[shard.bot_id] = entity
+    return entity
 
 
-async def upload_video_to_telegram(file_path: str, caption: str = "", is_encrypted: bool = True, thumbnail_path: str = None):
+async def upload_video_to_telegram(file_path: str, caption: str = "", is_encrypted: bool = True, thumbnail_path: str = None,
+                                   shard: Optional[TelegramShard] = None):
     """
-    Uploads a video to the configured Telegram channel using Telethon.
+    Uploads a video to a Telegram channel using Telethon.
     Supports files up to 2GB.
-    Returns a dictionary with file_id and other metadata upon success.
+    If no shard is given, the primary bot/channel is used.
+    Returns a dictionary with file_id, the owning bot_id/channel_id and other metadata upon success.
     """
-    if not os.getenv("TELEGRAM_CHANNEL_ID"):
-        raise ValueError("TELEGRAM_CHANNEL_ID is not set")
-    
     from telethon.tl.types import DocumentAttributeVideo
     from .transcoder import get_video_info
     
-    client = await _get_client()
-    entity = await _get_channel_entity()
+    shard = shard or get_shard()
+    client = await _get_client(shard)
+    entity = await _get_channel_entity(shard)
     
     try:
         file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
@@ -242,7 +236,9 @@ async def upload_video_to_telegram(file_path: str, caption: str = "", is_encrypt
             else:
                 raise ValueError("Message sent but no video/document content found")
             
-            logger.info(f"Upload successful! Message ID: {message.id}, File size: {result.get('file_size', 'unknown')}")
+            result["bot_id"] = shard.bot_id
+            result["channel_id"] = shard.channel_id
+            logger.info(f"Upload successful! Bot: {shard.bot_id}, Message ID: {message.id}, File size: {result.get('file_size', 'unknown')}")
             return result
             
         finally:
@@ -255,16 +251,14 @@ async def upload_video_to_telegram(file_path: str, caption: str = "", is_encrypt
         raise e
 
 
-async def upload_photo_to_telegram(file_path: str, caption: str = ""):
+async def upload_photo_to_telegram(file_path: str, caption: str = "", shard: Optional[TelegramShard] = None):
     """
-    Uploads a photo to the configured Telegram channel using Telethon.
+    Uploads a photo to a Telegram channel using Telethon.
     Returns a dictionary with file_id and other metadata upon success.
     """
-    if not os.getenv("TELEGRAM_CHANNEL_ID"):
-        raise ValueError("TELEGRAM_CHANNEL_ID is not set")
-    
-    client = await _get_client()
-    entity = await _get_channel_entity()
+    shard = shard or get_shard()
+    client = await _get_client(shard)
+    entity = await _get_channel_entity(shard)
     
     try:
         logger.info(f"Uploading photo {file_path} to Telegram channel...")
@@ -288,6 +282,8 @@ async def upload_photo_to_telegram(file_path: str, caption: str = ""):
                 "file_size": getattr(largest, 'size', 0) if largest else 0,
                 "width": getattr(largest, 'w', 0) if largest else 0,
                 "height": getattr(largest, 'h', 0) if largest else 0,
+                "bot_id": shard.bot_id,
+                "channel_id": shard.channel_id,
             }
         else:
             raise ValueError("Message sent but no photo content found")
@@ -297,15 +293,16 @@ async def upload_photo_to_telegram(file_path: str, caption: str = ""):
         raise e
 
 
-async def get_telegram_file_bytes(file_id: str) -> Optional[bytes]:
+async def get_telegram_file_bytes(file_id: str, bot_id: Optional[str] = None) -> Optional[bytes]:
     """
     Downloads file content from Telegram using Telethon.
     Note: file_id from Telethon is different from Bot API file_id.
-    This works with message-based retrieval.
+    This works with message-based retrieval, so it must use the bot that posted the message.
     """
     try:
-        client = await _get_client()
-        entity = await _get_channel_entity()
+        shard = get_shard(bot_id)
+        client = await _get_client(shard)
+        entity = await _get_channel_entity(shard)
         
         # Try to get the message by ID and download the file
         # file_id in our DB is the Telethon document ID as string
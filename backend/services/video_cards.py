@@ -0,0 +1,126 @@
+"""
+Video cards: the lightweight projection list endpoints return.
+
+A grid tile needs a title, thumbnail, duration, views and who uploaded it.
+Loading full Video rows with their category, uploader, every VideoSource,
+TelegramInfo and VideoResolution, validating them into VideoPublic and running
+jsonable_encoder over the lot cost several queries per page and a payload
+several times larger than what the page draws. card_select() reads just the
+VideoCard columns, category and uploader included, in one joined query:
+
+    rows = (await session.exec(paginate(card_select().where(...), VIDEO_KEYSET, cursor, skip, limit))).all()
+    cards, next_cursor = page_results(rows, VIDEO_KEYSET, limit)
+    return card_response(to_cards(cards), parse_fields(fields), next_cursor)
+
+Cards are plain dicts; cached pages hold them already encoded (encode_page),
+so a cache hit sends the stored bytes as they are. Clients that need even less
+pass a sparse fieldset, `?fields=id,title,thumbnail_url`; it is applied after
+the cache, so every fieldset shares the same cached page. `id` is always sent.
+The full VideoPublic (sources, resolutions) stays on GET /videos/{id}.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, Response
+from sqlmodel import select
+
+from ..models import Category, User, Video, VideoCard
+from .cache import video_list_tags
+from .pagination import NEXT_CURSOR_HEADER
+from .serialization import dumps, json_response, loads
+
+CARD_FIELDS = tuple(VideoCard.model_fields)
+
+_COLUMNS = (
+    Video.id, Video.title, Video.thumbnail_url, Video.duration, Video.views, Video.like_count,
+    Video.upload_date, Video.is_short, Video.category_id, Video.uploader_id,
+    Category.name.label("category_name"), Category.slug.label("category_slug"),
+    User.username.label("uploader_username"), User.display_name.label("uploader_display_name"),
+    User.avatar_url.label("uploader_avatar_url"),
+)
+
+
+def card_select():
+    """SELECT of the VideoCard columns; add WHERE/ORDER BY (or paginate()) and turn the rows into to_cards()."""
+    return (
+        select(*_COLUMNS)
+        .select_from(Video)
+        .outerjoin(Category, Category.id == Video.category_id)
+        .outerjoin(User, User.id == Video.uploader_id)
+    )
+
+
+def to_card(row) -> Dict:
+    category = None
+    if row.category_name is not None:
+        category = {"id": row.category_id, "name": row.category_name, "slug": row.category_slug}
+    uploader = None
+    if row.uploader_username is not None:
+        uploader = {
+            "id": row.uploader_id,
+            "username": row.uploader_username,
+            "display_name": row.uploader_display_name,
+            "avatar_url": row.uploader_avatar_url,
+        }
+    return {
+        "id": row.id,
+        "title": row.title,
+        "thumbnail_url": row.thumbnail_url,
+        "duration": row.duration,
+        "views": row.views,
+        "like_count": row.like_count,
+        "upload_date": row.upload_date.isoformat() if row.upload_date else None,
+        "is_short": bool(row.is_short),
+        "category_id": row.category_id,
+        "uploader_id": row.uploader_id,
+        "category": category,
+        "uploader": uploader,
+    }
+
+
+def to_cards(rows: Iterable) -> List[Dict]:
+    return [to_card(row) for row in rows]
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Validate a `?fields=` value. None means every field; unknown names are a 400."""
+    if fields is None or not fields.strip():
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = sorted(set(requested) - set(CARD_FIELDS))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(CARD_FIELDS)}",
+        )
+    return tuple(f for f in CARD_FIELDS if f == "id" or f in requested)
+
+
+def sparse(cards: List[Dict], fields: Optional[Tuple[str, ...]]) -> List[Dict]:
+    if fields is None:
+        return cards
+    return [{f: card[f] for f in fields} for card in cards]
+
+
+def encode_page(cards: List[Dict], next_cursor: Optional[str], *tags: str) -> Tuple[bytes, Optional[str], List[str]]:
+    """A page as cached: (JSON body, next cursor, its cache tags). Pass page_tags as the cache's `tags`."""
+    return dumps(cards), next_cursor, video_list_tags(*tags)(cards)
+
+
+def page_tags(page) -> List[str]:
+    return page[2]
+
+
+def card_response(cards: Union[bytes, List[Dict]], fields: Optional[Tuple[str, ...]] = None,
+                  next_cursor: Optional[str] = None) -> Response:
+    """
+    Send cards (or a body from encode_page) as JSON. They are already JSON-safe,
+    so FastAPI's response_model validation and jsonable_encoder would only redo work.
+    """
+    if isinstance(cards, bytes):
+        if fields is None:
+            body = cards
+        else:
+            body = dumps(sparse(loads(cards), fields))
+    else:
+        body = dumps(sparse(cards, fields))
+    return json_response(body, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
@@ -0,0 +1,275 @@
+"""
+Set-based video deletion.
+
+Deleting a video used to load every comment, like, history row and playlist
+item into the ORM and delete them one at a time — minutes for a popular video,
+with row locks held the whole time. Now each dependent table is cleared with a
+single statement, children first so foreign keys are never violated:
+
+    DELETE FROM commentlike WHERE comment_id IN (SELECT id FROM comment WHERE video_id IN (...))
+    DELETE FROM comment WHERE video_id IN (...) AND parent_id IS NOT NULL
+    DELETE FROM comment WHERE video_id IN (...)
+    ... likes, watch/view history, playlist items, sources, telegram rows ...
+    DELETE FROM video WHERE id IN (...)
+
+Large deletes (admin "delete all") run as a background job, DELETE_BATCH videos
+per transaction so locks stay short; GET /admin/jobs/{id} reports progress.
+
+Files are removed after the rows are committed, by a cleanup worker, so a slow
+disk never holds a transaction open. Only local thumbnails are removed — the
+provider clients in external_storage have no delete call, so remote copies on
+Streamtape/Doodstream/Telegram are left in place.
+"""
+import asyncio
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, update
+from sqlmodel import select
+
+logger = logging.getLogger(__name__)
+
+DELETE_BATCH = int(os.getenv("VIDEO_DELETE_BATCH", "200"))
+MAX_FINISHED_JOBS = 20
+
+
+def _thumbnail_path(url: Optional[str]) -> Optional[str]:
+    if not url or not url.startswith("/thumbnails/"):
+        return None
+    return url.replace("/thumbnails/", "backend/thumbnails/", 1)
+
+
+def delete_video_rows(session, video_ids: List[int]) -> dict:
+    """
+    Delete videos and every row that references them. Does not commit.
+    Returns {"rows": {table: deleted}, "deleted_sources": [...], "files": [...]}.
+    """
+    from ..models import (Comment, CommentLike, Playlist, PlaylistItem, TelegramInfo, Video, VideoLike,
+                          VideoResolution, VideoSource, ViewHistory, WatchHistory)
+
+    ids = list(video_ids)
+    if not ids:
+        return {"rows": {}, "deleted_sources": [], "files": []}
+
+    sources = session.exec(
+        select(VideoSource.provider, VideoSource.resolution).where(VideoSource.video_id.in_(ids))
+    ).all()
+    thumbnails = session.exec(select(Video.thumbnail_url).where(Video.id.in_(ids))).all()
+
+    # Playlists lose one item per matching row; adjust counters before the rows go
+    removed = (
+        select(func.count())
+        .where(PlaylistItem.playlist_id == Playlist.id, PlaylistItem.video_id.in_(ids))
+        .scalar_subquery()
+    )
+    session.exec(
+        update(Playlist)
+        .where(Playlist.id.in_(select(PlaylistItem.playlist_id).where(PlaylistItem.video_id.in_(ids))))
+        .values(item_count=Playlist.item_count - removed)
+        .execution_options(synchronize_session=False)
+    )
+
+    video_comments = select(Comment.id).where(Comment.video_id.in_(ids))
+    statements = [
+        ("commentlike", delete(CommentLike).where(CommentLike.comment_id.in_(video_comments))),
+        ("reply", delete(Comment).where(Comment.video_id.in_(ids), Comment.parent_id.is_not(None))),
+        ("comment", delete(Comment).where(Comment.video_id.in_(ids))),
+        ("videolike", delete(VideoLike).where(VideoLike.video_id.in_(ids))),
+        ("watchhistory", delete(WatchHistory).where(WatchHistory.video_id.in_(ids))),
+        ("viewhistory", delete(ViewHistory).where(ViewHistory.video_id.in_(ids))),
+        ("playlistitem", delete(PlaylistItem).where(PlaylistItem.video_id.in_(ids))),
+        ("videosource", delete(VideoSource).where(VideoSource.video_id.in_(ids))),
+        ("telegraminfo", delete(TelegramInfo).where(TelegramInfo.video_id.in_(ids))),
+        ("videoresolution", delete(VideoResolution).where(VideoResolution.video_id.in_(ids))),
+        ("video", delete(Video).where(Video.id.in_(ids))),
+    ]
+    rows = {}
+    for table, statement in statements:
+        result = session.exec(statement.execution_options(synchronize_session=False))
+        rows[table] = rows.get(table, 0) + result.rowcount
+
+    return {
+        "rows": rows,
+        "deleted_sources": [f"{provider}/{resolution or 'original'}" for provider, resolution in sources],
+        "files": [path for path in map(_thumbnail_path, thumbnails) if path],
+    }
+
+
+def forget_videos(video_ids: List[int]):
+    """
+    Drop in-memory state for deleted videos: buffered views and watch progress
+    (their flush would now violate foreign keys), search index entries and
+    cached responses.
+    """
+    from .cache import app_cache, video_tag
+    from .progress_buffer import progress_buffer
+    from .search_index import search_index
+    from .view_counter import view_counter
+
+    view_counter.discard_videos(video_ids)
+    progress_buffer.discard_videos(video_ids)
+    for video_id in video_ids:
+        search_index.remove(video_id)
+    # Every cached page or detail that showed one of them
+    app_cache.invalidate_tags(*[video_tag(video_id) for video_id in video_ids])
+
+
+class DeleteJob:
+    def __init__(self, video_ids: List[int]):
+        self.id = uuid.uuid4().hex[:12]
+        self.video_ids = video_ids
+        self.total = len(video_ids)
+        self.deleted = 0
+        self.status = "queued"  # queued -> running -> done | failed
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "deleted": self.deleted,
+            "progress": round(self.deleted / self.total * 100, 1) if self.total else 100.0,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class VideoDeleter:
+    """
+    Runs background delete jobs and the file cleanup queue. Jobs and cleanup
+    run as asyncio tasks in the main event loop; the blocking DB and disk work
+    happens in worker threads.
+    """
+
+    def __init__(self, batch_size: int = DELETE_BATCH):
+        self.batch_size = batch_size
+        self._jobs: Dict[str, DeleteJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._files: Optional[asyncio.Queue] = None
+        self._cleanup_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the file cleanup worker. Call this from the FastAPI startup event."""
+        if self._cleanup_task:
+            return
+        self._files = asyncio.Queue()
+        self._cleanup_task = asyncio.create_task(self._cleanup_worker())
+
+    async def stop(self):
+        """Stop the cleanup worker; running jobs finish their current batch and stop."""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._cleanup_task:
+            self._cleanup_task.cancel()
+            self._cleanup_task = None
+        if self._files is not None:
+            pending = []
+            while not self._files.empty():
+                pending.append(self._files.get_nowait())
+            self._files = None
+            self._remove(pending)
+
+    # -- File cleanup ---------------------------------------------------------
+
+    def remove_files(self, paths: List[str]):
+        """Queue files for removal. Without a running worker they are removed inline."""
+        if not paths:
+            return
+        if self._files is None:
+            self._remove(paths)
+            return
+        for path in paths:
+            self._files.put_nowait(path)
+
+    @staticmethod
+    def _remove(paths: List[str]):
+        for path in paths:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                logger.error(f"[VideoDeleter] Failed to remove {path}: {e}")
+
+    async def _cleanup_worker(self):
+        while True:
+            try:
+                path = await self._files.get()
+                await asyncio.to_thread(self._remove, [path])
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"[VideoDeleter] Cleanup worker error: {e}", exc_info=True)
+
+    # -- Deletes --------------------------------------------------------------
+
+    def delete_now(self, session, video_ids: List[int]) -> dict:
+        """Delete a few videos in the caller's transaction and commit."""
+        result = delete_video_rows(session, video_ids)
+        session.commit()
+        self._after_delete(video_ids, result["files"])
+        return result
+
+    def submit(self, video_ids: List[int]) -> DeleteJob:
+        """Delete videos in the background, batch_size per transaction."""
+        job = DeleteJob(list(video_ids))
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[DeleteJob]:
+        return self._jobs.get(job_id)
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.status in ("done", "failed")]
+        for job in sorted(finished, key=lambda j: j.created_at)[:-MAX_FINISHED_JOBS]:
+            del self._jobs[job.id]
+
+    async def _run(self, job: DeleteJob):
+        job.status = "running"
+        logger.info(f"[VideoDeleter] Job {job.id}: deleting {job.total} videos")
+        try:
+            for i in range(0, job.total, self.batch_size):
+                batch = job.video_ids[i:i + self.batch_size]
+                files = await asyncio.to_thread(self._delete_batch, batch)
+                self._after_delete(batch, files)
+                job.deleted += len(batch)
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "cancelled"
+        except Exception as e:
+            logger.error(f"[VideoDeleter] Job {job.id} failed after {job.deleted} videos: {e}", exc_info=True)
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            self._tasks.pop(job.id, None)
+        logger.info(f"[VideoDeleter] Job {job.id} {job.status}: {job.deleted}/{job.total} videos")
+
+    def _delete_batch(self, video_ids: List[int]) -> List[str]:
+        from sqlmodel import Session
+        from ..database import engine
+
+        with Session(engine) as session:
+            result = delete_video_rows(session, video_ids)
+            session.commit()
+        return result["files"]
+
+    def _after_delete(self, video_ids: List[int], files: List[str]):
+        forget_videos(video_ids)
+        self.remove_files(files)
+
+
+# Global singleton
+video_deleter = VideoDeleter()
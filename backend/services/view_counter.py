@@ -0,0 +1,173 @@
+"""
+Buffered View Counter — write-behind aggregation for POST /videos/{id}/view.
+
+Incrementing Video.views per request means a row lock + commit for every view,
+which serializes traffic on hot videos. Instead, views are accumulated in memory
+and flushed in one transaction every VIEW_FLUSH_INTERVAL seconds, or sooner
+once VIEW_FLUSH_MAX_EVENTS views are pending:
+
+    UPDATE video SET views = views + :delta WHERE id = :id   (one executemany)
+    INSERT INTO viewhistory ...                               (one bulk insert)
+
+If a flush fails the batch is merged back and retried on the next cycle, so a
+DB hiccup delays views instead of losing them. While the database is down
+(services/db_health) flushes are skipped and views queue up; past
+VIEW_MAX_PENDING the oldest history rows are dropped but every view still
+counts. Views still buffered when the process dies are lost — acceptable for
+an approximate counter.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from sqlalchemy import bindparam, insert, select, update
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = float(os.getenv("VIEW_FLUSH_INTERVAL", "5"))
+FLUSH_MAX_EVENTS = int(os.getenv("VIEW_FLUSH_MAX_EVENTS", "500"))
+MAX_PENDING = int(os.getenv("VIEW_MAX_PENDING", "100000"))
+
+
+class ViewCounter:
+    """
+    In-process aggregator. record() is called from request handlers; the
+    flush runs as an asyncio task in the main event loop.
+    """
+
+    def __init__(self, flush_interval: float = FLUSH_INTERVAL, max_events: int = FLUSH_MAX_EVENTS):
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self._deltas: Dict[int, int] = {}
+        # Past MAX_PENDING (a long outage) the oldest rows fall off the front
+        self._history: Deque[dict] = deque(maxlen=MAX_PENDING)
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._worker_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the flush loop. Call this from the FastAPI startup event."""
+        if self._worker_task:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._worker_task = asyncio.create_task(self._worker())
+        logger.info(f"[ViewCounter] Started (flush every {self.flush_interval}s or {self.max_events} views)")
+
+    async def stop(self):
+        """Stop the flush loop and write out whatever is still buffered."""
+        if self._worker_task:
+            self._worker_task.cancel()
+            self._worker_task = None
+        await self.flush()
+
+    @property
+    def pending_events(self) -> int:
+        return len(self._history)
+
+    def pending(self, video_id: int) -> int:
+        """Views recorded for a video but not yet flushed."""
+        return self._deltas.get(video_id, 0)
+
+    def record(self, video_id: int, ip_address: Optional[str] = None, user_agent: Optional[str] = None) -> int:
+        """Buffer one view. Returns the number of unflushed views for this video."""
+        with self._lock:
+            pending = self._deltas.get(video_id, 0) + 1
+            self._deltas[video_id] = pending
+            self._history.append({
+                "video_id": video_id,
+                "viewed_at": datetime.utcnow(),
+                "ip_address": ip_address,
+                "user_agent": user_agent,
+            })
+            full = len(self._history) >= self.max_events
+
+        if full and self._wakeup is not None:
+            self._wakeup.set()
+        return pending
+
+    def discard_videos(self, video_ids: List[int]):
+        """Drop buffered views of deleted videos; flushing them would violate the viewhistory foreign key."""
+        ids = set(video_ids)
+        with self._lock:
+            for vid in ids:
+                self._deltas.pop(vid, None)
+            self._history = deque((h for h in self._history if h["video_id"] not in ids), maxlen=MAX_PENDING)
+
+    async def flush(self) -> int:
+        """Write buffered views to the database. Returns the number of view events written."""
+        from .db_health import db_health
+
+        if db_health.is_open:
+            return 0  # Queued until the database is back
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+            history, self._history = list(self._history), deque(maxlen=MAX_PENDING)
+
+        if not history:
+            return 0
+
+        from ..database import async_engine
+        from ..models import Video, ViewHistory
+        from sqlmodel.ext.asyncio.session import AsyncSession
+
+        video_table = Video.__table__
+        increment = (
+            update(video_table)
+            .where(video_table.c.id == bindparam("b_id"))
+            .values(views=video_table.c.views + bindparam("b_delta"))
+        )
+        # Sorted so concurrent flushers (several workers) lock rows in the same order
+        params = [{"b_id": vid, "b_delta": delta} for vid, delta in sorted(deltas.items())]
+
+        try:
+            async with AsyncSession(async_engine) as session:
+                # Views queued during an outage weren't checked against the video table
+                existing = set((await session.execute(
+                    select(video_table.c.id).where(video_table.c.id.in_(list(deltas)))
+                )).scalars().all())
+                params = [p for p in params if p["b_id"] in existing]
+                rows = [h for h in history if h["video_id"] in existing]
+                if params:  # Views of deleted videos alone: nothing to write
+                    await session.execute(increment, params)
+                    if rows:
+                        await session.execute(insert(ViewHistory.__table__), rows)
+                    await session.commit()
+        except Exception as e:
+            db_health.observe(e)
+            logger.error(f"[ViewCounter] Flush of {len(history)} views failed, will retry: {e}")
+            self._merge_back(deltas, history)
+            return 0
+
+        logger.debug(f"[ViewCounter] Flushed {len(rows)} views across {len(params)} videos")
+        return len(rows)
+
+    def _merge_back(self, deltas: Dict[int, int], history: List[dict]):
+        with self._lock:
+            for vid, delta in deltas.items():
+                self._deltas[vid] = self._deltas.get(vid, 0) + delta
+            self._history = deque(history + list(self._history), maxlen=MAX_PENDING)
+
+    async def _worker(self):
+        while True:
+            try:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"[ViewCounter] Worker error: {e}", exc_info=True)
+                await asyncio.sleep(self.flush_interval)
+
+
+# Global singleton
+view_counter = ViewCounter()
@@ -0,0 +1,122 @@
+"""
+Concurrency benchmark: sync Session vs AsyncSession inside async FastAPI handlers.
+
+Every query is slowed down by a SQL function that sleeps for --latency ms, to
+simulate a slow Neon round-trip. With a sync Session the sleep blocks the event
+loop, so concurrent requests are served one by one. With AsyncSession the
+handler is suspended while waiting and other requests run.
+
+Usage:
+    python bench_async_db.py [--requests 40] [--latency 50]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.models import Category, Video
+
+
+def build_app(db_path: str, latency_ms: int) -> FastAPI:
+    def _slow(ms):
+        time.sleep(ms / 1000)
+        return ms
+
+    # Both pools are large enough for every request: with the sync engine a
+    # request blocked on an empty pool would also block the loop, so the
+    # connections it waits for could never be returned (a deadlock, not a result).
+    engine = create_engine(f"sqlite:///{db_path}", pool_size=100, connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", pool_size=100)
+
+    @event.listens_for(engine, "connect")
+    def _register_sync(dbapi_conn, _):
+        dbapi_conn.create_function("sleep_ms", 1, _slow)
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _register_async(dbapi_conn, _):
+        dbapi_conn.create_function("sleep_ms", 1, _slow)
+
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        cat = Category(name="Bench", slug="bench")
+        session.add(cat)
+        session.commit()
+        session.refresh(cat)
+        for i in range(50):
+            session.add(Video(title=f"Bench video {i}", category_id=cat.id))
+        session.commit()
+
+    def get_sync_session():
+        with Session(engine) as session:
+            yield session
+
+    async def get_async():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    async def sync_handler(session: Session = Depends(get_sync_session)):
+        session.exec(text(f"SELECT sleep_ms({latency_ms})")).one()
+        return len(session.exec(select(Video).limit(20)).all())
+
+    @app.get("/async")
+    async def async_handler(session: AsyncSession = Depends(get_async)):
+        (await session.exec(text(f"SELECT sleep_ms({latency_ms})"))).one()
+        return len((await session.exec(select(Video).limit(20))).all())
+
+    return app
+
+
+async def run(app: FastAPI, path: str, n: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path)  # warm up the pool
+
+        async def timed():
+            t0 = time.perf_counter()
+            resp = await client.get(path)
+            resp.raise_for_status()
+            return (time.perf_counter() - t0) * 1000
+
+        t0 = time.perf_counter()
+        latencies = sorted(await asyncio.gather(*[timed() for _ in range(n)]))
+        wall = (time.perf_counter() - t0) * 1000
+
+    return {
+        "wall_ms": wall,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency", type=int, default=50, help="simulated DB latency per query (ms)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = build_app(os.path.join(tmp, "bench.db"), args.latency)
+        print(f"{args.requests} concurrent requests, {args.latency} ms simulated query latency\n")
+        print(f"{'mode':<8}{'wall ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        for label, path in (("before", "/sync"), ("after", "/async")):
+            r = asyncio.run(run(app, path, args.requests))
+            print(f"{label:<8}{r['wall_ms']:>10.0f}{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
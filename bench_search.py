@@ -0,0 +1,117 @@
+"""
+Search benchmark: LIKE scan vs the FTS5 index on a generated video catalog.
+
+Builds a throwaway SQLite database through the migrations (so the FTS5 table
+and its triggers are the real ones), inserts --videos synthetic videos with
+Zipf-distributed words, then times the old `title/description LIKE '%q%'`
+query against the ranked full-text query used by /videos/search.
+
+Ranking has to score every match, so FTS time grows with how many videos
+contain the words, while the old unranked LIKE ... LIMIT 20 stops at the first
+20 hits for common words but scans the whole table for rare ones.
+
+Usage:
+    python bench_search.py [--videos 1000000] [--runs 20]
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine, text
+
+from backend.migrations import run_migrations
+from backend.services.fulltext import SQLITE_SEARCH, _fts5_query, _terms
+
+LIKE_SEARCH = """
+SELECT id FROM video
+WHERE title LIKE :pattern OR description LIKE :pattern
+LIMIT :limit OFFSET 0
+"""
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "to", "vi", "ze", "po", "an", "el", "or", "un", "is"]
+
+
+def make_vocabulary(size: int, rng: random.Random):
+    words = set(["music", "funny", "cats", "tutorial", "live", "trailer", "gaming", "cooking"])
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words, key=lambda w: (w not in ("music", "funny", "cats"), w))
+
+
+def seed(engine, n: int, rng: random.Random):
+    vocab = make_vocabulary(20000, rng)
+    # Zipf-Mandelbrot: the most common words appear in ~5% of videos
+    cum_weights = list(itertools.accumulate(1 / (rank + 100) for rank in range(len(vocab))))
+    start = datetime(2020, 1, 1)
+    batch = 20000
+    insert = text(
+        "INSERT INTO video (title, description, views, upload_date, storage_mode, is_short, "
+        "like_count, dislike_count, comment_count) "
+        "VALUES (:title, :description, 0, :upload_date, 'local', 0, 0, 0, 0)"
+    )
+    t0 = time.perf_counter()
+    for offset in range(0, n, batch):
+        rows = []
+        for i in range(offset, min(offset + batch, n)):
+            rows.append({
+                "title": " ".join(rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(3, 8))).capitalize(),
+                "description": " ".join(rng.choices(vocab, cum_weights=cum_weights, k=rng.randint(10, 30))),
+                "upload_date": start + timedelta(seconds=i * 60),
+            })
+        with engine.begin() as conn:
+            conn.execute(insert, rows)
+        print(f"\r  seeded {min(offset + batch, n):,}/{n:,}", end="", flush=True)
+    print(f"  ({time.perf_counter() - t0:.0f}s, FTS maintained by triggers)")
+    return vocab
+
+
+def timed(engine, sql, params, runs):
+    samples = []
+    with engine.connect() as conn:
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            conn.execute(text(sql), params).all()
+            samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        run_migrations(engine)
+        print(f"Generating {args.videos:,} videos...")
+        vocab = seed(engine, args.videos, rng)
+
+        queries = [
+            ("common word", "music"),
+            ("two words", "funny cats"),
+            ("type-ahead prefix", "tutor"),
+            ("mid-frequency word", vocab[500]),
+            ("rare word", vocab[-1]),
+            ("no match", "xylophonequartz"),
+        ]
+        print(f"\n{'query':<22}{'q':<18}{'LIKE ms':>10}{'FTS ms':>10}{'speedup':>10}")
+        fts_sql = SQLITE_SEARCH.format(after="")
+        for label, q in queries:
+            like_ms = timed(engine, LIKE_SEARCH, {"pattern": f"%{q}%", "limit": 20}, args.runs)
+            fts_ms = timed(engine, fts_sql, {"query": _fts5_query(_terms(q)), "limit": 21, "offset": 0}, args.runs)
+            print(f"{label:<22}{q:<18}{like_ms:>10.1f}{fts_ms:>10.1f}{like_ms / fts_ms:>9.0f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
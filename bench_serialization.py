@@ -0,0 +1,110 @@
+"""
+Serialization benchmark: how long it takes to turn a list of VideoPublic into
+response bytes, old path vs the ones in backend/services/serialization.py.
+
+Builds in-memory Video rows with a category, an uploader, three sources,
+Telegram info and three resolutions each (no database involved) and times, for
+20/100/500-item lists:
+
+  miss, old    model_validate + jsonable_encoder + json.dumps
+  hit, old     cached dicts re-validated against response_model + jsonable_encoder + json.dumps
+  miss, new    dump_models(): ORM -> models -> bytes in pydantic-core
+  dicts, new   dumps() (orjson when installed) over already JSON-safe dicts
+  hit, new     cached bytes into a Response
+
+Usage:
+    python bench_serialization.py [--sizes 20,100,500] [--runs 50]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from backend.models import Category, TelegramInfo, User, Video, VideoPublic, VideoResolution, VideoSource
+from backend.services.serialization import dump_models, dumps, json_response, orjson
+
+
+def make_videos(n: int) -> List[Video]:
+    category = Category(id=1, name="Music", slug="music", description="Songs and live sets")
+    uploader = User(id=7, username="channel", email="c@example.com", password_hash="x",
+                    display_name="Some Channel", avatar_url="/avatars/7.png")
+    start = datetime(2024, 1, 1)
+    videos = []
+    for i in range(n):
+        video = Video(
+            id=i + 1, title=f"Video number {i} with a reasonably long title", description="Lorem ipsum " * 20,
+            thumbnail_url=f"/thumbnails/{i + 1}", duration=300 + i, views=1000 * i, like_count=i,
+            upload_date=start + timedelta(minutes=i), category_id=1, uploader_id=7, storage_mode="telegram",
+            original_resolution="1080p",
+        )
+        video.category = category
+        video.uploader = uploader
+        video.sources = [
+            VideoSource(id=i * 3 + k, video_id=i + 1, provider=provider, resolution="720p",
+                        embed_url=f"https://{provider}.example/e/{i}", download_url=f"https://{provider}.example/d/{i}")
+            for k, provider in enumerate(("telegram", "streamtape", "doodstream"))
+        ]
+        video.telegram_info = TelegramInfo(video_id=i + 1, file_id="BAACAgUAAxkDAAI" * 3, file_unique_id="AgAD" * 4,
+                                           channel_message_id=1000 + i, file_size=50_000_000, mime_type="video/mp4")
+        video.resolutions = [
+            VideoResolution(video_id=i + 1, resolution=res, file_id="BAACAgUAAxkDAAI" * 3, file_unique_id="AgAD" * 4,
+                            channel_message_id=2000 + i, file_size=10_000_000)
+            for res in ("360p", "480p", "720p")
+        ]
+        videos.append(video)
+    return videos
+
+
+def timed(fn, runs: int) -> float:
+    fn()  # warm-up
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="20,100,500")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    adapter = TypeAdapter(List[VideoPublic])
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson else 'stdlib json'}; median of {args.runs} runs, ms")
+    print(f"{'items':>6} {'miss old':>9} {'hit old':>9} {'miss new':>9} {'dicts new':>10} {'hit new':>9} {'bytes':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        videos = make_videos(size)
+        cached_dicts = jsonable_encoder([VideoPublic.model_validate(v) for v in videos])
+        cached_body = dump_models(videos, VideoPublic)
+
+        def miss_old():
+            return json.dumps(jsonable_encoder([VideoPublic.model_validate(v) for v in videos])).encode()
+
+        def hit_old():
+            return json.dumps(jsonable_encoder(adapter.validate_python(cached_dicts))).encode()
+
+        results = [
+            timed(miss_old, args.runs),
+            timed(hit_old, args.runs),
+            timed(lambda: dump_models(videos, VideoPublic), args.runs),
+            timed(lambda: dumps(cached_dicts), args.runs),
+            timed(lambda: json_response(cached_body), args.runs),
+        ]
+        assert json.loads(miss_old()) == json.loads(cached_body) == json.loads(dumps(cached_dicts))
+        print(f"{size:>6} {results[0]:>9.3f} {results[1]:>9.3f} {results[2]:>9.3f} {results[3]:>10.3f} "
+              f"{results[4]:>9.4f} {len(cached_body):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -311,7 +311,9 @@ const Settings = () => {
                 const result = await api.adminDeleteAllVideos(token);
                 setChatHistory(prev => [...prev, {
                     role: 'assistant',
-                    text: `🗑️ **All Videos Deleted**\n\n${result.deleted_count} video(s) have been permanently removed from the platform.\n\nAll sources, thumbnails, and metadata have been wiped.`,
+                    text: result.job_id
+                        ? `🗑️ **Deleting All Videos**\n\n${result.total} video(s) are being removed in the background (job \`${result.job_id}\`).`
+                        : `🗑️ **All Videos Deleted**\n\n${result.deleted_count} video(s) have been permanently removed from the platform.\n\nAll sources, thumbnails, and metadata have been wiped.`,
                     time: ts()
                 }]);
                 setIsTyping(false);
@@ -90,6 +90,9 @@ export const api = {
     searchVideos: (query, skip = 0, limit = 20) => api.get(`/videos/search?q=${encodeURIComponent(query)}&skip=${skip}&limit=${limit}`),
     getVideosByCategory: (slug, skip = 0, limit = 20) => api.get(`/videos/category/${slug}?skip=${skip}&limit=${limit}`),
     getVideo: (id) => api.get(`/videos/${id}`),
+    // Watch page in one request: video, likes, progress, subscription and first comments
+    getVideoPage: (id, token = null) => api.get(`/videos/${id}/page`, token),
+    getVideosBatch: (ids, token = null) => api.get(`/videos/batch?ids=${ids.join(',')}`, token),
     getShorts: (skip = 0, limit = 20) => api.get(`/videos/shorts?skip=${skip}&limit=${limit}`),
 
     // Categories
@@ -278,5 +281,6 @@ export const api = {
         }
         return response.json();
     },
+    adminGetJob: (jobId, token) => api.get(`/admin/jobs/${jobId}`, token),
     adminSearchVideos: (query, token, skip = 0, limit = 20) => api.get(`/admin/videos/search?q=${encodeURIComponent(query)}&skip=${skip}&limit=${limit}`, token),
 };
@@ -21,5 +21,165 @@ def test_cache():
     cache.invalidate("v_")
     print(f"Result v_1: {cache.get('v_1')} (Expected: None)")
 
+
+def test_bounded_lru():
+    cache = SimpleCache(max_entries=3)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    cache.get("a")  # recently used, survives the next eviction
+    cache.set("d", "d")
+    assert cache.get("b") is None
+    assert cache.get("a") == "a"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_single_flight():
+    import asyncio
+    cache = SimpleCache()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "page"
+
+    async def burst():
+        return await asyncio.gather(*[cache.get_or_compute("home", compute) for _ in range(50)])
+
+    assert asyncio.run(burst()) == ["page"] * 50
+    assert len(calls) == 1
+
+
+def test_tag_invalidation():
+    cache = SimpleCache()
+    cache.set("home", ["v1", "v2"], tags=["feed:home", "video:1", "video:2"])
+    cache.set("video_1", "v1", tags=["video:1"])
+    cache.set("shorts", ["v3"], tags=["feed:shorts", "video:3"])
+    assert cache.invalidate_tags("video:1") == 2
+    assert cache.get("home") is None and cache.get("video_1") is None
+    assert cache.get("shorts") == ["v3"]
+    assert cache.stats()["tags"] == 2  # feed:shorts, video:3
+
+
+def test_stale_copies():
+    import asyncio
+    cache = SimpleCache(stale_max_bytes=10_000)
+    cache.stale_if = lambda e: isinstance(e, ConnectionError)
+
+    async def down():
+        raise ConnectionError("database unreachable")
+
+    async def scenario():
+        cache.set("video_1", "v1", tags=["video:1"])
+        cache.set("video_2", "v2", tags=["video:2"])
+        cache.set("user_3", "u3")
+        for key in ("video_1", "video_2", "user_3"):
+            cache._remove(key)  # As if expired: only the last good copies are left
+        assert await cache.get_or_compute("video_2", down) == "v2"
+
+        # Invalidated values are known to be wrong and are not served stale
+        cache.invalidate_tags("video:1")
+        cache.invalidate("user_")
+        for key in ("video_1", "user_3"):
+            try:
+                await cache.get_or_compute(key, down)
+                raise AssertionError(f"stale {key} served after invalidation")
+            except ConnectionError:
+                pass
+
+    asyncio.run(scenario())
+
+    # Last good copies have their own byte budget
+    for i in range(20):
+        cache.set(f"page_{i}", "x" * 1000)
+    assert cache.stats()["stale_bytes"] <= 10_000
+    assert "page_19" in cache._stale and "page_0" not in cache._stale
+
+
+def test_shared_backend():
+    import asyncio
+    import pytest
+    fakeredis = pytest.importorskip("fakeredis")
+    from backend.services.cache_backend import RedisBackend
+
+    async def scenario():
+        server = fakeredis.FakeServer()
+        workers = [SimpleCache(), SimpleCache()]
+        backends = [RedisBackend(client=fakeredis.FakeAsyncRedis(server=server)) for _ in workers]
+        listeners = []
+        for cache, backend in zip(workers, backends):
+            cache.attach(backend)
+            listeners.append(asyncio.create_task(backend.listen(lambda ns, msg, c=cache: c.apply_remote(msg))))
+        await asyncio.sleep(0.1)  # let both subscribe
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return ["v1"]
+
+        first, second = workers
+        assert await first.get_or_compute("home", compute, tags=["video:1"]) == ["v1"]
+        await first.flush()
+        # Worker two is cold but finds worker one's result in L2
+        assert await second.get_or_compute("home", compute) == ["v1"]
+        assert len(calls) == 1 and second.stats()["l2_hits"] == 1
+
+        # An invalidation in worker one reaches worker two's L1 over pub/sub
+        first.invalidate_tags("video:1")
+        await first.flush()
+        for _ in range(50):
+            if second.get("home") is None:
+                break
+            await asyncio.sleep(0.05)
+        assert second.get("home") is None
+        assert await second.get_or_compute("home", compute) == ["v1"]
+        assert len(calls) == 2
+
+        # Pre-encoded bodies come back from L2 as the same bytes
+        async def compute_encoded():
+            return b'[{"id":1}]', None, ["video:1"]
+
+        await first.get_or_compute("encoded", compute_encoded, tags=lambda page: page[2])
+        await first.flush()
+        body, cursor, tags = await second.get_or_compute("encoded", compute_encoded)
+        assert body == b'[{"id":1}]' and cursor is None and tags == ["video:1"]
+
+        for task in listeners:
+            task.cancel()
+        await asyncio.gather(*listeners, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_invalidation_spares_unrelated_computes():
+    import asyncio
+    cache = SimpleCache()
+    calls = {"home": 0, "video_7": 0}
+
+    def computer(key, value):
+        async def compute():
+            calls[key] += 1
+            await asyncio.sleep(0.05)
+            return value
+        return compute
+
+    async def scenario():
+        home = [cache.get_or_compute("home", computer("home", ["v1"]), tags=["feed:home", "video:1"])
+                for _ in range(10)]
+        video = cache.get_or_compute("video_7", computer("video_7", "v7"), tags=lambda v: ["video:7"])
+        tasks = [asyncio.ensure_future(c) for c in home + [video]]
+        await asyncio.sleep(0.01)
+        cache.invalidate_tags("video:7")  # A like on another video
+        cache.invalidate("user_")
+        # Late callers still join the running compute for the unrelated key
+        tasks += [asyncio.ensure_future(cache.get_or_compute("home", computer("home", ["v1"]))) for _ in range(5)]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert calls["home"] == 1 and cache.get("home") == ["v1"]
+    # The invalidated key's result predates the write and is not stored
+    assert calls["video_7"] == 1 and cache.get("video_7") is None
+
+
 if __name__ == "__main__":
     test_cache()
@@ -0,0 +1,72 @@
+"""
+Migrations apply cleanly, and the hot queries use the composite indexes.
+
+Runs against a throwaway SQLite database and checks EXPLAIN QUERY PLAN.
+"""
+import os
+import tempfile
+
+from sqlalchemy import create_engine, text
+from sqlmodel import select
+
+from backend.migrations import discover, run_migrations
+from backend.models import Comment, PlaylistItem, Subscription, Video, VideoLike, VideoSource, WatchHistory
+
+
+def _plan(engine, stmt) -> str:
+    sql = str(stmt.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+HOT_QUERIES = [
+    ("home feed", select(Video).order_by(Video.upload_date.desc()).limit(20),
+     "ix_video_upload_date"),
+    ("shorts feed", select(Video).where(Video.is_short == True).order_by(Video.upload_date.desc()).limit(20),
+     "ix_video_is_short_upload_date"),
+    ("category feed", select(Video).where(Video.category_id == 1).order_by(Video.upload_date.desc()).limit(20),
+     "ix_video_category_upload_date"),
+    ("channel page", select(Video).where(Video.uploader_id == 1).order_by(Video.upload_date.desc()).limit(20),
+     "ix_video_uploader_upload_date"),
+    ("stream source lookup", select(VideoSource).where(VideoSource.video_id == 1, VideoSource.provider == "streamtape",
+                                                       VideoSource.resolution == "720p"),
+     "ix_videosource_video_provider_resolution"),
+    ("continue watching", select(WatchHistory).where(WatchHistory.user_id == 1, WatchHistory.completed == False)
+     .order_by(WatchHistory.watched_at.desc()).limit(10),
+     "ix_watchhistory_user_completed_watched"),
+    ("like counts", select(VideoLike).where(VideoLike.video_id == 1, VideoLike.is_like == True),
+     "ix_videolike_video_is_like"),
+    ("user vote", select(VideoLike).where(VideoLike.user_id == 1, VideoLike.video_id == 1),
+     "ix_videolike_user_video"),
+    ("subscription status", select(Subscription).where(Subscription.subscriber_id == 1, Subscription.channel_id == 2),
+     "ix_subscription_subscriber_channel"),
+    ("top-level comments", select(Comment).where(Comment.video_id == 1, Comment.parent_id == None)
+     .order_by(Comment.created_at.desc()),
+     "ix_comment_video_parent_created"),
+    ("comment replies", select(Comment).where(Comment.parent_id.in_([1, 2]))
+     .order_by(Comment.created_at, Comment.id),
+     "ix_comment_parent_created"),
+    ("playlist items", select(PlaylistItem).where(PlaylistItem.playlist_id == 1).order_by(PlaylistItem.position),
+     "ix_playlistitem_playlist_position"),
+]
+
+
+def test_index_usage():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'test.db')}")
+        try:
+            applied = run_migrations(engine)
+            assert applied == [m.version for m in discover()]
+            assert run_migrations(engine) == []  # idempotent
+
+            for name, stmt, index in HOT_QUERIES:
+                plan = _plan(engine, stmt)
+                print(f"{name}: {plan}")
+                assert index in plan, f"{name} does not use {index}:\n{plan}"
+        finally:
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    test_index_usage()
@@ -0,0 +1,54 @@
+"""
+Buffered watch progress stays readable while a flush is in flight.
+
+flush() takes the batch out of the buffer before its upsert commits; until
+then the database still holds the older row, so get() has to keep answering
+from the batch being written.
+"""
+import asyncio
+import os
+import tempfile
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, create_engine, select
+
+import backend.database
+from backend.migrations import run_migrations
+from backend.models import User, Video, WatchHistory
+from backend.services.progress_buffer import ProgressBuffer
+
+
+class _ObservedBuffer(ProgressBuffer):
+    """Records what readers see while the upsert runs."""
+
+    async def _write(self, entries):
+        self.seen = self.get(1, 1)
+        return await super()._write(entries)
+
+
+def test_get_during_flush(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "test.db")
+        engine = create_engine(f"sqlite:///{path}")
+        async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        run_migrations(engine)
+        with Session(engine) as s:
+            s.add(User(id=1, username="viewer", email="viewer@example.com", password_hash="x"))
+            s.add(Video(id=1, title="Video 1"))
+            s.commit()
+        monkeypatch.setattr(backend.database, "async_engine", async_engine)
+
+        buffer = _ObservedBuffer()
+        buffer.record(1, 1, progress_seconds=42)
+        try:
+            assert asyncio.run(buffer.flush()) == 1
+            with Session(engine) as s:
+                row = s.exec(select(WatchHistory)).one()
+        finally:
+            engine.dispose()
+            async_engine.sync_engine.dispose()
+
+    assert buffer.seen == {"progress_seconds": 42, "completed": False}
+    assert row.progress_seconds == 42
+    # Committed: reads go to the database again
+    assert buffer.get(1, 1) is None
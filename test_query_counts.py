@@ -0,0 +1,151 @@
+"""
+List endpoints run a constant number of SQL statements, whatever the page size.
+
+Each endpoint is called against a throwaway SQLite database with 3 and then 12
+rows to list; an N+1 loop shows up as a statement count that grows with the
+rows. Statements are counted with SQLAlchemy's before_cursor_execute event on
+both the sync and async engines.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from backend.database import get_async_session, get_session
+from backend.main import app
+from backend.migrations import run_migrations
+from backend.models import Comment, CommentLike, Playlist, PlaylistItem, User, Video, VideoLike, VideoSource, WatchHistory
+from backend.routers.auth import create_access_token
+
+SMALL, LARGE = 3, 12
+
+
+@contextmanager
+def _client(tmp):
+    path = os.path.join(tmp, "test.db")
+    engine = create_engine(f"sqlite:///{path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    run_migrations(engine)
+
+    def override_session():
+        with Session(engine) as session:
+            yield session
+
+    async def override_async_session():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[get_async_session] = override_async_session
+    try:
+        yield TestClient(app), engine, async_engine
+    finally:
+        app.dependency_overrides.clear()
+        engine.dispose()
+        async_engine.sync_engine.dispose()
+
+
+def _seed_user(engine, n_rows):
+    """
+    A user with n_rows videos in every list endpoint, and n_rows comments with
+    n_rows replies each on the first video. Returns (user_id, ids for the URLs).
+    """
+    with Session(engine) as s:
+        user = User(username=f"u{n_rows}", email=f"u{n_rows}@example.com", password_hash="x")
+        s.add(user)
+        s.commit()
+        playlist = Playlist(user_id=user.id, name="p", is_public=True)
+        watch_later = Playlist(user_id=user.id, name="Watch Later", is_watch_later=True, is_public=False)
+        s.add(playlist)
+        s.add(watch_later)
+        s.commit()
+        for i in range(n_rows):
+            video = Video(title=f"needle {n_rows} {i}", uploader_id=user.id, duration=100)
+            s.add(video)
+            s.commit()
+            s.add(VideoSource(video_id=video.id, provider="streamtape", resolution="720p", file_id=f"f{video.id}"))
+            s.add(VideoSource(video_id=video.id, provider="doodstream", resolution="720p", file_id=f"d{video.id}"))
+            s.add(WatchHistory(user_id=user.id, video_id=video.id, progress_seconds=40))
+            s.add(VideoLike(user_id=user.id, video_id=video.id, is_like=True))
+            s.add(PlaylistItem(playlist_id=playlist.id, video_id=video.id, position=i))
+            s.add(PlaylistItem(playlist_id=watch_later.id, video_id=video.id, position=i))
+            if i == 0:
+                first_video = video
+        s.commit()
+
+        for i in range(n_rows):
+            author = User(username=f"c{n_rows}_{i}", email=f"c{n_rows}_{i}@example.com", password_hash="x")
+            s.add(author)
+            s.commit()
+            comment = Comment(video_id=first_video.id, user_id=author.id, content=f"comment {i}")
+            s.add(comment)
+            s.commit()
+            if i == 0:
+                first_comment = comment
+            s.add(CommentLike(comment_id=comment.id, user_id=user.id))
+            for j in range(n_rows):
+                s.add(Comment(video_id=first_video.id, user_id=author.id, parent_id=comment.id, content=f"reply {j}"))
+        first_video.comment_count = n_rows
+        s.add(first_video)
+        s.commit()
+        return user.id, {"playlist": playlist.id, "video": first_video.id, "comment": first_comment.id}
+
+
+def _endpoints(ids, n_rows):
+    """name -> (url, function extracting the listed rows from the JSON body)"""
+    playlist_id = ids["playlist"]
+    return {
+        "watch history": (f"/history/?limit={n_rows}", lambda body: body["history"]),
+        "continue watching": (f"/history/continue?limit={n_rows}", lambda body: body["continue_watching"]),
+        "liked videos": ("/likes/user/liked", lambda body: body["liked_videos"]),
+        "playlist": (f"/playlists/{playlist_id}", lambda body: body["videos"]),
+        "watch later": ("/playlists/watch-later/videos", lambda body: body["videos"]),
+        "admin video list": (f"/admin/videos?skip={_seeded_videos(n_rows)}&limit={n_rows}", lambda body: body),
+        "admin search": (f"/admin/videos/search?q=needle+{n_rows}&limit={n_rows}", lambda body: body),
+        "video comments": (f"/comments/video/{ids['video']}?limit={n_rows}", lambda body: body["comments"]),
+        "comment replies": (f"/comments/{ids['comment']}/replies?limit={n_rows}", lambda body: body["replies"]),
+    }
+
+
+def _seeded_videos(n_rows):
+    """Videos created before the n_rows user (SMALL seeds first)."""
+    return 0 if n_rows == SMALL else SMALL
+
+
+def _count_statements(client, engines, url, headers):
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(url, headers=headers)
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200, (url, response.text)
+    return len(statements), response.json()
+
+
+def test_list_endpoints_have_constant_query_count():
+    with tempfile.TemporaryDirectory() as tmp:
+        with _client(tmp) as (client, engine, async_engine):
+            engines = (engine, async_engine.sync_engine)
+            counts = {}
+            for n_rows in (SMALL, LARGE):
+                user_id, ids = _seed_user(engine, n_rows)
+                headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+                for name, (url, rows) in _endpoints(ids, n_rows).items():
+                    count, body = _count_statements(client, engines, url, headers)
+                    assert len(rows(body)) == n_rows, name
+                    counts.setdefault(name, []).append(count)
+
+            for name, (small, large) in counts.items():
+                assert small == large, f"{name}: {small} statements for {SMALL} rows, {large} for {LARGE}"
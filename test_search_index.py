@@ -0,0 +1,78 @@
+"""
+Suggestions stay correct after incremental updates to the in-memory index.
+
+A removed or re-indexed video must lower the document frequency of its terms
+at once: BM25's idf goes negative when df exceeds the live documents, and the
+affected terms would then match nothing until the next compaction.
+"""
+from backend.services.search_index import SearchIndex
+
+
+def test_reupsert_keeps_common_terms_searchable():
+    index = SearchIndex()
+    for i in range(10):
+        index.upsert(i, f"Sketch {i}", "stand-up", "Comedy")
+    index.upsert(3, "Sketch 3 (edited)", "stand-up", "Comedy")
+
+    ids = {v["id"] for v in index.suggest("comedy", limit=20)["videos"]}
+    assert ids == set(range(10))
+
+
+def test_remove_keeps_prefix_search_working():
+    index = SearchIndex()
+    for i in range(100):
+        index.upsert(i, f"funny cats {i}")
+    removed = set(range(0, 100, 7)[:15])
+    for i in removed:
+        index.remove(i)
+
+    result = index.suggest("funny ca", limit=8)
+    assert "funny cats" in result["completions"]
+    assert len(result["videos"]) == 8
+    assert not removed & {v["id"] for v in result["videos"]}
+
+
+def test_removed_last_document_leaves_vocabulary():
+    index = SearchIndex()
+    index.upsert(1, "unique zebra")
+    index.upsert(2, "common title")
+    index.remove(1)
+
+    assert index.suggest("zeb")["completions"] == []
+    assert index.suggest("zebra")["videos"] == []
+    assert [v["id"] for v in index.suggest("comm")["videos"]] == [2]
+
+
+def test_invalidation_reindexes_renamed_category(monkeypatch):
+    import os
+    import tempfile
+    from sqlmodel import Session, create_engine
+    import backend.database
+    from backend.migrations import run_migrations
+    from backend.models import Category, Video
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'test.db')}")
+        run_migrations(engine)
+        monkeypatch.setattr(backend.database, "engine", engine)
+        with Session(engine) as s:
+            s.add(Category(id=1, name="Comedy", slug="comedy"))
+            s.add_all(Video(id=i, title=f"Sketch {i}", category_id=1) for i in (1, 2))
+            s.commit()
+
+        index = SearchIndex()
+        index.rebuild()
+        assert len(index.suggest("comedy")["videos"]) == 2
+
+        with Session(engine) as s:
+            s.get(Category, 1).name = "Satire"
+            s.delete(s.get(Video, 2))
+            s.commit()
+        # What the app_cache listener does for category:1 / video:2, minus the executor hop
+        index._stale_categories.add(1)
+        index._stale_videos.add(2)
+        index.refresh_stale()
+        engine.dispose()
+
+    assert index.suggest("comedy")["videos"] == []
+    assert [v["id"] for v in index.suggest("satire")["videos"]] == [1]
@@ -0,0 +1,58 @@
+"""
+Buffered view flushes against a throwaway SQLite database.
+
+Views queued while the database was down aren't checked against the video
+table, so a batch may only hold ids that no longer exist. Flushing it must
+drop those views instead of failing and retrying the same batch forever.
+"""
+import asyncio
+import os
+import tempfile
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import Session, create_engine, select
+
+import backend.database
+from backend.migrations import run_migrations
+from backend.models import Video, ViewHistory
+from backend.services.view_counter import ViewCounter
+
+
+def _flush(monkeypatch, tmp, seed_videos, recorded_ids):
+    path = os.path.join(tmp, "test.db")
+    engine = create_engine(f"sqlite:///{path}")
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    run_migrations(engine)
+    with Session(engine) as s:
+        s.add_all(Video(id=vid, title=f"Video {vid}") for vid in seed_videos)
+        s.commit()
+    monkeypatch.setattr(backend.database, "async_engine", async_engine)
+
+    counter = ViewCounter()
+    for vid in recorded_ids:
+        counter.record(vid, ip_address="127.0.0.1")
+    try:
+        written = asyncio.run(counter.flush())
+        with Session(engine) as s:
+            views = {v.id: v.views for v in s.exec(select(Video)).all()}
+            history = len(s.exec(select(ViewHistory)).all())
+    finally:
+        engine.dispose()
+        async_engine.sync_engine.dispose()
+    return counter, written, views, history
+
+
+def test_flush_only_deleted_videos(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        counter, written, views, history = _flush(monkeypatch, tmp, [], [998, 999, 999])
+    assert written == 0 and history == 0
+    # Dropped, not merged back for another failing attempt
+    assert counter.pending_events == 0 and counter.pending(999) == 0
+
+
+def test_flush_skips_deleted_videos(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        counter, written, views, history = _flush(monkeypatch, tmp, [1], [1, 1, 999])
+    assert written == 2 and history == 2
+    assert views == {1: 2}
+    assert counter.pending_events == 0